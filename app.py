@@ -1,9 +1,7 @@
 import streamlit as st
 import pandas as pd
 import yfinance as yf
-import pdfplumber  # For PDF parsing
 import re
-from rapidfuzz import process, fuzz
 import unicodedata
 from bidi.algorithm import get_display
 from arabic_reshaper import reshape
@@ -11,9 +9,9 @@ import nltk
 from nltk.corpus import stopwords
 nltk.download('stopwords', quiet=True)
 import matplotlib.pyplot as plt
-from datetime import datetime, timedelta
+from datetime import datetime
 import traceback
-import sys
+import time
 from parse_credit_card import is_probably_english, extract_transactions
 import plotly.express as px
 import plotly.graph_objects as go
@@ -22,44 +20,39 @@ import pytz
 import pymupdf
 from io import BytesIO
 import numpy as np
+import debug_utils
+from debug_utils import debug_print
+from company_data import (
+    INTERNATIONAL_COMPANIES, ISRAELI_COMPANIES, company_names, PAYMENT_METHODS,
+    COMPANY_TO_TICKER, HEBREW_COMPANY_TO_TICKER, HEBREW_COMPANY_MAPPINGS,
+    SPECIAL_COMPANY_PATTERNS, ISRAELI_FALLBACK_PATTERNS, ALIAS_TABLES_VERSION
+)
+from merchant_matcher import ANYWHERE, SHORT_WORD, MerchantMatcher
+from ticker_universe import get_ticker_universe
+from resolution_cache import (
+    MISSING, get_resolution_cache, get_resolution_cache_stats, normalize_merchant,
+    save_resolution_caches
+)
+from pdf_extraction import (
+    PARSER_VERSION, extract_pages, iter_pages, parser_stamp, read_pdf_bytes, summarize_pages
+)
+from parse_cache import get_parse_cache, statement_key
+from fx_rates import BASE_CURRENCY
+from performance_engine import compute_performance, compute_purchases
+from ledger import get_ledger
+from async_pipeline import AsyncPriceFetcher, iter_statement_events
+from quote_service import get_quote_service
+from price_panel import PricePanel
+from portfolio_simulator import simulate_portfolio
+from match_table import build_match_table, empty_match_table
+import instrumentation
+from instrumentation import count, instrumented, timed
+from price_engine import (
+    collect_start_dates, fetch_current_prices, fetch_price_histories,
+    parse_transaction_date
+)
 
-# Constants for company information
-INTERNATIONAL_COMPANIES = [
-    {'name': 'Netflix', 'ticker': 'NFLX', 'exchange': 'NASDAQ', 'aliases': ['netflix', 'netflix.com']},
-    {'name': 'Google', 'ticker': 'GOOGL', 'exchange': 'NASDAQ', 'aliases': ['google', 'youtube', 'alphabet', 'google*']},
-    {'name': 'Alibaba', 'ticker': 'BABA', 'exchange': 'NYSE', 'aliases': ['ali', 'aliexpress', 'alibaba']},
-    {'name': 'Amazon', 'ticker': 'AMZN', 'exchange': 'NASDAQ', 'aliases': ['amazon', 'aws', 'kindle', 'amazon prime']},
-    {'name': 'Apple', 'ticker': 'AAPL', 'exchange': 'NASDAQ', 'aliases': ['apple', 'itunes', 'apple store', 'icloud']},
-    {'name': 'Microsoft', 'ticker': 'MSFT', 'exchange': 'NASDAQ', 'aliases': ['microsoft', 'xbox', 'ms', 'msft', 'azure']},
-    {'name': 'Meta', 'ticker': 'META', 'exchange': 'NASDAQ', 'aliases': ['meta', 'facebook', 'instagram', 'fb', 'whatsapp']},
-    {'name': 'Tesla', 'ticker': 'TSLA', 'exchange': 'NASDAQ', 'aliases': ['tesla', 'tsla']},
-    {'name': 'Disney', 'ticker': 'DIS', 'exchange': 'NYSE', 'aliases': ['disney', 'disney+', 'disneyplus']},
-    {'name': 'PayPal', 'ticker': 'PYPL', 'exchange': 'NASDAQ', 'aliases': ['paypal', 'pay pal']},
-    {'name': 'Uber', 'ticker': 'UBER', 'exchange': 'NYSE', 'aliases': ['uber', 'uber eats']},
-    {'name': 'Spotify', 'ticker': 'SPOT', 'exchange': 'NYSE', 'aliases': ['spotify', 'spot']}
-]
-
-ISRAELI_COMPANIES = [
-    {'name': 'Partner', 'ticker': 'PTNR.TA', 'aliases': ['פרטנר', 'partner', 'פרטנר תקשורת']},
-    {'name': 'Cellcom', 'ticker': 'CEL.TA', 'aliases': ['סלקום', 'cellcom', 'סלקום ישראל']},
-    {'name': 'Menora', 'ticker': 'MMHD.TA', 'aliases': ['מנורה', 'menora', 'מבטחים', 'מנורה מבטחים']},
-    {'name': 'Bank Leumi', 'ticker': 'LUMI.TA', 'aliases': ['לאומי', 'leumi', 'בנק לאומי']},
-    {'name': 'Bank Hapoalim', 'ticker': 'POLI.TA', 'aliases': ['פועלים', 'hapoalim', 'בנק הפועלים']},
-    {'name': 'Bank Discount', 'ticker': 'DSCT.TA', 'aliases': ['דיסקונט', 'discount', 'בנק דיסקונט']},
-    {'name': 'Strauss', 'ticker': 'STRS.TA', 'aliases': ['שטראוס', 'strauss', 'שטראוס גרופ']},
-    {'name': 'Meitav', 'ticker': 'MTDS.TA', 'aliases': ['מיטב', 'meitav', 'מיטב דש', 'מיטב-דש']},
-    {'name': 'El Al', 'ticker': 'ELAL.TA', 'aliases': ['אל על', 'elal', 'el al', 'אל-על']},
-    {'name': 'Yohananof', 'ticker': 'YHNF.TA', 'aliases': ['יוחננוף', 'yohananof', 'יוחננוף ובניו']}
-]
-
-# Enable debug mode
-DEBUG_MODE = True
-
-def debug_print(*args, **kwargs):
-    """Print debug information if DEBUG_MODE is True"""
-    if DEBUG_MODE:
-        print("DEBUG:", *args, **kwargs)
-        sys.stdout.flush()  # Ensure output is immediately visible
+LIVE_REFRESH_SECONDS = 0.5  # Least time between redraws of the running totals while prices arrive
 
 # Wrap potentially problematic functions to catch unhashable type errors
 def safe_hash(obj):
@@ -71,64 +64,6 @@ def safe_hash(obj):
         # Convert to a hashable type (string representation)
         return hash(str(obj))
 
-# List of known company names and their common variations
-company_names = [
-    "Apple", "Microsoft", "Amazon", "Google", "Samsung", "Toyota", "Coca-Cola", "Mercedes-Benz",
-    "McDonald's", "BMW", "Louis Vuitton", "Tesla", "Cisco", "Nike", "Instagram", "Disney", "Adobe",
-    "Oracle", "IBM", "SAP", "Facebook", "Hermès", "Chanel", "YouTube", "J.P. Morgan", "Pepsi",
-    "Gucci", "Ford", "L'Oréal", "AXA", "Lexus", "HSBC", "Mastercard", "Citi", "Nissan", "Audi",
-    "T-Mobile", "Daimler", "Barclays", "Johnson & Johnson", "Tiffany & Co.", "Cartier",
-    "Jack Daniel's", "Moët & Chandon", "Credit Suisse", "Shell", "Visa", "Pizza Hut", "Gap", "Corona", "UBS", "Nivea", "Smirnoff",
-    "Walmart", "Kellogg's", "Heineken", "Colgate", "Prada", "Chrysler", "Kia", "Porsche", "Subaru", "Lindt", "H&M", "Kraft Heinz",
-    "DHL", "Barclays", "Unilever", "Nestlé", "Procter & Gamble", "PepsiCo", "Sony", "Gucci", "IKEA", "Honda", "Volvo", "Accenture",
-    "Rolex", "Chanel", "Netflix", "Lululemon", "Under Armour", "Whole Foods Market", "Sephora", "Dell", "Sony", "Pinterest",
-    "Skype", "Uber", "Airbnb", "Spotify", "PayPal", "Alibaba", "Tencent", "Boeing", "Mastercard", "Target",
-    "AliExpress", "Booking.com", "Ebay", "Starbucks", "Zara", "Adidas", "Expedia", "Etsy", "Shopify", "Lyft",
-    "Dropbox", "Twitter", "LinkedIn", "Zoom", "DocuSign", "Slack", "Twilio", "Snap", "Pinterest", "Fiverr"
-]
-
-# Enhanced payment methods list - these should be ignored
-PAYMENT_METHODS = [
-    'visa', 'mastercard', 'amex', 'american express', 'discover',
-    'paypal', 'debit', 'credit', 'card', 'payment', 'bank',
-    'transfer', 'transaction', 'direct debit', 'wire', 'online',
-    'banking', 'mobile', 'pay', 'fee', 'service', 'charge',
-    'purchase', 'payment method', 'venmo', 'chase', 'zelle',
-    'google pay', 'apple pay', 'samsung pay', 'gpay', 'contactless',
-]
-
-# Company mappings
-COMPANY_TO_TICKER = {
-    'Netflix': {'ticker': 'NFLX', 'exchange': 'NASDAQ', 'name': 'Netflix Inc'},
-    'NETFLIX.COM': {'ticker': 'NFLX', 'exchange': 'NASDAQ', 'name': 'Netflix Inc'},
-    'Google': {'ticker': 'GOOGL', 'exchange': 'NASDAQ', 'name': 'Alphabet Inc'},
-    'YouTube': {'ticker': 'GOOGL', 'exchange': 'NASDAQ', 'name': 'Alphabet Inc'},
-    'GOOGLE*': {'ticker': 'GOOGL', 'exchange': 'NASDAQ', 'name': 'Alphabet Inc'},
-    'Alphabet': {'ticker': 'GOOGL', 'exchange': 'NASDAQ', 'name': 'Alphabet Inc'},
-    'Alibaba': {'ticker': 'BABA', 'exchange': 'NYSE', 'name': 'Alibaba Group'},
-    'aliexpress': {'ticker': 'BABA', 'exchange': 'NYSE', 'name': 'Alibaba Group'},
-    'ali': {'ticker': 'BABA', 'exchange': 'NYSE', 'name': 'Alibaba Group'},
-    'Amazon': {'ticker': 'AMZN', 'exchange': 'NASDAQ', 'name': 'Amazon.com Inc'},
-    'AMZN': {'ticker': 'AMZN', 'exchange': 'NASDAQ', 'name': 'Amazon.com Inc'},
-    'Apple': {'ticker': 'AAPL', 'exchange': 'NASDAQ', 'name': 'Apple Inc'},
-    'Microsoft': {'ticker': 'MSFT', 'exchange': 'NASDAQ', 'name': 'Microsoft Corporation'},
-    'Meta': {'ticker': 'META', 'exchange': 'NASDAQ', 'name': 'Meta Platforms Inc'},
-    'Facebook': {'ticker': 'META', 'exchange': 'NASDAQ', 'name': 'Meta Platforms Inc'},
-    'Instagram': {'ticker': 'META', 'exchange': 'NASDAQ', 'name': 'Meta Platforms Inc'},
-}
-
-# Hebrew company mappings
-HEBREW_COMPANY_TO_TICKER = {
-    'פרטנר': {'ticker': 'PTNR', 'exchange': 'NASDAQ', 'name': 'Partner Communications'},
-    'סלקום': {'ticker': 'CEL', 'exchange': 'NYSE', 'name': 'Cellcom Israel'},
-    'בזק': {'ticker': 'BZQIY', 'exchange': 'OTC', 'name': 'Bezeq'},
-    'טבע': {'ticker': 'TEVA', 'exchange': 'NYSE', 'name': 'Teva Pharmaceutical'},
-    'כיל': {'ticker': 'ICL', 'exchange': 'NYSE', 'name': 'ICL Group'},
-    'לאומי': {'ticker': 'LUMI.TA', 'exchange': 'TASE', 'name': 'Bank Leumi'},
-    'פועלים': {'ticker': 'POLI.TA', 'exchange': 'TASE', 'name': 'Bank Hapoalim'},
-    'דיסקונט': {'ticker': 'DSCT.TA', 'exchange': 'TASE', 'name': 'Israel Discount Bank'},
-}
-
 def extract_english_segments(text):
     """Extract segments that are likely English words or phrases"""
     # Enhanced pattern to catch more company names including Netflix
@@ -180,28 +115,6 @@ def extract_english_segments(text):
     debug_print(f"Extracted segments: {filtered_matches}")
     return filtered_matches
 
-def is_payment_method(text):
-    """Check if text is likely a payment method rather than a merchant"""
-    text = text.lower().strip()
-    
-    # Check for exact matches first
-    if text in PAYMENT_METHODS:
-        debug_print(f"Payment method detected (exact match): {text}")
-        return True
-    
-    # Check for payment methods as part of text
-    for method in PAYMENT_METHODS:
-        if method in text or text in method:
-            debug_print(f"Payment method detected (partial match): {text} contains or is contained in {method}")
-            return True
-    
-    # Special cases
-    if 'google pay' in text or 'pay' in text and 'google' in text:
-        debug_print(f"Payment method detected (special case): {text} is related to Google Pay")
-        return True
-        
-    return False
-
 def clean_merchant_name(name):
     """Clean and normalize merchant names"""
     # Remove stopwords and payment indicators
@@ -209,70 +122,60 @@ def clean_merchant_name(name):
              if word not in PAYMENT_METHODS]
     return ' '.join(words)
 
-def get_stock_ticker(merchant_name):
-    """Get stock ticker symbol for a merchant name"""
-    if not merchant_name:
-        return None
-    
-    # Clean merchant name
-    clean_name = merchant_name.lower().strip()
-    
-    # Check in direct mapping first
-    for company, ticker in COMPANY_TO_TICKER.items():
-        if company.lower() in clean_name or clean_name in company.lower():
-            debug_print(f"Direct mapping found: {merchant_name} -> {ticker}")
-            return [ticker]
-    
-    # Special case for Alibaba/AliExpress
-    if 'ali' in clean_name or 'baba' in clean_name:
-        debug_print(f"Special case for Alibaba: {merchant_name} -> BABA")
-        return ['BABA']
-    
-    # Special case for YouTube/Google
-    if 'youtube' in clean_name:
-        debug_print(f"Special case for YouTube: {merchant_name} -> GOOGL")
-        return ['GOOGL']
-    
-    # Special case for Israeli companies
-    if re.search(r'[א-ת]', merchant_name):  # Contains Hebrew characters
-        # Check for Migdal
-        if 'מגדל' in merchant_name:
-            debug_print(f"Found Israeli company Migdal: {merchant_name} -> MGDL.TA")
-            return ['MGDL.TA']
-        
-        # Check for Yohananof
-        if 'יוחננוף' in merchant_name or 'סופר שוק' in merchant_name:
-            debug_print(f"Found Israeli company Yohananof: {merchant_name} -> YHNF.TA")
-            return ['YHNF.TA']
-    
-    # If we couldn't find a stock ticker directly, try a fuzzy match
+def get_stock_tickers(merchant_names):
+    """
+    Resolve merchants no known company matched against the global_stocks.csv universe, in one batch.
+
+    Each distinct name is looked up in the universe index first; the names
+    left over are fuzzy-matched against the universe together, in one
+    blocked rapidfuzz pass. Results are kept in the 'universe' resolution cache.
+
+    Args:
+        merchant_names (iterable): Merchant names, e.g. the unmatched part of the Merchant column
+
+    Returns:
+        dict: Merchant name -> universe entry ('ticker', 'name' and 'exchange'), or None if nothing matched
+    """
+    cache = get_resolution_cache('universe', ALIAS_TABLES_VERSION)
+    cached = {}
+    results = {}
+    for merchant_name in dict.fromkeys(merchant_names):
+        if not isinstance(merchant_name, str) or not merchant_name:
+            continue
+        entry = cache.get(normalize_merchant(merchant_name), MISSING)
+        if entry is not MISSING:
+            cached[merchant_name] = entry
+        else:
+            results[merchant_name] = None
+
+    finished = False
     try:
-        fuzzy_threshold = 80  # minimum similarity score (0-100)
-        
-        best_match = None
-        best_score = 0
-        
-        for company, ticker in COMPANY_TO_TICKER.items():
-            # Skip Hebrew companies for fuzzy matching
-            if re.search(r'[א-ת]', company):
-                continue
-                
-            # Calculate similarity score
-            score = fuzz.partial_ratio(clean_name, company.lower())
-            
-            if score > fuzzy_threshold and score > best_score:
-                best_match = ticker
-                best_score = score
-        
-        if best_match:
-            debug_print(f"Fuzzy match found: {merchant_name} -> {best_match} (score: {best_score})")
-            return [best_match]
-        
+        fuzzy_candidates = []
+        if results:
+            universe = get_ticker_universe()
+            for merchant_name in results:
+                universe_match = universe.resolve(merchant_name)
+                if universe_match:
+                    debug_print(f"Ticker universe match found: {merchant_name} -> {universe_match['ticker']} ({universe_match['name']})")
+                    results[merchant_name] = universe_match
+                else:
+                    fuzzy_candidates.append(merchant_name)
+
+        if fuzzy_candidates:
+            for merchant_name, universe_match in universe.resolve_fuzzy_batch(fuzzy_candidates).items():
+                if universe_match:
+                    debug_print(f"Fuzzy ticker universe match found: {merchant_name} -> {universe_match['ticker']} ({universe_match['name']})")
+                    results[merchant_name] = universe_match
+        finished = True
     except Exception as e:
-        debug_print(f"Error in fuzzy matching: {e}")
-    
-    # If we still don't have a match, return None
-    return None
+        debug_print(f"Error in ticker universe lookup: {e}")
+
+    # A name is only known not to match once every stage has run on it
+    for merchant_name, entry in results.items():
+        if finished or entry is not None:
+            cache.put(normalize_merchant(merchant_name), entry)
+    results.update(cached)
+    return results
 
 def search_tickers_via_yfinance(query):
     """Search for tickers matching a query using yahoo finance"""
@@ -288,30 +191,21 @@ def search_tickers_via_yfinance(query):
         if len(query) < 3 or query in ['www', 'com', 'org', 'net']:
             return []
         
-        # Check for direct matches in our mapping
-        for company, ticker in COMPANY_TO_TICKER.items():
-            if company in query or query in company:
-                # Validate ticker exists
-                try:
-                    ticker_info = yf.Ticker(ticker).info
-                    if 'regularMarketPrice' in ticker_info:
-                        return [ticker]
-                except:
-                    pass
+        # Check for direct matches in our mapping, validating every candidate in one quote call
+        candidates = [ticker for company, ticker in COMPANY_TO_TICKER.items() if company in query or query in company]
+        if candidates:
+            quoted = fetch_current_prices(candidates)
+            for ticker in candidates:
+                if ticker in quoted:
+                    return [ticker]
         
         # Use yfinance search - handle potential failures
         try:
             search_result = yf.Tickers(query.upper())
             if hasattr(search_result, 'tickers'):
-                valid_tickers = []
-                for ticker in list(search_result.tickers.keys())[:3]:  # Check top 3 matches
-                    try:
-                        info = yf.Ticker(ticker).info
-                        if 'regularMarketPrice' in info:
-                            valid_tickers.append(ticker)
-                    except:
-                        continue
-                return valid_tickers
+                top_matches = list(search_result.tickers.keys())[:3]  # Check top 3 matches
+                quoted = fetch_current_prices(top_matches)
+                return [ticker for ticker in top_matches if ticker in quoted]
         except:
             pass
         
@@ -341,90 +235,41 @@ def is_latin(text):
             return True
     return False
 
-def extract_transactions(pdf_file):
+def extract_transactions(pdf_file, workers=None):
+    """
+    Extract transactions from an Israeli credit card statement PDF.
+
+    Statements already parsed, in this or an earlier session, are served from
+    the parse cache by content hash.
+
+    Args:
+        pdf_file: Path, bytes or file-like object of the PDF
+        workers (int, optional): Processes used to parse pages in parallel.
+            Defaults to the PDF_EXTRACTION_WORKERS environment variable;
+            short statements are always parsed sequentially.
+
+    Returns:
+        tuple: (transactions DataFrame, list of English merchant names found)
+    """
     transactions = []
-    raw_text = ""
     english_merchants = []
     
     try:
-        with pdfplumber.open(pdf_file) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text(
-                    x_tolerance=1,
-                    y_tolerance=1,
-                    layout=True,
-                    x_density=7.25,
-                    y_density=13
-                )
-                raw_text += text + "\n"
-                debug_print(f"Raw text from page: {text}")
-                
-                # Split into lines and process each line
-                lines = text.split('\n')
-                
-                for line in lines:
-                    # Skip header/footer lines
-                    if any(skip in line for skip in ['ךותמ', 'רושיאל', 'תויביר']):
-                        continue
-                        
-                    # Pattern for standard transaction line in Israeli credit card statement
-                    # Format: Amount Amount Type Description Date
-                    match = re.search(r'([₪€$])\s+([\d,\.]+)\s+\1\s+([\d,\.]+)\s*(.*?)\s+(\d{2}/\d{2}/\d{4})', line)
-                    
-                    if match:
-                        try:
-                            currency = match.group(1)
-                            amount_str = match.group(2).replace(',', '')
-                            description = match.group(4).strip()
-                            date = match.group(5)
-                            
-                            # Skip if it's a payment method or empty description
-                            if not description or is_payment_method(description):
-                                continue
-                                
-                            # Handle special cases - expand detection patterns
-                            if 'GOOGLE' in description.upper() or 'YOUTUBE' in description.upper():
-                                english_merchants.append('Google')
-                            elif 'NETFLIX' in description.upper():
-                                english_merchants.append('Netflix')
-                            elif 'ALI' in description.upper() or 'BABA' in description.upper():
-                                english_merchants.append('Alibaba')
-                            elif 'AMAZON' in description.upper():
-                                english_merchants.append('Amazon')
-                            elif 'APPLE' in description.upper() or 'ICLOUD' in description.upper():
-                                english_merchants.append('Apple')
-                            elif 'MICROSOFT' in description.upper() or 'MSFT' in description.upper():
-                                english_merchants.append('Microsoft')
-                            elif 'META' in description.upper() or 'FACEBOOK' in description.upper() or 'INSTAGRAM' in description.upper():
-                                english_merchants.append('Meta')
-                            
-                            # Check for Israeli companies
-                            if 'פרטנר' in description or 'PARTNER' in description.upper():
-                                english_merchants.append('Partner')
-                            elif 'סלקום' in description or 'CELLCOM' in description.upper():
-                                english_merchants.append('Cellcom')
-                            elif 'מנורה' in description or 'MENORA' in description.upper():
-                                english_merchants.append('Menora')
-                            
-                            # Also check company mappings
-                            for company_name in COMPANY_TO_TICKER.keys():
-                                if isinstance(company_name, str) and len(company_name) > 2 and company_name.lower() in description.lower():
-                                    debug_print(f"Found company: {company_name} in {description}")
-                                    english_merchants.append(company_name)
-                            
-                            transaction = {
-                                "Date": fix_date_direction(date),
-                                "Merchant": description,
-                                "Amount": float(amount_str),
-                                "Currency": currency,
-                                "HasEnglishCompany": bool(re.search(r'[a-zA-Z]', description))
-                            }
-                            transactions.append(transaction)
-                            debug_print(f"Added transaction: {transaction}")
-                            
-                        except Exception as e:
-                            debug_print(f"Error processing line match: {e}")
-                            continue
+        pdf_bytes = read_pdf_bytes(pdf_file)
+        cache_key = statement_key(pdf_bytes, parser_stamp())
+        cached = get_parse_cache().get(cache_key)
+        if cached is not None:
+            return cached
+
+        start = time.perf_counter()
+        # Pages come back in page order even when parsed in parallel
+        page_results = extract_pages(pdf_bytes, workers=workers)
+        for page_result in page_results:
+            transactions.extend(page_result['transactions'])
+            english_merchants.extend(page_result['english_merchants'])
+        # The per-page report is only worth building when it is printed
+        if debug_utils.DEBUG_MODE:
+            debug_print(f"Extraction: {summarize_pages(page_results)}")
                     
         debug_print(f"Total transactions extracted: {len(transactions)}")
         debug_print(f"English merchants found: {list(set(english_merchants))}")  # Remove duplicates
@@ -432,95 +277,176 @@ def extract_transactions(pdf_file):
         if not transactions:
             debug_print("No transactions were extracted!")
             
-        return pd.DataFrame(transactions), english_merchants
+        with timed('dataframe_assembly', items=len(transactions)):
+            transactions_df = pd.DataFrame(transactions)
+        get_parse_cache().put(cache_key, transactions_df, english_merchants, time.perf_counter() - start)
+        return transactions_df, english_merchants
         
     except Exception as e:
         debug_print(f"Error extracting transactions: {e}")
         traceback.print_exc()
         return pd.DataFrame(), []
 
-def fix_date_direction(date):
-    """Convert date to YYYY-MM-DD format for consistency."""
-    if isinstance(date, str):
-        parts = date.split('/')
-        if len(parts) == 3:
-            day, month, year = parts[0], parts[1], parts[2]
-            # Check date format and convert
-            if len(year) == 4:  # DD/MM/YYYY format
-                return f"{year}-{month}-{day}"
-            else:  # Possibly MM/DD/YY format
-                # Assuming year is the last part
-                return f"20{year}-{month}-{day}" if len(year) == 2 else date
-    return date
-
-def get_stock_performance(ticker, date, amount):
-    """Calculate stock performance for a given transaction."""
+def classify_transactions(transactions_df):
+    """
+    Add Company and Ticker columns naming the known company each merchant belongs to.
+
+    Regular matches are preferred over fallback-only ones; merchants matching
+    no known company get None.
+    """
+    if transactions_df.empty:
+        return transactions_df
+
+    company_tickers = {info['name']: info['ticker'] for info in INTERNATIONAL_COMPANIES + ISRAELI_COMPANIES}
+    matcher = get_company_matcher()
+    companies = []
+    with timed('company_matching', items=len(transactions_df)):
+        for merchant in transactions_df['Merchant']:
+            found = matcher.lookup(merchant)
+            # Prefer a regular match over a fallback-only one
+            matched = [company for company, regular in found.items() if regular] or list(found)
+            companies.append(matched[0] if matched else None)
+
+    # Merchants no known company matched are looked up in the ticker universe
+    unmatched = [merchant for merchant, company in zip(transactions_df['Merchant'], companies) if company is None]
+    if unmatched:
+        with timed('universe_matching', items=len(unmatched)):
+            universe_matches = get_stock_tickers(unmatched)
+        for position, merchant in enumerate(transactions_df['Merchant']):
+            entry = universe_matches.get(merchant) if companies[position] is None else None
+            if entry:
+                companies[position] = entry['name']
+                company_tickers.setdefault(entry['name'], entry['ticker'])
+    transactions_df['Company'] = companies
+    transactions_df['Ticker'] = transactions_df['Company'].map(company_tickers)
+    return transactions_df
+
+def stream_transactions(pdf_file, workers=None):
+    """
+    Yield the transactions of a statement page by page as they are parsed.
+
+    Each page goes through extraction, line parsing, payment-method filtering
+    and company classification before it is yielded, so the UI can show
+    partial results while later pages are still being read. A statement found
+    in the parse cache is yielded whole, as a single page.
+
+    Args:
+        pdf_file: Path, bytes or file-like object of the PDF
+        workers (int, optional): Processes used to parse pages in parallel
+
+    Yields:
+        tuple: (page number, page count, DataFrame of the page's transactions with
+            Company and Ticker columns, None where no known company matched)
+    """
+    pdf_bytes = read_pdf_bytes(pdf_file)
+    cache_key = statement_key(pdf_bytes, parser_stamp())
+    cached = get_parse_cache().get(cache_key)
+    if cached is not None:
+        yield 0, 1, classify_transactions(cached[0])
+        return
+
+    start = time.perf_counter()
+    transactions = []
+    english_merchants = []
+    for page_result in iter_pages(pdf_bytes, workers=workers):
+        transactions.extend(page_result['transactions'])
+        english_merchants.extend(page_result['english_merchants'])
+        page_df = classify_transactions(pd.DataFrame(page_result['transactions']))
+        debug_print(f"Page {page_result['page'] + 1}/{page_result['page_count']}: "
+                    f"{len(page_df)} transactions via {page_result['backend']} in {page_result['seconds']:.2f}s")
+        yield page_result['page'], page_result['page_count'], page_df
+
+    # Only reached once every page was parsed, so partial statements are never cached
+    get_parse_cache().put(cache_key, pd.DataFrame(transactions), english_merchants, time.perf_counter() - start)
+
+def normalize_transaction_dates(transactions_df):
+    """Rewrite the Date column as YYYY-MM-DD strings, accepting both YYYY-MM-DD and DD/MM/YYYY input"""
+    # Update date parsing logic to handle both formats (YYYY-MM-DD and DD/MM/YYYY)
     try:
-        debug_print(f"Calculating performance for {ticker} from {date} with amount {amount} ₪")
-        
-        # Convert amount from ILS to USD if needed
-        if '.TA' in ticker:
-            # TASE stocks are already in ILS
-            currency_amount = amount
-            debug_print(f"TASE stock detected, keeping amount in ILS: {currency_amount:.2f} ILS")
-        else:
-            # International stocks need USD conversion
-            currency_amount = amount * 0.28  # Using a fixed rate for now
-            debug_print(f"Converting {amount} ILS to {currency_amount:.2f} USD using rate 0.28")
-        
-        # Handle date format conversion
-        if '-' in str(date):
-            # Convert from YYYY-MM-DD to DD/MM/YYYY
-            date_parts = str(date).split('-')
-            date = f"{date_parts[2]}/{date_parts[1]}/{date_parts[0]}"
-            debug_print(f"Converted date format from YYYY-MM-DD to DD/MM/YYYY: {date}")
+        # First try parsing with format detection
+        transactions_df['Date'] = pd.to_datetime(transactions_df['Date'], format='mixed', dayfirst=True, errors='coerce')
+        # Then convert all to a standard format
+        transactions_df['Date'] = transactions_df['Date'].dt.strftime('%Y-%m-%d')
+        debug_print("Successfully parsed dates with mixed format")
+    except Exception as e:
+        debug_print(f"Error in date parsing: {e}")
+        # Fallback method - handle each format separately
+        def parse_date(date_str):
+            if pd.isna(date_str):
+                return date_str
+            date_str = str(date_str)
+            try:
+                if '-' in date_str:  # YYYY-MM-DD
+                    return date_str
+                elif '/' in date_str:
+                    parts = date_str.split('/')
+                    if len(parts[0]) == 4:  # YYYY/MM/DD
+                        return date_str.replace('/', '-')
+                    else:  # DD/MM/YYYY
+                        return f"{parts[2]}-{parts[1]}-{parts[0]}"
+                return date_str
+            except Exception:
+                return date_str
         
+        transactions_df['Date'] = transactions_df['Date'].apply(parse_date)
+        debug_print("Used fallback date parsing method")
+    return transactions_df
+
+def get_stock_performance(ticker, date, amount, histories=None, current_prices=None, currency=BASE_CURRENCY,
+                          fx_rates=None):
+    """
+    Calculate stock performance for a given transaction.
+
+    Args:
+        ticker (str): Stock ticker symbol
+        date: Transaction date
+        amount (float): Transaction amount in its currency
+        histories (dict, optional): Ticker -> history frame from fetch_price_histories.
+            When omitted the ticker's history is fetched for this transaction only.
+        current_prices (dict, optional): Ticker -> current price cache shared across calls
+        currency (str): Currency of the amount, as a statement symbol (₪, $, €) or code
+        fx_rates (FXRates, optional): Exchange rates; defaults to the shared get_fx_rates()
+
+    Returns:
+        tuple: (percent change, value change in ILS), or (None, None) on failure
+    """
+    try:
         # Parse the date
-        try:
-            transaction_date = datetime.strptime(date, '%d/%m/%Y')
-        except ValueError:
-            try:
-                # Try alternative format YYYY/MM/DD
-                transaction_date = datetime.strptime(date, '%Y/%m/%d')
-            except ValueError:
-                debug_print(f"Error parsing date {date} with any known format")
-                return None, None
+        transaction_date = parse_transaction_date(date)
+        if transaction_date is None:
+            return None, None
         
         # Skip future dates
         if transaction_date > datetime.now():
             debug_print(f"Skipping future date: {date}")
             return None, None
-            
-        # Normalize date to YYYY-MM-DD for yfinance
-        normalized_date = transaction_date.strftime('%Y-%m-%d')
-        debug_print(f"Normalized date: {normalized_date}")
         
         # Get historical data
-        stock = yf.Ticker(ticker)
-        hist = stock.history(start=normalized_date, end=(datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d'))
+        if histories is None:
+            histories = fetch_price_histories({ticker: transaction_date})
+        hist = histories.get(ticker)
         
-        if hist.empty:
+        if hist is None or hist.empty:
             debug_print(f"No historical data found for {ticker}")
             return None, None
-            
-        # Get the first available price after the transaction date
-        first_price = hist.iloc[0]['Close']
-        debug_print(f"Found historical price: ${first_price:.2f} on {hist.index[0].strftime('%Y-%m-%d')}")
         
-        # Get current price
-        current_price = stock.info.get('regularMarketPrice')
+        # The history ends today, so its last close is the current price
+        if current_prices is None:
+            current_prices = {}
+        if ticker not in current_prices:
+            current_prices[ticker] = fetch_current_prices([ticker], {ticker: hist}).get(ticker)
+        current_price = current_prices[ticker]
         if not current_price:
             debug_print(f"Could not get current price for {ticker}")
             return None, None
-        debug_print(f"Current price for {ticker}: ${current_price:.2f}")
         
-        # Calculate performance
-        shares = currency_amount / first_price
-        value_change = shares * (current_price - first_price)
-        percent_change = ((current_price - first_price) / first_price) * 100
-        
-        debug_print(f"Performance calculation: {shares:.4f} shares, value change: ${value_change:.2f}, percent change: {percent_change:.2f}%")
-        debug_print(f"  Performance calculated: {percent_change:.2f}%, {value_change:.2f} ₪")
+        # Calculate performance with the same engine as whole statements
+        performance = compute_performance([ticker], [transaction_date], [amount], [currency],
+                                          PricePanel.from_histories({ticker: hist}), {ticker: current_price}, fx_rates)
+        percent_change, value_change = performance.loc[0, ['Percent Change', 'Value Change (₪)']]
+        if pd.isna(percent_change):
+            debug_print(f"No historical data found for {ticker} after {transaction_date.strftime('%Y-%m-%d')}")
+            return None, None
         
         return percent_change, value_change
         
@@ -582,22 +508,10 @@ def find_company_transactions(df, company_name, aliases=None):
         mask = mask | df['Merchant'].str.lower().str.contains(r'\bpaypal\b|\bפייפאל\b|\bביט\b|\bbit\b', 
                                                             case=False, na=False, regex=True)
     
-    # Check for hebrew company names (handle RTL issues)
-    hebrew_company_mappings = {
-        'partner': ['פרטנר', 'רנטרפ'],
-        'cellcom': ['סלקום', 'םוקלס'],
-        'menora': ['מנורה', 'הרונמ', 'מבטחים', 'םיחטבמ'],
-        'discount': ['דיסקונט', 'טנוקסיד'],
-        'leumi': ['לאומי', 'ימואל'],
-        'hapoalim': ['הפועלים', 'םילעופה'],
-        'strauss': ['שטראוס', 'סוארטש'],
-        'el al': ['אל על', 'לע לא'],
-    }
-    
-    # Check for possible Hebrew names
+    # Check for possible Hebrew names (handle RTL issues)
     lower_company = company_name.lower()
-    if lower_company in hebrew_company_mappings:
-        for hebrew_name in hebrew_company_mappings[lower_company]:
+    if lower_company in HEBREW_COMPANY_MAPPINGS:
+        for hebrew_name in HEBREW_COMPANY_MAPPINGS[lower_company]:
             mask = mask | df['Merchant'].str.contains(hebrew_name, case=False, na=False, regex=False)
     
     results = df[mask].copy()
@@ -609,150 +523,341 @@ def find_company_transactions(df, company_name, aliases=None):
     
     return results
 
+def _alias_pattern(term):
+    """Turn a company alias into a literal pattern and how it must be delimited"""
+    # Aliases used to be regexes; a trailing quantifier only loosens the literal before it
+    if term.endswith('*'):
+        term = term[:-2]
+    elif term.endswith('+'):
+        term = term[:-1]
+    # Short terms must be standalone words or touch the ends of the merchant name
+    return term, SHORT_WORD if len(term) <= 3 else ANYWHERE
+
+_company_matcher = None
+
+def get_company_matcher():
+    """Build the merchant matcher for all known companies once and reuse it"""
+    global _company_matcher
+    if _company_matcher is not None:
+        return _company_matcher
+    
+    patterns = []
+    for company_info in INTERNATIONAL_COMPANIES + ISRAELI_COMPANIES:
+        company_name = company_info['name']
+        lower_company = company_name.lower()
+        
+        for term in [lower_company] + [alias.lower() for alias in company_info.get('aliases', [])]:
+            text, boundary = _alias_pattern(term)
+            patterns.append((text, company_name, boundary, False))
+        
+        for text, boundary in SPECIAL_COMPANY_PATTERNS.get(lower_company, []):
+            patterns.append((text, company_name, boundary, False))
+        
+        for hebrew_name in HEBREW_COMPANY_MAPPINGS.get(lower_company, []):
+            patterns.append((hebrew_name, company_name, ANYWHERE, False))
+        
+        for text in ISRAELI_FALLBACK_PATTERNS.get(company_name, []):
+            patterns.append((text, company_name, ANYWHERE, True))
+    
+    _company_matcher = MerchantMatcher(patterns, cache=get_resolution_cache('company_match', ALIAS_TABLES_VERSION))
+    debug_print(f"Built company matcher with {len(patterns)} patterns")
+    return _company_matcher
+
 def get_companies_with_transactions(transactions_df):
-    """Get a DataFrame of companies and their transactions."""
-    companies_data = []
+    """
+    Match the transactions' merchants to known companies.
+
+    Returns:
+        DataFrame: Match table (see match_table.build_match_table) with the
+            position of each matched transaction in transactions_df, the company,
+            ticker and exchange as categoricals, and the transaction's date,
+            amount and currency
+    """
+    if transactions_df is None or transactions_df.empty or 'Merchant' not in transactions_df.columns:
+        debug_print("No companies with transactions found")
+        return empty_match_table()
     
     debug_print(f"Transaction dataframe has {len(transactions_df)} rows with columns: {transactions_df.columns.tolist()}")
     
-    # Process international companies
-    for company_info in INTERNATIONAL_COMPANIES:
-        company_name = company_info['name']
-        ticker = company_info['ticker']
-        exchange = company_info['exchange']
-        aliases = company_info.get('aliases', [])
-        
-        try:
-            transactions = find_company_transactions(transactions_df, company_name, aliases)
-            
-            if not transactions.empty:
-                for _, trans in transactions.iterrows():
-                    companies_data.append({
-                        'Company': company_name,
-                        'Ticker': ticker,
-                        'Exchange': exchange,
-                        'Transaction': trans
-                    })
-                debug_print(f"Found {len(transactions)} transactions for {company_name} ({ticker})")
-        except Exception as e:
-            debug_print(f"Error processing {company_name}: {e}")
-            debug_print(traceback.format_exc())
+    # Tag every merchant with all matching companies in a single pass
+    with timed('company_matching', items=len(transactions_df)):
+        matches = get_company_matcher().match_merchants(transactions_df['Merchant'])
+    count('company_matches', len(matches))
+
+    # Merchants no known company matched are looked up in the ticker universe in one batch
+    matched_rows = {position for position, _ in matches}
+    unmatched = {position: merchant for position, merchant in enumerate(transactions_df['Merchant'])
+                 if position not in matched_rows and isinstance(merchant, str)}
+    universe_companies = {}
+    if unmatched:
+        with timed('universe_matching', items=len(unmatched)):
+            universe_matches = get_stock_tickers(unmatched.values())
+        found = [(position, universe_matches.get(merchant)) for position, merchant in unmatched.items()]
+        found = [(position, entry) for position, entry in found if entry]
+        matches.extend((position, entry['name']) for position, entry in found)
+        universe_companies = {entry['name']: (entry['ticker'], entry['exchange']) for _, entry in found}
+        count('universe_matches', len(found))
     
-    # Process Israeli companies - improved detection
-    for company_info in ISRAELI_COMPANIES:
-        company_name = company_info['name']
-        ticker = company_info['ticker']
-        exchange = 'TASE'  # Tel Aviv Stock Exchange
-        aliases = company_info.get('aliases', [])
-        
-        try:
-            # Enhanced debugging for TASE companies
-            debug_print(f"Searching for TASE company: {company_name} with aliases: {aliases}")
-            
-            # Look specifically for Hebrew text in the transaction description
-            transactions = find_company_transactions(transactions_df, company_name, aliases)
-            
-            # For Partner Communications - specific handling for "רנטרפ" appearing in statements
-            if company_name == 'Partner' and transactions.empty:
-                debug_print("Force processing special company: Partner with ticker PTNR.TA")
-                # Look for partner in any transaction with תקשורת (communications in Hebrew)
-                partner_mask = transactions_df['Merchant'].str.contains('תקשורת') & transactions_df['Merchant'].str.contains('פרטנר|רנטרפ|partner', case=False, regex=True)
-                transactions = transactions_df[partner_mask].copy()
-            
-            # For Cellcom - specific handling
-            if company_name == 'Cellcom' and transactions.empty:
-                debug_print("Force processing special company: Cellcom with ticker CEL.TA")
-                # Look for cellcom in any transaction with תקשורת שירות or סלקום
-                cellcom_mask = (transactions_df['Merchant'].str.contains('תקשורת שירות') | 
-                               transactions_df['Merchant'].str.contains('סלקום|םוקלס|cellcom', case=False, regex=True))
-                transactions = transactions_df[cellcom_mask].copy()
-            
-            # For Menora - specific handling
-            if company_name == 'Menora' and transactions.empty:
-                debug_print("Force processing special company: Menora with ticker MMHD.TA")
-                # Look for menora in any transaction with מבטחים
-                menora_mask = transactions_df['Merchant'].str.contains('מבטחים|םיחטבמ|מנורה|הרונמ|menora', case=False, regex=True)
-                transactions = transactions_df[menora_mask].copy()
-                
-            # For Yohananof - specific handling
-            if company_name == 'Yohananof' and transactions.empty:
-                debug_print("Force processing special company: Yohananof with ticker YHNF.TA")
-                # Look for Yohananof in any transaction with supermarket-related terms
-                yohananof_mask = (transactions_df['Merchant'].str.contains('יוחננוף|ףוננחוי', case=False, regex=True) | 
-                                 transactions_df['Merchant'].str.contains('סופר שוק|סופרמרקט|קוש רפוס', case=False, regex=True))
-                transactions = transactions_df[yohananof_mask].copy()
-            
-            if not transactions.empty:
-                for _, trans in transactions.iterrows():
-                    companies_data.append({
-                        'Company': company_name,
-                        'Ticker': ticker,
-                        'Exchange': exchange,
-                        'Transaction': trans
-                    })
-                debug_print(f"Found {len(transactions)} transactions for {company_name} ({ticker}) [TASE]")
-        except Exception as e:
-            debug_print(f"Error processing TASE company {company_name}: {e}")
-            debug_print(traceback.format_exc())
+    with timed('dataframe_assembly', items=len(matches)):
+        companies_df = build_match_table(transactions_df, matches, universe_companies)
     
-    # Create DataFrame from companies_data
-    if companies_data:
-        companies_df = pd.DataFrame(companies_data)
-        return companies_df
-    else:
+    if companies_df.empty:
         debug_print("No companies with transactions found")
-        return pd.DataFrame(columns=['Company', 'Ticker', 'Exchange', 'Transaction'])
+    return companies_df
 
-def calculate_investment_performance(companies_df):
-    """Calculate investment performance for companies based on transaction data."""
+@instrumented('performance_calculation')
+def calculate_investment_performance(companies_df, workers=None, histories=None, current_prices=None,
+                                     fx_rates=None, price_panel=None):
+    """
+    Calculate investment performance for companies based on transaction data.
+
+    Args:
+        companies_df (DataFrame): Output of get_companies_with_transactions
+        workers (int, optional): Number of tickers fetched concurrently.
+            Defaults to the PRICE_FETCH_WORKERS environment variable (1).
+        histories (dict, optional): Ticker -> history frame already fetched,
+            e.g. once for a whole batch of statements. Fetched here when omitted.
+        current_prices (dict, optional): Ticker -> current price to go with histories
+        fx_rates (FXRates, optional): Exchange rates; defaults to the shared get_fx_rates()
+        price_panel (PricePanel, optional): Closes of the matched tickers, e.g. the
+            session's from get_session_price_panel; built from histories when omitted
+
+    Returns:
+        DataFrame: One row per transaction with its value and percent change
+    """
     if companies_df is None or companies_df.empty:
         debug_print("No companies with transactions data provided")
         return pd.DataFrame()
     
-    results = []
-    
-    for _, row in companies_df.iterrows():
-        company_name = row['Company']
-        ticker = row['Ticker']
-        exchange = row['Exchange']
-        transaction = row['Transaction']
-        
-        try:
-            # Extract transaction date and amount
-            transaction_date = transaction['Date']
-            transaction_amount = transaction['Amount']
-            
-            debug_print(f"\nProcessing {company_name} ({ticker}) on {exchange}:")
-            debug_print(f"  Transaction date: {transaction_date}")
-            debug_print(f"  Transaction amount: {transaction_amount} ₪")
-            
-            # Calculate performance
-            percent_change, value_change = get_stock_performance(ticker, transaction_date, transaction_amount)
-            debug_print(f"  Performance calculated: {percent_change:.2f}%, {value_change:.2f} ₪")
-            
-            # Add to results
-            results.append({
-                'Company': company_name,
-                'Ticker': ticker,
-                'Exchange': exchange,
-                'Transaction Date': transaction_date,
-                'Amount (₪)': transaction_amount,
-                'Value Change (₪)': value_change,
-                'Percent Change': percent_change
-            })
-        except Exception as e:
-            debug_print(f"Error calculating performance for {company_name}: {e}")
-            debug_print(traceback.format_exc())
-    
-    if not results:
-        # Return empty DataFrame with expected columns
-        return pd.DataFrame(columns=[
-            'Company', 'Ticker', 'Exchange', 'Transaction Date', 'Amount (₪)', 
-            'Value Change (₪)', 'Percent Change'
-        ])
-    
-    # Convert results to DataFrame
-    return pd.DataFrame(results)
+    if price_panel is None:
+        if histories is None:
+            # Download each ticker's history once, starting at its earliest transaction
+            start_dates = collect_start_dates(zip(companies_df['Ticker'], companies_df['Date']))
+            debug_print(f"Fetching price history for {len(start_dates)} tickers across {len(companies_df)} transactions")
+            histories = fetch_price_histories(start_dates, workers=workers)
+        price_panel = PricePanel.from_histories(histories)
+    if current_prices is None:
+        current_prices = {}
+    # Current prices not looked up yet are the panel's last closes, or one bulk quote call
+    missing = [ticker for ticker in price_panel.tickers if ticker not in current_prices]
+    if missing:
+        quotes = get_quote_service()
+        quotes.remember(price_panel.last_closes(), as_of=price_panel.built_at)
+        current_prices = dict(current_prices)
+        current_prices.update(dict.fromkeys(missing))
+        current_prices.update(quotes.quotes(missing))
+
+    performance = compute_performance(companies_df['Ticker'], companies_df['Date'], companies_df['Amount'],
+                                      companies_df['Currency'].fillna('₪'), price_panel, current_prices, fx_rates)
+    performance.index = companies_df.index
+
+    valued = performance['Percent Change'].notna()
+    count('performance_skipped', int((~valued).sum()))
+    results = pd.DataFrame({
+        'Company': companies_df['Company'].astype(object),
+        'Ticker': companies_df['Ticker'].astype(object),
+        'Exchange': companies_df['Exchange'].astype(object),
+        'Transaction Date': companies_df['Date'].dt.strftime('%Y-%m-%d'),
+    }).join(performance)
+    return results[valued].reset_index(drop=True)
+
+def get_session_price_panel(companies_df, workers=None):
+    """
+    Price panel of the matched tickers, built once per Streamlit session.
+
+    The panel is rebuilt when a statement brings a ticker or an earlier
+    transaction date the session's panel does not cover, and on the first
+    use after the day it was built on, so a session left open overnight
+    values with the new day's closes.
+    """
+    start_dates = collect_start_dates(zip(companies_df['Ticker'], companies_df['Date']))
+    cached = st.session_state.get('price_panel')
+    if cached is not None:
+        covered, panel, built_on = cached
+        if built_on != datetime.now().date():
+            debug_print(f"Price panel was built on {built_on}, rebuilding")
+        elif all(ticker in covered and covered[ticker] <= start for ticker, start in start_dates.items()):
+            return panel
+        # Keep covering what the session already loaded
+        for ticker, start in covered.items():
+            start_dates[ticker] = min(start, start_dates.get(ticker, start))
+
+    debug_print(f"Building price panel for {len(start_dates)} tickers")
+    histories = fetch_price_histories(start_dates, workers=workers)
+    panel = PricePanel.from_histories(histories)
+    st.session_state['price_panel'] = (covered_start_dates(start_dates, histories), panel, datetime.now().date())
+    return panel
+
+def covered_start_dates(start_dates, histories):
+    """Start dates of the tickers whose history was fetched; failed tickers are fetched again next time"""
+    return {ticker: start for ticker, start in start_dates.items() if ticker in histories}
+
+def seed_session_price_panel(start_dates, histories):
+    """Start the session's price panel from the prices fetched while a statement was parsed"""
+    if st.session_state.get('price_panel') is None and histories:
+        st.session_state['price_panel'] = (covered_start_dates(start_dates, histories),
+                                           PricePanel.from_histories(histories), datetime.now().date())
+
+def show_live_summary(placeholder, transactions_df, fetcher):
+    """Show running totals for the matched transactions whose prices have arrived so far"""
+    if 'Ticker' not in transactions_df.columns:
+        return
+    matched = transactions_df[transactions_df['Ticker'].notna()]
+    histories = dict(fetcher.histories)
+    priced = matched[matched['Ticker'].isin(list(histories))]
+
+    with placeholder.container():
+        col1, col2, col3 = st.columns(3)
+        col3.metric("Tickers priced", f"{len(histories)} of {matched['Ticker'].nunique()}")
+        if priced.empty:
+            return
+        currencies = priced['Currency'].fillna('₪') if 'Currency' in priced.columns else '₪'
+        performance = compute_performance(priced['Ticker'], priced['Date'], priced['Amount'], currencies,
+                                          PricePanel.from_histories(histories), dict(fetcher.current_prices))
+        valued = performance.dropna()
+        col1.metric("Invested so far", f"₪{valued['Amount (₪)'].sum():,.2f}")
+        col2.metric("Value change so far", f"₪{valued['Value Change (₪)'].sum():,.2f}")
+
+def update_ledger(pdf_bytes, transactions_df, workers=None):
+    """
+    Append a statement to the ledger, matching and valuing only the transactions new to it.
+
+    Matches left unvalued by an earlier update (no price history at the time)
+    are valued again along with the new ones.
+
+    Returns:
+        Ledger: The updated ledger, or None when the ledger is disabled
+    """
+    ledger = get_ledger()
+    if ledger is None:
+        return None
+
+    with timed('ledger_append', items=len(transactions_df)):
+        new_rows = ledger.append(statement_key(pdf_bytes, PARSER_VERSION), transactions_df,
+                                 match=get_companies_with_transactions)
+    count('ledger_new_transactions', len(new_rows))
+
+    pending = ledger.unvalued_matches()
+    if not pending.empty:
+        price_panel = get_session_price_panel(pending, workers=workers)
+        with timed('ledger_valuation', items=len(pending)):
+            purchases = compute_purchases(pending['Ticker'], pending['Date'], pending['Amount'],
+                                          pending['Currency'], price_panel)
+            ledger.record_valuations(pending, purchases)
+    return ledger
+
+def show_ledger(ledger, workers=None):
+    """Show the performance of every statement in the ledger together"""
+    stats = ledger.stats()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Statements", stats['statements'])
+    col2.metric("Transactions", f"{stats['transactions']:,}")
+    col3.metric("Period", f"{stats['first_date']} – {stats['last_date']}" if stats['transactions'] else "–")
+
+    holdings = ledger.holdings()
+    if holdings.empty:
+        st.info("No matched transactions in your ledger yet.")
+        return
+    current_prices = fetch_current_prices(holdings['Ticker'].unique())
+    performance = ledger.performance(current_prices)
+    st.dataframe(
+        performance,
+        column_config={
+            "Amount (₪)": st.column_config.NumberColumn("Amount (₪)", format="₪%.2f"),
+            "Value Change (₪)": st.column_config.NumberColumn("Value Change (₪)", format="₪%.2f"),
+            "Current Value (₪)": st.column_config.NumberColumn("Current Value (₪)", format="₪%.2f"),
+            "Percent Change": st.column_config.NumberColumn("Percent Change", format="%.2f%%"),
+        },
+        hide_index=True,
+    )
+    if stats['unvalued']:
+        st.caption(f"{stats['unvalued']} matched transactions have no price history yet and are left out.")
+
+def show_value_curves(performance_data, price_panel, max_default=5):
+    """Chart the value of selected purchases since the day they were made"""
+    labels = (performance_data['Company'] + ' · ' + performance_data['Transaction Date'] + ' · ₪'
+              + performance_data['Amount (₪)'].map('{:,.2f}'.format))
+    largest = performance_data['Amount (₪)'].nlargest(max_default).index
+    selected = st.multiselect("Purchases to chart", options=list(labels.index),
+                              default=list(largest), format_func=labels.get)
+    if not selected:
+        return
+
+    # Curves are computed only for the purchases picked here
+    rows = performance_data.loc[selected]
+    with timed('value_curves', items=len(rows)):
+        curves = price_panel.value_curves(rows['Ticker'], rows['Transaction Date'], rows['Amount (₪)'],
+                                          labels.loc[selected])
+    if curves.empty:
+        st.info("No price history to chart for these purchases.")
+        return
+
+    fig = px.line(curves, x='Date', y='Value (₪)', color='Transaction')
+    fig.update_layout(legend_title_text=None, hovermode='x unified')
+    st.plotly_chart(fig, use_container_width=True)
+
+def show_portfolio_history(performance_data, price_panel, max_companies=8):
+    """Chart the daily value, cost basis, drawdown and per-company gains of buying on every purchase"""
+    with timed('portfolio_simulation', items=len(performance_data)):
+        daily, contributions = simulate_portfolio(performance_data['Ticker'], performance_data['Transaction Date'],
+                                                  performance_data['Amount (₪)'], price_panel,
+                                                  groups=performance_data['Company'])
+    if daily.empty:
+        st.info("No price history to simulate a portfolio with.")
+        return
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=daily.index, y=daily['Value (₪)'], name='Portfolio value'))
+    fig.add_trace(go.Scatter(x=daily.index, y=daily['Cost Basis (₪)'], name='Amount invested',
+                             line={'dash': 'dot'}))
+    fig.update_layout(yaxis_title='₪', hovermode='x unified')
+    st.plotly_chart(fig, use_container_width=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        fig = px.area(daily.reset_index(), x='Date', y='Drawdown (%)', title='Drawdown')
+        st.plotly_chart(fig, use_container_width=True)
+    with col2:
+        # Companies with the largest gains or losses today, the rest summed as Other
+        latest = contributions.iloc[-1].abs().sort_values(ascending=False)
+        shown = contributions[latest.index[:max_companies]]
+        if len(latest) > max_companies:
+            shown = shown.assign(Other=contributions[latest.index[max_companies:]].sum(axis=1))
+        long_form = shown.reset_index().melt(id_vars='Date', var_name='Company', value_name='Gain (₪)')
+        fig = px.area(long_form, x='Date', y='Gain (₪)', color='Company', title='Gain by company')
+        st.plotly_chart(fig, use_container_width=True)
+
+def show_diagnostics():
+    """Show how much work the caches saved and, when instrumentation is on, where time went"""
+    with st.expander("🔧 Diagnostics"):
+        parse_stats = get_parse_cache().stats()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Statement cache hit rate", f"{parse_stats['hit_rate']:.0%}")
+        col2.metric("Statements cached", parse_stats['size'])
+        col3.metric("Parse time saved", f"{parse_stats['saved_seconds']:.2f}s")
+
+        quote_stats = get_quote_service().stats()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Quote cache hit rate", f"{quote_stats['hit_rate']:.0%}")
+        col2.metric("Quotes cached", quote_stats['size'])
+        col3.metric("Bulk quote calls", quote_stats['bulk_calls'])
+
+        cached_panel = st.session_state.get('price_panel')
+        if cached_panel is not None:
+            panel = cached_panel[1]
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Price panel", f"{len(panel.dates)} days x {len(panel.tickers)} tickers")
+            col2.metric("Price panel memory", f"{panel.memory_bytes / 1e6:.2f} MB")
+            col3.metric("Price panel build time", f"{panel.build_seconds * 1000:.0f} ms")
+
+        resolution_stats = pd.DataFrame(get_resolution_cache_stats().values())
+        if not resolution_stats.empty:
+            st.dataframe(resolution_stats, hide_index=True)
+
+        # Stage timings are only recorded with INSTRUMENTATION=1
+        stage_stats = instrumentation.summary()
+        if stage_stats:
+            st.dataframe(pd.DataFrame.from_dict(stage_stats, orient='index').rename_axis('Stage'))
 
 def main():
     st.set_page_config(
@@ -761,6 +866,10 @@ def main():
         layout="wide"
     )
 
+    # Expose stage counters to Prometheus when a metrics port is configured
+    if os.environ.get('METRICS_PORT'):
+        instrumentation.start_metrics_server(int(os.environ['METRICS_PORT']))
+
     # Custom CSS for better mobile responsiveness and UI
     st.markdown("""
         <style>
@@ -809,55 +918,53 @@ def main():
     uploaded_file = st.file_uploader("Upload your credit card statement (PDF)", type="pdf")
     if uploaded_file is not None:
         try:
-            with st.spinner('Processing your statement...'):
-                # Get transactions from the PDF
-                transactions_result = extract_transactions(uploaded_file)
-                if isinstance(transactions_result, tuple):
-                    transactions_df, debug_info = transactions_result
-                else:
-                    transactions_df = transactions_result
-                    debug_info = None
+            # Get transactions from the PDF, showing them page by page as they are parsed
+            # Prices are fetched in the background as soon as a page names a ticker
+            progress = st.progress(0.0, text="Reading your statement...")
+            live_summary = st.empty()
+            preview = st.empty()
+            page_frames = []
+            found_so_far = pd.DataFrame()
+            fetcher = AsyncPriceFetcher()
+            refreshed = 0.0
+            for event in iter_statement_events(stream_transactions(uploaded_file), fetcher):
+                if event[0] == 'page':
+                    _, page_number, page_count, page_df = event
+                    page_frames.append(page_df)
+                    progress.progress((page_number + 1) / page_count,
+                                      text=f"Parsed page {page_number + 1} of {page_count}")
+                    found_so_far = pd.concat(page_frames, ignore_index=True)
+                    if 'Company' in found_so_far.columns:
+                        preview.dataframe(found_so_far[found_so_far['Company'].notna()], hide_index=True)
+                elif time.perf_counter() - refreshed > LIVE_REFRESH_SECONDS:
+                    show_live_summary(live_summary, found_so_far, fetcher)
+                    refreshed = time.perf_counter()
+            progress.empty()
+            live_summary.empty()
+            preview.empty()
+            seed_session_price_panel(fetcher.start_dates, fetcher.histories)
+            
+            transactions_df = pd.concat(page_frames, ignore_index=True) if page_frames else pd.DataFrame()
+            transactions_df = transactions_df.drop(columns=['Company', 'Ticker'], errors='ignore')
 
             if transactions_df is None or len(transactions_df) == 0:
                 st.error("No transactions found in the PDF. Please make sure you uploaded a valid credit card statement.")
                 return
 
-            # Update date parsing logic to handle both formats (YYYY-MM-DD and DD/MM/YYYY)
-            try:
-                # First try parsing with format detection
-                transactions_df['Date'] = pd.to_datetime(transactions_df['Date'], format='mixed', dayfirst=True, errors='coerce')
-                # Then convert all to a standard format
-                transactions_df['Date'] = transactions_df['Date'].dt.strftime('%Y-%m-%d')
-                debug_print("Successfully parsed dates with mixed format")
-            except Exception as e:
-                debug_print(f"Error in date parsing: {e}")
-                # Fallback method - handle each format separately
-                def parse_date(date_str):
-                    if pd.isna(date_str):
-                        return date_str
-                    date_str = str(date_str)
-                    try:
-                        if '-' in date_str:  # YYYY-MM-DD
-                            return date_str
-                        elif '/' in date_str:
-                            parts = date_str.split('/')
-                            if len(parts[0]) == 4:  # YYYY/MM/DD
-                                return date_str.replace('/', '-')
-                            else:  # DD/MM/YYYY
-                                return f"{parts[2]}-{parts[1]}-{parts[0]}"
-                        return date_str
-                    except Exception:
-                        return date_str
-                
-                transactions_df['Date'] = transactions_df['Date'].apply(parse_date)
-                debug_print("Used fallback date parsing method")
+            transactions_df = normalize_transaction_dates(transactions_df)
+            ledger = update_ledger(read_pdf_bytes(uploaded_file), transactions_df)
 
             # Get companies and their transactions
             companies_with_transactions = get_companies_with_transactions(transactions_df)
+            save_resolution_caches()
+            debug_print(f"Resolution cache stats: {get_resolution_cache_stats()}")
             
             if not companies_with_transactions.empty:
                 # Calculate performance for each company
-                performance_data = calculate_investment_performance(companies_with_transactions)
+                price_panel = get_session_price_panel(companies_with_transactions)
+                performance_data = calculate_investment_performance(companies_with_transactions,
+                                                                    current_prices=dict(fetcher.current_prices),
+                                                                    price_panel=price_panel)
 
                 if not performance_data.empty:
                     # Add Current Value column
@@ -881,12 +988,13 @@ def main():
                     st.subheader("Investment Performance")
                     
                     # Group by company
-                    company_performance = performance_data.groupby(['Company', 'Ticker', 'Exchange']).agg({
-                        'Amount (₪)': 'sum',
-                        'Value Change (₪)': 'sum',
-                        'Current Value (₪)': 'sum',
-                        'Percent Change': lambda x: (x * performance_data.loc[x.index, 'Amount (₪)']).sum() / performance_data.loc[x.index, 'Amount (₪)'].sum()
-                    }).reset_index()
+                    # Percent change weighted by amount, as summed products over summed amounts
+                    company_performance = performance_data.assign(
+                        **{'Percent Change': performance_data['Percent Change'] * performance_data['Amount (₪)']}
+                    ).groupby(['Company', 'Ticker', 'Exchange'])[
+                        ['Amount (₪)', 'Value Change (₪)', 'Current Value (₪)', 'Percent Change']
+                    ].sum().reset_index()
+                    company_performance['Percent Change'] /= company_performance['Amount (₪)']
                     
                     # Configure the DataFrame display
                     st.dataframe(
@@ -920,6 +1028,12 @@ def main():
                             hide_index=True,
                         )
 
+                    st.subheader("Value Since Purchase")
+                    show_value_curves(performance_data, price_panel)
+
+                    st.subheader("Portfolio Over Time")
+                    show_portfolio_history(performance_data, price_panel)
+
                     # Display all transactions
                     st.subheader("All Transactions")
                     
@@ -939,6 +1053,12 @@ def main():
             else:
                 st.warning("No public companies found in your transactions. We're continuously improving our company detection!")
 
+            if ledger is not None:
+                st.subheader("All Your Statements")
+                show_ledger(ledger)
+
+            show_diagnostics()
+
         except Exception as e:
             st.error(f"An error occurred while processing your statement: {str(e)}")
             debug_print(f"Error processing uploaded file: {e}")
@@ -946,7 +1066,7 @@ def main():
 if __name__ == "__main__":
     main()
 
-# Footer
-st.markdown('<hr style="border: 0; height: 1px; background: #ccc; margin: 20px 0;">', unsafe_allow_html=True)
-st.markdown("<div style='text-align: center;'>Vibe coded with ❤️ by <a href='https://razkaplan.github.io/gtm/' "
-"target='_blank'>Raz Kaplan</a> | <a href='https://www.linkedin.com/in/razkaplan/' target='_blank'>LinkedIn</a></div>", unsafe_allow_html=True)
\ No newline at end of file
+    # Footer
+    st.markdown('<hr style="border: 0; height: 1px; background: #ccc; margin: 20px 0;">', unsafe_allow_html=True)
+    st.markdown("<div style='text-align: center;'>Vibe coded with ❤️ by <a href='https://razkaplan.github.io/gtm/' "
+                "target='_blank'>Raz Kaplan</a> | <a href='https://www.linkedin.com/in/razkaplan/' target='_blank'>LinkedIn</a></div>", unsafe_allow_html=True)
\ No newline at end of file
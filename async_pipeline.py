@@ -0,0 +1,247 @@
+"""
+Asyncio orchestration of statement parsing and price fetching.
+
+Pages are parsed on a worker thread while an event loop starts fetching
+each ticker's history and current price the moment a page names it, so
+network waits overlap with parsing the rest of the statement and one slow
+ticker only delays its own results. Callers consume a single stream of
+events, a parsed page or a ticker's prices, in the order they happen.
+
+The Streamlit script runs synchronously, so iter_statement_events runs the
+loop on a background thread and hands the events back through a queue.
+Any PriceSource works as the price server, so a StaticPriceSource with
+latency stands in for Yahoo Finance in tests and benchmarks.
+"""
+import asyncio
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import pandas as pd
+from debug_utils import debug_print
+from price_cache import get_default_price_source
+from price_engine import FETCH_BACKOFF, FETCH_RETRIES, FETCH_TIMEOUT, fetch_market_price, parse_transaction_date
+from quote_service import get_quote_service, last_closes
+
+ASYNC_FETCH_CONCURRENCY = int(os.environ.get('ASYNC_FETCH_CONCURRENCY', '8'))  # Tickers fetched at once
+
+
+class AsyncPriceFetcher:
+    """
+    Fetches each ticker's history and current price once, as tickers are requested.
+
+    Fetched data collects in the histories, current_prices and start_dates
+    dicts, ready for PricePanel.from_histories and calculate_investment_performance.
+
+    Args:
+        source (PriceSource, optional): Where histories are read from; defaults to
+            the persistent price cache in front of Yahoo Finance
+        current_price (callable, optional): Called with a ticker to get its current price;
+            by default it is the last close of the fetched history, or a quote from
+            the shared quote service when there is none
+        concurrency (int): Tickers fetched at the same time
+        timeout (float): Seconds allowed per call attempt
+        retries (int): Extra attempts after a failed call
+    """
+
+    def __init__(self, source=None, current_price=None, concurrency=ASYNC_FETCH_CONCURRENCY,
+                 timeout=FETCH_TIMEOUT, retries=FETCH_RETRIES):
+        self.source = source or get_default_price_source()
+        self.current_price = current_price
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.histories = {}
+        self.current_prices = {}
+        self.start_dates = {}
+        self._queued = set()
+        self._executor = None
+        self._semaphore = None
+
+    def request(self, ticker, start):
+        """
+        Start fetching a ticker from a date, unless it is already fetched from that date or earlier.
+
+        A fetch still waiting for a free slot just moves its start date back.
+        Must be called on the running event loop.
+
+        Returns:
+            Task: Resolves to (ticker, history or None, current price or None), or None
+                if nothing new had to be fetched
+        """
+        if ticker in self.start_dates and self.start_dates[ticker] <= start:
+            return None
+        self.start_dates[ticker] = start
+        if ticker in self._queued:
+            return None
+        self._queued.add(ticker)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='price-fetch')
+        return asyncio.get_running_loop().create_task(self._fetch(ticker))
+
+    def close(self):
+        """Release the fetch threads; calls still running finish in the background"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = self._semaphore = None
+
+    async def _fetch(self, ticker):
+        async with self._semaphore:
+            self._queued.discard(ticker)
+            start = self.start_dates[ticker]
+            hist = await self._call(self.source.history, ticker, start, datetime.now() + timedelta(days=1))
+            if ticker not in self.current_prices:
+                self.current_prices[ticker] = await self._current_price(ticker, hist)
+
+        # A later request from an earlier date supersedes this one
+        if self.start_dates.get(ticker) == start and hist is not None and not hist.empty:
+            self.histories[ticker] = hist
+        elif hist is not None and hist.empty:
+            debug_print(f"No historical data found for {ticker}")
+        return ticker, hist, self.current_prices.get(ticker)
+
+    async def _current_price(self, ticker, hist):
+        if self.current_price is not None:
+            return await self._call(self.current_price, ticker)
+        closes = last_closes({ticker: hist})
+        if closes:
+            get_quote_service().remember(closes)
+            return closes[ticker]
+        return await self._call(fetch_market_price, ticker)
+
+    async def _call(self, func, ticker, *args):
+        """Run a blocking call on the fetch threads with a timeout, retrying with exponential backoff"""
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            try:
+                return await asyncio.wait_for(loop.run_in_executor(self._executor, func, ticker, *args),
+                                              self.timeout or None)
+            except Exception as e:
+                if attempt == self.retries:
+                    debug_print(f"Giving up on {ticker}: {e!r}")
+                    return None
+                delay = FETCH_BACKOFF * (2 ** attempt)
+                debug_print(f"Attempt {attempt + 1} failed for {ticker}: {e!r}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+
+def _page_start_dates(page_df, parsed_dates):
+    """
+    Earliest past transaction date of a page, overall and per matched ticker.
+
+    Statements repeat the same few hundred dates, so each distinct date string
+    is parsed once and remembered in parsed_dates.
+    """
+    now = datetime.now()
+    page_start, ticker_starts = None, {}
+    for ticker, date in zip(page_df['Ticker'], page_df['Date']):
+        if date not in parsed_dates:
+            parsed_dates[date] = parse_transaction_date(date)
+        day = parsed_dates[date]
+        if day is None or pd.isna(day) or day > now:
+            continue
+        if page_start is None or day < page_start:
+            page_start = day
+        if isinstance(ticker, str) and (ticker not in ticker_starts or day < ticker_starts[ticker]):
+            ticker_starts[ticker] = day
+    return page_start, ticker_starts
+
+
+def _prices_event(task, ticker):
+    if task.cancelled() or task.exception() is not None:
+        debug_print(f"Fetching {ticker} failed: {'cancelled' if task.cancelled() else repr(task.exception())}")
+        return 'prices', ticker, None, None
+    return ('prices',) + task.result()
+
+
+async def stream_statement_events(pages, fetcher):
+    """
+    Parse pages on a worker thread and fetch prices for their tickers as they appear.
+
+    Args:
+        pages (iterable): (page number, page count, page DataFrame) tuples with
+            Date and Ticker columns, e.g. from app.stream_transactions
+        fetcher (AsyncPriceFetcher): Fetches the tickers the pages name
+
+    Yields:
+        tuple: ('page', page number, page count, page DataFrame) for every page, and
+            ('prices', ticker, history or None, current price or None) for every
+            fetch, in the order they complete. Ends once every page is parsed and
+            every fetch has finished.
+    """
+    events = asyncio.Queue()
+    statement_start = None
+    parsed_dates = {}
+
+    async def parse():
+        nonlocal statement_start
+        iterator = iter(pages)
+        while (page := await asyncio.to_thread(next, iterator, None)) is not None:
+            page_number, page_count, page_df = page
+            if 'Ticker' in page_df.columns:
+                # Tickers are fetched from the statement's earliest date seen so far, so a
+                # ticker named again on a later page rarely needs a second fetch
+                page_start, ticker_starts = _page_start_dates(page_df, parsed_dates)
+                if page_start is not None and (statement_start is None or page_start < statement_start):
+                    statement_start = page_start
+                for ticker, start in ticker_starts.items():
+                    task = fetcher.request(ticker, min(start, statement_start))
+                    if task is not None:
+                        events.put_nowait(('fetching',))
+                        task.add_done_callback(lambda done, ticker=ticker: events.put_nowait(_prices_event(done, ticker)))
+            events.put_nowait(('page', page_number, page_count, page_df))
+
+    parsing = asyncio.create_task(parse())
+    parsing.add_done_callback(lambda _: events.put_nowait(('parsed',)))
+    fetching = 0
+    parsed = False
+    try:
+        while not parsed or fetching:
+            event = await events.get()
+            if event[0] == 'fetching':
+                fetching += 1
+            elif event[0] == 'parsed':
+                parsed = True
+                parsing.result()  # Re-raises a parsing error
+            else:
+                if event[0] == 'prices':
+                    fetching -= 1
+                yield event
+    finally:
+        fetcher.close()
+
+
+def iter_statement_events(pages, fetcher=None):
+    """
+    Run stream_statement_events on a background event loop and yield its events here.
+
+    Args:
+        pages (iterable): Page tuples as for stream_statement_events
+        fetcher (AsyncPriceFetcher, optional): Defaults to one reading the persistent price cache
+
+    Yields:
+        tuple: The events of stream_statement_events
+    """
+    fetcher = fetcher or AsyncPriceFetcher()
+    events = queue.Queue()
+    finished = object()
+
+    async def forward():
+        async for event in stream_statement_events(pages, fetcher):
+            events.put(event)
+
+    def run():
+        try:
+            asyncio.run(forward())
+        except Exception as e:
+            events.put(('error', e))
+        finally:
+            events.put(finished)
+
+    threading.Thread(target=run, name='statement-events', daemon=True).start()
+    while (event := events.get()) is not finished:
+        if event[0] == 'error':
+            raise event[1]
+        yield event
@@ -0,0 +1,317 @@
+"""
+Process a batch of credit card statements without the Streamlit UI.
+
+Usage:
+    python batch_cli.py statements/ --output-dir results/
+    python batch_cli.py "statements/2024-*.pdf" --workers 8 --format csv
+
+Statements are parsed and matched to companies in a pool of worker
+processes. Price histories for every ticker found in the batch are then
+fetched once, through the shared price cache, and used for the performance
+of all statements. Output goes to the output directory:
+
+    transactions.<fmt>  every transaction, with File, Company and Ticker columns
+    performance.<fmt>   value and percent change per matched transaction, with a File column
+    report.csv          per-file status, counts, stage timings and errors
+    ledger.<fmt>        with --ledger, per-company performance over every statement in the ledger
+
+With --ledger, statements already in the ledger are skipped without being
+parsed, and only transactions new to the ledger are matched and valued.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import debug_utils
+import instrumentation
+from debug_utils import debug_print
+from app import (
+    calculate_investment_performance, classify_transactions, extract_transactions,
+    get_companies_with_transactions, normalize_transaction_dates
+)
+from ledger import Ledger
+from match_table import match_table_memory
+from parse_cache import statement_key
+from pdf_extraction import PARSER_VERSION
+from performance_engine import compute_purchases
+from price_panel import PricePanel
+from price_engine import collect_start_dates, fetch_current_prices, fetch_price_histories
+
+DEFAULT_WORKERS = min(os.cpu_count() or 1, 8)
+
+
+def find_statements(inputs):
+    """
+    Expand directories and glob patterns into a sorted list of PDF paths.
+
+    Args:
+        inputs (list): Directories, glob patterns or PDF paths
+
+    Returns:
+        list: Unique PDF paths in sorted order
+    """
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.update(glob.glob(os.path.join(item, '**', '*.pdf'), recursive=True))
+            paths.update(glob.glob(os.path.join(item, '**', '*.PDF'), recursive=True))
+        else:
+            paths.update(path for path in glob.glob(item, recursive=True) if os.path.isfile(path))
+    return sorted(paths)
+
+
+def _init_worker(debug, metrics):
+    debug_utils.DEBUG_MODE = debug
+    instrumentation.enable(metrics)
+
+
+def process_statement(path):
+    """
+    Extract and match one statement; runs in a worker process.
+
+    Returns:
+        dict: file, status, error, transactions and companies frames, the
+            seconds spent on each stage and the instrumentation counters
+    """
+    result = {'file': path, 'status': 'ok', 'error': None,
+              'transactions': None, 'companies': None,
+              'extract_seconds': 0.0, 'match_seconds': 0.0, 'counters': {}}
+    instrumentation.reset()
+
+    try:
+        with open(path, 'rb') as f:
+            if not f.read(1024).lstrip().startswith(b'%PDF'):
+                raise ValueError("not a PDF file")
+
+        start = time.perf_counter()
+        # One process per statement already, so pages are parsed sequentially
+        transactions_df, _ = extract_transactions(path, workers=1)
+        result['extract_seconds'] = time.perf_counter() - start
+
+        if transactions_df.empty:
+            result['status'] = 'empty'
+            return result
+
+        start = time.perf_counter()
+        transactions_df = normalize_transaction_dates(transactions_df)
+        result['companies'] = get_companies_with_transactions(transactions_df)
+        result['transactions'] = classify_transactions(transactions_df)
+        result['match_seconds'] = time.perf_counter() - start
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = f"{type(e).__name__}: {e}"
+        debug_print(traceback.format_exc())
+
+    result['counters'] = instrumentation.snapshot()
+    return result
+
+
+def _has_matches(result):
+    return result['companies'] is not None and not result['companies'].empty
+
+
+def write_frame(df, path_without_extension, output_format):
+    """Write a frame as Parquet or CSV, falling back to CSV when pyarrow is missing"""
+    if output_format == 'parquet':
+        try:
+            df.to_parquet(path_without_extension + '.parquet', index=False)
+            return path_without_extension + '.parquet'
+        except ImportError as e:
+            print(f"Parquet output unavailable ({e}), writing CSV instead", file=sys.stderr)
+    df.to_csv(path_without_extension + '.csv', index=False, encoding='utf-8-sig')
+    return path_without_extension + '.csv'
+
+
+def update_ledger(ledger, results, keys, histories):
+    """
+    Append the batch's statements to a ledger, then match and value only the transactions new to it.
+
+    Returns:
+        int: Transactions added to the ledger
+    """
+    added = 0
+    for result in results:
+        if result['transactions'] is None:
+            continue
+        new_rows = ledger.append(keys[result['file']], result['transactions'], match=get_companies_with_transactions)
+        added += len(new_rows)
+
+    pending = ledger.unvalued_matches()
+    if not pending.empty:
+        purchases = compute_purchases(pending['Ticker'], pending['Date'], pending['Amount'], pending['Currency'],
+                                      PricePanel.from_histories(histories))
+        ledger.record_valuations(pending, purchases)
+    return added
+
+
+def run_batch(paths, output_dir, workers=DEFAULT_WORKERS, price_workers=None, output_format='parquet',
+              debug=False, metrics=False, ledger=None):
+    """
+    Process statements and write the consolidated output.
+
+    Args:
+        paths (list): PDF paths
+        output_dir (str): Directory for the output files
+        workers (int): Worker processes for extraction and matching
+        price_workers (int, optional): Tickers fetched concurrently; defaults to PRICE_FETCH_WORKERS
+        output_format (str): 'parquet' or 'csv'
+        debug (bool): Keep debug_print output on in the workers
+        metrics (bool): Record stage counters and write them to metrics.prom
+        ledger (Ledger, optional): Ledger to append the statements to; statements
+            already in it are not processed again
+
+    Returns:
+        DataFrame: The per-file report
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    instrumentation.enable(metrics)
+
+    keys, known = {}, []
+    if ledger is not None:
+        for path in paths:
+            with open(path, 'rb') as f:
+                keys[path] = statement_key(f.read(), PARSER_VERSION)
+        known = [path for path in paths if ledger.has_statement(keys[path])]
+        paths = [path for path in paths if path not in known]
+        print(f"Skipping {len(known)} statements already in the ledger")
+
+    # Extraction and matching are CPU bound, one statement per task
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(paths)),
+                                 initializer=_init_worker, initargs=(debug, metrics)) as executor:
+            results = list(executor.map(process_statement, paths))
+    else:
+        results = [process_statement(path) for path in paths]
+
+    # Counters from the workers (or from this process, reset per statement) are summed here
+    instrumentation.reset()
+    for result in results:
+        instrumentation.merge(result['counters'])
+
+    for result in results:
+        print(f"{result['status']:>5}  {result['file']}  "
+              f"({result['extract_seconds']:.2f}s extract, {result['match_seconds']:.2f}s match)"
+              + (f"  {result['error']}" if result['error'] else ''))
+
+    # Fetch every ticker of the batch once, from its earliest transaction in any statement
+    start = time.perf_counter()
+    matched = [result for result in results if _has_matches(result)]
+    start_dates = collect_start_dates(
+        pair for result in matched for pair in zip(result['companies']['Ticker'], result['companies']['Date'])
+    )
+    histories = fetch_price_histories(start_dates, workers=price_workers)
+    current_prices = dict.fromkeys(histories)
+    current_prices.update(fetch_current_prices(histories, histories))
+    fetch_seconds = time.perf_counter() - start
+    print(f"Fetched prices for {len(histories)} of {len(start_dates)} tickers in {fetch_seconds:.2f}s")
+
+    if ledger is not None:
+        added = update_ledger(ledger, results, keys, histories)
+        print(f"Added {added} new transactions to the ledger ({ledger.stats()['transactions']} in total)")
+
+    transaction_frames, performance_frames, report_rows = [], [], []
+    for result in results:
+        performance_seconds = 0.0
+        performance_count = 0
+        if _has_matches(result):
+            start = time.perf_counter()
+            try:
+                performance_df = calculate_investment_performance(
+                    result['companies'], histories=histories, current_prices=current_prices
+                )
+                performance_df.insert(0, 'File', result['file'])
+                performance_frames.append(performance_df)
+                performance_count = len(performance_df)
+            except Exception as e:
+                result['status'] = 'error'
+                result['error'] = f"{type(e).__name__}: {e}"
+            performance_seconds = time.perf_counter() - start
+
+        if result['transactions'] is not None:
+            transactions_df = result['transactions']
+            transactions_df.insert(0, 'File', result['file'])
+            transaction_frames.append(transactions_df)
+
+        report_rows.append({
+            'File': result['file'],
+            'Status': result['status'],
+            'Transactions': 0 if result['transactions'] is None else len(result['transactions']),
+            'Matches': 0 if result['companies'] is None else len(result['companies']),
+            'Match Table Bytes': 0 if result['companies'] is None else match_table_memory(result['companies']),
+            'Performance Rows': performance_count,
+            'Extract Seconds': result['extract_seconds'],
+            'Match Seconds': result['match_seconds'],
+            'Performance Seconds': performance_seconds,
+            'Error': result['error'],
+        })
+
+    report_rows.extend({'File': path, 'Status': 'known', 'Transactions': 0, 'Matches': 0, 'Match Table Bytes': 0,
+                        'Performance Rows': 0, 'Extract Seconds': 0.0, 'Match Seconds': 0.0,
+                        'Performance Seconds': 0.0, 'Error': None} for path in known)
+
+    if transaction_frames:
+        print(f"Wrote {write_frame(pd.concat(transaction_frames, ignore_index=True), os.path.join(output_dir, 'transactions'), output_format)}")
+    if performance_frames:
+        print(f"Wrote {write_frame(pd.concat(performance_frames, ignore_index=True), os.path.join(output_dir, 'performance'), output_format)}")
+
+    if ledger is not None:
+        holdings = ledger.holdings()
+        # Tickers quoted for this batch come from the quote cache
+        ledger_prices = fetch_current_prices(holdings['Ticker'])
+        print(f"Wrote {write_frame(ledger.performance(ledger_prices), os.path.join(output_dir, 'ledger'), output_format)}")
+
+    report_df = pd.DataFrame(report_rows)
+    print(f"Match tables: {report_df['Matches'].sum()} matches in "
+          f"{report_df['Match Table Bytes'].sum() / 1e6:.2f} MB")
+    report_df.to_csv(os.path.join(output_dir, 'report.csv'), index=False, encoding='utf-8-sig')
+    print(f"Wrote {os.path.join(output_dir, 'report.csv')}")
+
+    if metrics:
+        with open(os.path.join(output_dir, 'metrics.prom'), 'w', encoding='utf-8') as f:
+            f.write(instrumentation.prometheus_text())
+        for stage, stats in instrumentation.summary().items():
+            print(f"  {stage:<28} {stats['calls']:>7} calls {stats['items']:>9} items {stats['seconds']:>9.3f}s")
+        print(f"Wrote {os.path.join(output_dir, 'metrics.prom')}")
+    return report_df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process a batch of credit card statement PDFs")
+    parser.add_argument('inputs', nargs='+', help="Directories, glob patterns or PDF files")
+    parser.add_argument('-o', '--output-dir', default='batch_output', help="Directory for the output files")
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_WORKERS,
+                        help="Worker processes for extraction and matching")
+    parser.add_argument('--price-workers', type=int, default=None,
+                        help="Tickers fetched concurrently (default: PRICE_FETCH_WORKERS)")
+    parser.add_argument('-f', '--format', choices=['parquet', 'csv'], default='parquet',
+                        help="Output format for transactions and performance")
+    parser.add_argument('--ledger', metavar='PATH',
+                        help="SQLite ledger to append the statements to, skipping statements already in it")
+    parser.add_argument('--debug', action='store_true', help="Print debug output")
+    parser.add_argument('--metrics', action='store_true',
+                        help="Record per-stage timings and counters and write them to metrics.prom")
+    args = parser.parse_args(argv)
+
+    debug_utils.DEBUG_MODE = args.debug
+
+    paths = find_statements(args.inputs)
+    if not paths:
+        print("No PDF files found", file=sys.stderr)
+        return 1
+    print(f"Processing {len(paths)} statements on {args.workers} processes")
+
+    start = time.perf_counter()
+    report_df = run_batch(paths, args.output_dir, workers=args.workers, price_workers=args.price_workers,
+                          output_format=args.format, debug=args.debug, metrics=args.metrics,
+                          ledger=Ledger(args.ledger) if args.ledger else None)
+    failed = int((report_df['Status'] == 'error').sum())
+    print(f"Done in {time.perf_counter() - start:.2f}s: {len(report_df) - failed} processed, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
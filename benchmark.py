@@ -0,0 +1,611 @@
+"""
+Offline throughput benchmark of the statement pipeline.
+
+Generates synthetic Israeli-format statements (mixed Hebrew and English
+merchants, "₪ amount ₪ amount description DD/MM/YYYY" lines), runs them
+through extraction, company matching, price fetching against a stub price
+source and the performance calculation, and reports per-stage throughput
+and peak memory. Results are written as JSON so runs can be compared.
+
+Usage:
+    python benchmark.py --pages 1 10 100 500
+    python benchmark.py --pages 50 --price-latency 0.05 --baseline benchmark_results/previous.json
+"""
+import os
+import tempfile
+
+# Benchmarks start cold and must not read or pollute the app's persistent caches
+_CACHE_DIR = tempfile.mkdtemp(prefix='expense-benchmark-')
+os.environ['PARSE_CACHE_DIR'] = ''
+os.environ['RESOLUTION_CACHE_DIR'] = _CACHE_DIR
+os.environ['PRICE_CACHE_PATH'] = os.path.join(_CACHE_DIR, 'prices.sqlite')
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pymupdf
+import debug_utils
+from app import (
+    calculate_investment_performance, extract_transactions, get_companies_with_transactions,
+    normalize_transaction_dates, stream_transactions
+)
+from async_pipeline import AsyncPriceFetcher, iter_statement_events
+from company_data import INTERNATIONAL_COMPANIES, ISRAELI_COMPANIES
+from line_parser import LineParser
+from statement_formats import available_formats, detect_format, get_format
+from parse_cache import get_parse_cache
+from match_table import match_table_memory
+from performance_engine import compute_performance
+from price_panel import PricePanel
+from portfolio_simulator import simulate_portfolio
+from pdf_extraction import EXTRACTION_BACKEND
+from fx_rates import FX_TICKERS, FXRates
+from price_cache import StaticPriceSource
+from price_engine import collect_start_dates, fetch_price_histories
+from resolution_cache import clear_resolution_caches
+
+DEFAULT_FONT_PATH = os.environ.get('BENCHMARK_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_results')
+LINES_PER_PAGE = 40
+
+# Merchants as they appear in a statement's text layer: known companies in
+# English and Hebrew, merchants that match nothing, and payment-method lines
+# the parser has to filter out
+SYNTHETIC_MERCHANTS = [
+    'NETFLIX.COM', 'GOOGLE*YOUTUBE', 'AMAZON MKTP US', 'SPOTIFY P123', 'ALIEXPRESS',
+    'STARBUCKS 1234', 'UBER *TRIP', 'APPLE.COM/BILL', 'MICROSOFT*STORE', 'ZARA TEL AVIV',
+    'סלקום', 'פרטנר תקשורת', 'מנורה מבטחים', 'שטראוס', 'אל על', 'יוחננוף',
+    'שופרסל דיל', 'רמי לוי', 'קפה נמרוד', 'COFFEE SHOP', 'PIZZERIA ROMA', 'SUPER-PHARM 45',
+    'PAYPAL *STORE', 'BANK TRANSFER',
+]
+HEADER_LINE = 'תויביר ךותמ םוכס רושיאל'
+
+
+def synthetic_line(rng):
+    """One transaction line as it reads in a statement's text layer"""
+    amount = f"{rng.uniform(5, 2500):,.2f}"
+    return (f"₪ {amount} ₪ {amount} {rng.choice(SYNTHETIC_MERCHANTS)} "
+            f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.choice((2023, 2024))}")
+
+
+def synthetic_us_card_line(rng):
+    """A US Visa/Mastercard line: transaction and posting dates, description, amount"""
+    month, day = rng.randint(1, 12), rng.randint(1, 28)
+    return f"{month:02d}/{day:02d} {month:02d}/{day:02d} {rng.choice(SYNTHETIC_MERCHANTS)} {rng.uniform(5, 900):,.2f}"
+
+
+def synthetic_amex_line(rng):
+    """An American Express line: full date, description, dollar amount"""
+    return (f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/24 {rng.choice(SYNTHETIC_MERCHANTS)} "
+            f"${rng.uniform(5, 900):,.2f}")
+
+
+# First-page header and line generator of every format the benchmark covers
+FORMAT_SAMPLES = {
+    'israeli': (HEADER_LINE, synthetic_line),
+    'us_card': ("Visa Signature   Opening/Closing Date 12/05/24 - 01/04/25   New Balance $1,234.56",
+                synthetic_us_card_line),
+    'amex': ("American Express   Closing Date 01/04/25   Membership Rewards", synthetic_amex_line),
+}
+
+
+def generate_statement(pages, seed=0, font_path=DEFAULT_FONT_PATH):
+    """
+    Generate a synthetic statement PDF.
+
+    Args:
+        pages (int): Number of pages, each with a header and LINES_PER_PAGE transaction lines
+        seed (int): Random seed, so the same arguments always produce the same statement
+        font_path (str): TrueType font covering Hebrew and the shekel sign
+
+    Returns:
+        bytes: The PDF
+    """
+    rng = random.Random(seed)
+    document = pymupdf.open()
+    for _ in range(pages):
+        page = document.new_page()
+        page.insert_font(fontname='statement', fontfile=font_path)
+        page.insert_text((40, 40), HEADER_LINE, fontname='statement', fontsize=9)
+        y = 60
+        for _ in range(LINES_PER_PAGE):
+            page.insert_text((40, y), synthetic_line(rng), fontname='statement', fontsize=9)
+            y += 18
+    pdf_bytes = document.tobytes()
+    document.close()
+    return pdf_bytes
+
+
+def make_stub_histories(tickers, start='2022-01-01', seed=0):
+    """Random-walk daily closes for every ticker, from start to today"""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start, datetime.now().date())
+    histories = {}
+    for ticker in tickers:
+        closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates))))
+        histories[ticker] = pd.DataFrame({'Open': closes, 'High': closes, 'Low': closes,
+                                          'Close': closes, 'Volume': 0}, index=dates)
+    return histories
+
+
+def _measure(func, repeat, reset=None):
+    """
+    Time func over several runs, then run it once more under tracemalloc.
+
+    Returns:
+        tuple: (result of the last run, median seconds, peak traced memory in MB)
+    """
+    timings = []
+    for _ in range(repeat):
+        if reset:
+            reset()
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+
+    # Memory is traced in its own run since tracing slows everything down
+    if reset:
+        reset()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return result, statistics.median(timings), peak / 1e6
+
+
+def _reset_caches():
+    get_parse_cache().clear()
+    clear_resolution_caches()
+
+
+def _stage(seconds, peak_mb, **counts):
+    stage = {'seconds': seconds, 'peak_mb': peak_mb}
+    for name, count in counts.items():
+        stage[name] = count
+        stage[f'{name}_per_sec'] = count / seconds if seconds else None
+    return stage
+
+
+def benchmark_statement(pages, repeat=3, workers=1, price_latency=0.0, font_path=DEFAULT_FONT_PATH):
+    """
+    Run one synthetic statement through every pipeline stage.
+
+    Args:
+        pages (int): Statement length
+        repeat (int): Timed runs per stage; the median is reported
+        workers (int): Processes for extraction and threads for price fetching
+        price_latency (float): Seconds the stub price source sleeps per ticker
+        font_path (str): Font for the generated statement
+
+    Returns:
+        dict: Per-stage seconds, throughput and peak memory
+    """
+    start = time.perf_counter()
+    pdf_bytes = generate_statement(pages, font_path=font_path)
+    generate_seconds = time.perf_counter() - start
+
+    (transactions_df, _), extract_seconds, extract_mb = _measure(
+        lambda: extract_transactions(pdf_bytes, workers=workers), repeat, reset=_reset_caches)
+    transactions_df = normalize_transaction_dates(transactions_df)
+    transaction_count = len(transactions_df)
+
+    companies_df, match_seconds, match_mb = _measure(
+        lambda: get_companies_with_transactions(transactions_df), repeat, reset=_reset_caches)
+
+    tickers = [info['ticker'] for info in INTERNATIONAL_COMPANIES + ISRAELI_COMPANIES]
+    start_dates = collect_start_dates(zip(companies_df['Ticker'], companies_df['Date']))
+
+    source = StaticPriceSource(make_stub_histories(tickers), latency=price_latency)
+
+    def fetch():
+        return fetch_price_histories(start_dates, source=source, workers=workers)
+
+    histories, fetch_seconds, fetch_mb = _measure(fetch, repeat)
+    current_prices = {ticker: float(hist['Close'].iloc[-1]) for ticker, hist in histories.items()}
+    # Random walks around 3.7 shekels per unit
+    fx_rates = FXRates(StaticPriceSource(
+        {ticker: hist * 0.037 for ticker, hist in make_stub_histories(FX_TICKERS.values(), seed=1).items()}))
+
+    performance_df, performance_seconds, performance_mb = _measure(
+        lambda: calculate_investment_performance(companies_df, histories=histories,
+                                                 current_prices=current_prices, fx_rates=fx_rates), repeat)
+
+    return {
+        'pages': pages,
+        'transactions': transaction_count,
+        'matches': len(companies_df),
+        'pdf_bytes': len(pdf_bytes),
+        'generate_seconds': generate_seconds,
+        'stages': {
+            'extract': _stage(extract_seconds, extract_mb, pages=pages, transactions=transaction_count),
+            'match': dict(_stage(match_seconds, match_mb, transactions=transaction_count),
+                          latency_us=match_seconds / transaction_count * 1e6 if transaction_count else None,
+                          table_mb=match_table_memory(companies_df) / 1e6),
+            'fetch_prices': _stage(fetch_seconds, fetch_mb, tickers=len(start_dates)),
+            'performance': _stage(performance_seconds, performance_mb, rows=len(performance_df)),
+        },
+    }
+
+
+def benchmark_async_pipeline(pages, price_latency=0.1, repeat=3, font_path=DEFAULT_FONT_PATH):
+    """
+    How much price fetching the async pipeline hides behind parsing.
+
+    A stub price server waits price_latency seconds per history and per
+    current price. Parsing alone, fetching alone (over pages parsed up front)
+    and both overlapped are timed separately.
+
+    Returns:
+        dict: Page count, latency, parse, fetch and overlapped seconds, and the
+            share of fetch time hidden behind parsing
+    """
+    pdf_bytes = generate_statement(pages, font_path=font_path)
+    tickers = [info['ticker'] for info in INTERNATIONAL_COMPANIES + ISRAELI_COMPANIES]
+    histories = make_stub_histories(tickers)
+
+    def make_fetcher():
+        def current_price(ticker):
+            time.sleep(price_latency)
+            return float(histories[ticker]['Close'].iloc[-1])
+        return AsyncPriceFetcher(StaticPriceSource(histories, latency=price_latency), current_price=current_price)
+
+    def run(pages_source):
+        start = time.perf_counter()
+        for _ in iter_statement_events(pages_source(), make_fetcher()):
+            pass
+        return time.perf_counter() - start
+
+    parse, fetch, overlapped = [], [], []
+    for _ in range(repeat):
+        _reset_caches()
+        start = time.perf_counter()
+        parsed_pages = list(stream_transactions(pdf_bytes))
+        parse.append(time.perf_counter() - start)
+        fetch.append(run(lambda: parsed_pages))
+        _reset_caches()
+        overlapped.append(run(lambda: stream_transactions(pdf_bytes)))
+
+    parse_seconds, fetch_seconds = statistics.median(parse), statistics.median(fetch)
+    overlapped_seconds = statistics.median(overlapped)
+    hidden = (parse_seconds + fetch_seconds - overlapped_seconds) / fetch_seconds if fetch_seconds else 0.0
+    return {'pages': pages, 'price_latency': price_latency, 'parse_seconds': parse_seconds,
+            'fetch_seconds': fetch_seconds, 'overlapped_seconds': overlapped_seconds,
+            'fetch_hidden': max(0.0, min(1.0, hidden))}
+
+
+def benchmark_line_parser(lines=10000, repeat=3, seed=0):
+    """
+    Per-line cost of the transaction line parser, without any PDF work.
+
+    Cold runs use a fresh parser; warm runs reuse one whose per-description
+    memos are already filled, as on the later pages of a statement.
+
+    Returns:
+        dict: Line count and cold and warm seconds, microseconds per line and lines/sec
+    """
+    rng = random.Random(seed)
+    text = '\n'.join([HEADER_LINE] + [synthetic_line(rng) for _ in range(lines)])
+
+    cold, warm = [], []
+    for _ in range(repeat):
+        parser = LineParser()
+        start = time.perf_counter()
+        parser.parse_text(text)
+        cold.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        parser.parse_text(text)
+        warm.append(time.perf_counter() - start)
+
+    result = {'lines': lines}
+    for name, timings in (('cold', cold), ('warm', warm)):
+        seconds = statistics.median(timings)
+        result[name] = {'seconds': seconds, 'us_per_line': seconds / lines * 1e6, 'lines_per_sec': lines / seconds}
+    return result
+
+
+def benchmark_performance_engine(rows=50000, repeat=3, seed=0):
+    """
+    Cost of valuing many matched transactions at once, without any fetching.
+
+    Returns:
+        dict: Row count, seconds, microseconds per row and rows/sec
+    """
+    rng = np.random.default_rng(seed)
+    tickers = [info['ticker'] for info in INTERNATIONAL_COMPANIES + ISRAELI_COMPANIES]
+    histories = make_stub_histories(tickers)
+    current_prices = {ticker: float(hist['Close'].iloc[-1]) for ticker, hist in histories.items()}
+    fx_rates = FXRates(StaticPriceSource(
+        {ticker: hist * 0.037 for ticker, hist in make_stub_histories(FX_TICKERS.values(), seed=1).items()}))
+
+    days = pd.bdate_range('2022-01-03', datetime.now().date())
+    row_tickers = rng.choice(tickers, rows)
+    dates = days[rng.integers(0, len(days), rows)].strftime('%Y-%m-%d')
+    amounts = rng.uniform(5, 900, rows)
+    currencies = rng.choice(['₪', '$', '€'], rows, p=[0.8, 0.15, 0.05])
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compute_performance(row_tickers, dates, amounts, currencies, PricePanel.from_histories(histories),
+                            current_prices, fx_rates)
+        timings.append(time.perf_counter() - start)
+
+    seconds = statistics.median(timings)
+    return {'rows': rows, 'seconds': seconds, 'us_per_row': seconds / rows * 1e6, 'rows_per_sec': rows / seconds}
+
+
+def benchmark_price_panel(tickers=500, curves=100, repeat=3, seed=0):
+    """
+    Build time and memory of a ten-year price panel, and the cost of value curves on it.
+
+    Returns:
+        dict: Panel shape, build seconds, MB before and after the filled copies, and ms per curve
+    """
+    rng = np.random.default_rng(seed)
+    start = (pd.Timestamp.now() - pd.DateOffset(years=10)).strftime('%Y-%m-%d')
+    histories = make_stub_histories([f'T{index}' for index in range(tickers)], start=start, seed=seed)
+
+    timings = []
+    for _ in range(repeat):
+        panel = PricePanel.from_histories(histories)
+        timings.append(panel.build_seconds)
+    base_mb = panel.memory_bytes / 1e6
+
+    purchase_tickers = rng.choice(panel.tickers, curves)
+    purchase_dates = panel.dates[rng.integers(0, len(panel.dates), curves)]
+    begin = time.perf_counter()
+    for ticker, date in zip(purchase_tickers, purchase_dates):
+        panel.value_curve(ticker, date, 100.0)
+    curve_seconds = time.perf_counter() - begin
+
+    return {'days': len(panel.dates), 'tickers': len(panel.tickers), 'build_seconds': statistics.median(timings),
+            'base_mb': base_mb, 'filled_mb': panel.memory_bytes / 1e6, 'curves': curves,
+            'ms_per_curve': curve_seconds / curves * 1000}
+
+
+def benchmark_portfolio(buys=5000, repeat=3, seed=0):
+    """
+    Cost of simulating ten years of daily portfolio history from many buys of every known ticker.
+
+    Returns:
+        dict: Buy count, days, holdings, seconds and buys/sec
+    """
+    rng = np.random.default_rng(seed)
+    start = (pd.Timestamp.now() - pd.DateOffset(years=10)).strftime('%Y-%m-%d')
+    companies = INTERNATIONAL_COMPANIES + ISRAELI_COMPANIES
+    panel = PricePanel.from_histories(make_stub_histories({info['ticker'] for info in companies}, start=start))
+    fx_rates = FXRates(StaticPriceSource(
+        {ticker: hist * 0.037 for ticker, hist in make_stub_histories(FX_TICKERS.values(), start, seed=1).items()}))
+
+    picks = rng.integers(0, len(companies), buys)
+    tickers = np.array([companies[pick]['ticker'] for pick in picks], dtype=object)
+    names = np.array([companies[pick]['name'] for pick in picks], dtype=object)
+    dates = panel.dates[rng.integers(0, len(panel.dates), buys)].strftime('%Y-%m-%d')
+    amounts = rng.uniform(5, 900, buys)
+
+    timings = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        daily, contributions = simulate_portfolio(tickers, dates, amounts, panel, groups=names, fx_rates=fx_rates)
+        timings.append(time.perf_counter() - begin)
+
+    seconds = statistics.median(timings)
+    return {'buys': buys, 'days': len(daily), 'holdings': contributions.shape[1], 'seconds': seconds,
+            'buys_per_sec': buys / seconds}
+
+
+def benchmark_formats(lines=10000, repeat=3, seed=0):
+    """
+    Detection latency and parsing throughput of every registered statement format.
+
+    Detection runs on a first page (header plus LINES_PER_PAGE lines) and
+    must pick the format the page was generated for.
+
+    Returns:
+        dict: Format name -> detected format, detection ms and parse us/line and lines/sec
+    """
+    results = {}
+    for name in available_formats():
+        if name not in FORMAT_SAMPLES:
+            continue
+        header, make_line = FORMAT_SAMPLES[name]
+        rng = random.Random(seed)
+        first_page = '\n'.join([header] + [make_line(rng) for _ in range(LINES_PER_PAGE)])
+        text = '\n'.join([header] + [make_line(rng) for _ in range(lines)])
+
+        detect_timings, parse_timings = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            detected = detect_format(first_page)
+            detect_timings.append(time.perf_counter() - start)
+
+            parser = get_format(name, first_page)
+            start = time.perf_counter()
+            transactions, _ = parser.parse_text(text)
+            parse_timings.append(time.perf_counter() - start)
+
+        parse_seconds = statistics.median(parse_timings)
+        results[name] = {
+            'detected': detected.name,
+            'detect_ms': statistics.median(detect_timings) * 1000,
+            'lines': lines,
+            'transactions': len(transactions),
+            'seconds': parse_seconds,
+            'us_per_line': parse_seconds / lines * 1e6,
+            'lines_per_sec': lines / parse_seconds,
+        }
+    return results
+
+
+def print_results(results, baseline=None):
+    """Print one line per statement size and stage, with the speedup over a baseline run"""
+    baseline_runs = {run['pages']: run for run in baseline['runs']} if baseline else {}
+    print(f"{'pages':>6} {'stage':<13} {'seconds':>9} {'peak MB':>8}  throughput")
+    for run in results['runs']:
+        for name, stage in run['stages'].items():
+            rates = ', '.join(f"{stage[key]:,.0f} {key[:-len('_per_sec')]}/s"
+                              for key in stage if key.endswith('_per_sec') and stage[key])
+            if name == 'match' and stage['latency_us']:
+                rates += f", {stage['latency_us']:.1f} us/transaction, match table {stage['table_mb']:.2f} MB"
+            line = f"{run['pages']:>6} {name:<13} {stage['seconds']:>9.4f} {stage['peak_mb']:>8.1f}  {rates}"
+            previous = baseline_runs.get(run['pages'], {}).get('stages', {}).get(name)
+            if previous and stage['seconds']:
+                line += f"  ({previous['seconds'] / stage['seconds']:.2f}x vs baseline)"
+            print(line)
+
+    for name, run in results.get('formats', {}).items():
+        line = (f"{run['lines']:>6} format:{name:<9} {run['seconds']:>6.4f}s  {run['us_per_line']:.2f} us/line, "
+                f"{run['lines_per_sec']:,.0f} lines/s, detected {run['detected']} in {run['detect_ms']:.2f} ms")
+        previous = (baseline or {}).get('formats', {}).get(name)
+        if previous and run['seconds']:
+            line += f"  ({previous['seconds'] / run['seconds']:.2f}x vs baseline)"
+        print(line)
+
+    if 'performance_engine' in results:
+        run = results['performance_engine']
+        line = (f"{run['rows']:>6} performance_engine {run['seconds']:>6.4f}s  "
+                f"{run['us_per_row']:.2f} us/row, {run['rows_per_sec']:,.0f} rows/s")
+        previous = (baseline or {}).get('performance_engine')
+        if previous and run['seconds']:
+            line += f"  ({previous['seconds'] / run['seconds']:.2f}x vs baseline)"
+        print(line)
+
+    if 'price_panel' in results:
+        run = results['price_panel']
+        line = (f"{run['tickers']:>6} price_panel {run['build_seconds']:>6.4f}s  {run['days']} days, "
+                f"{run['base_mb']:.1f} MB ({run['filled_mb']:.1f} MB filled), "
+                f"{run['ms_per_curve']:.2f} ms/curve over {run['curves']} curves")
+        previous = (baseline or {}).get('price_panel')
+        if previous and run['build_seconds']:
+            line += f"  ({previous['build_seconds'] / run['build_seconds']:.2f}x vs baseline)"
+        print(line)
+
+    if 'portfolio' in results:
+        run = results['portfolio']
+        line = (f"{run['buys']:>6} portfolio {run['seconds']:>6.4f}s  {run['days']} days x {run['holdings']} companies, "
+                f"{run['buys_per_sec']:,.0f} buys/s")
+        previous = (baseline or {}).get('portfolio')
+        if previous and run['seconds']:
+            line += f"  ({previous['seconds'] / run['seconds']:.2f}x vs baseline)"
+        print(line)
+
+    if 'async_pipeline' in results:
+        run = results['async_pipeline']
+        line = (f"{run['pages']:>6} async_pipeline {run['overlapped_seconds']:>6.4f}s  parse {run['parse_seconds']:.4f}s "
+                f"+ fetch {run['fetch_seconds']:.4f}s at {run['price_latency'] * 1000:.0f} ms latency, "
+                f"{run['fetch_hidden']:.0%} of fetching hidden behind parsing")
+        previous = (baseline or {}).get('async_pipeline')
+        if previous and run['overlapped_seconds']:
+            line += f"  ({previous['overlapped_seconds'] / run['overlapped_seconds']:.2f}x vs baseline)"
+        print(line)
+
+    if 'line_parser' in results:
+        parser_result = results['line_parser']
+        for name in ('cold', 'warm'):
+            run = parser_result[name]
+            line = (f"{parser_result['lines']:>6} line_parser:{name:<4} {run['seconds']:>6.4f}s  "
+                    f"{run['us_per_line']:.2f} us/line, {run['lines_per_sec']:,.0f} lines/s")
+            previous = (baseline or {}).get('line_parser', {}).get(name)
+            if previous and run['seconds']:
+                line += f"  ({previous['seconds'] / run['seconds']:.2f}x vs baseline)"
+            print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the statement pipeline on synthetic statements")
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 10, 100],
+                        help="Statement lengths to benchmark (1-500 pages)")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per stage")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Extraction processes and price fetch threads")
+    parser.add_argument('--price-latency', type=float, default=0.0,
+                        help="Seconds the stub price source waits per ticker")
+    parser.add_argument('--lines', type=int, default=10000,
+                        help="Lines for the line parser and statement format microbenchmarks, 0 to skip them")
+    parser.add_argument('--rows', type=int, default=50000,
+                        help="Matched transactions for the performance engine microbenchmark, 0 to skip it")
+    parser.add_argument('--panel-tickers', type=int, default=500,
+                        help="Tickers in the ten-year price panel microbenchmark, 0 to skip it")
+    parser.add_argument('--buys', type=int, default=5000,
+                        help="Buys in the ten-year portfolio simulation microbenchmark, 0 to skip it")
+    parser.add_argument('--async-pages', type=int, default=50,
+                        help="Statement length for the async parse/fetch overlap benchmark, 0 to skip it")
+    parser.add_argument('--async-latency', type=float, default=0.1,
+                        help="Seconds the stub price server waits per call in the async benchmark")
+    parser.add_argument('--font', default=DEFAULT_FONT_PATH, help="TrueType font with Hebrew glyphs")
+    parser.add_argument('--output', help="JSON file for the results (default: benchmark_results/<timestamp>.json)")
+    parser.add_argument('--baseline', help="Earlier results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    if any(pages < 1 or pages > 500 for pages in args.pages):
+        parser.error("--pages must be between 1 and 500")
+    if not os.path.exists(args.font):
+        parser.error(f"Font not found: {args.font} (set --font or BENCHMARK_FONT)")
+
+    debug_utils.DEBUG_MODE = False
+
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': {'repeat': args.repeat, 'workers': args.workers, 'price_latency': args.price_latency,
+                   'backend': EXTRACTION_BACKEND},
+        'runs': [],
+    }
+    for pages in args.pages:
+        print(f"Benchmarking a {pages}-page statement...", file=sys.stderr)
+        results['runs'].append(benchmark_statement(pages, repeat=args.repeat, workers=args.workers,
+                                                   price_latency=args.price_latency, font_path=args.font))
+
+    if args.async_pages:
+        print(f"Benchmarking the async pipeline on a {args.async_pages}-page statement...", file=sys.stderr)
+        results['async_pipeline'] = benchmark_async_pipeline(args.async_pages, price_latency=args.async_latency,
+                                                             repeat=args.repeat, font_path=args.font)
+
+    if args.lines:
+        print(f"Benchmarking the line parser on {args.lines} lines...", file=sys.stderr)
+        results['line_parser'] = benchmark_line_parser(args.lines, repeat=args.repeat)
+        print(f"Benchmarking statement formats on {args.lines} lines each...", file=sys.stderr)
+        results['formats'] = benchmark_formats(args.lines, repeat=args.repeat)
+
+    if args.rows:
+        print(f"Benchmarking the performance engine on {args.rows} transactions...", file=sys.stderr)
+        results['performance_engine'] = benchmark_performance_engine(args.rows, repeat=args.repeat)
+
+    if args.panel_tickers:
+        print(f"Benchmarking a price panel of {args.panel_tickers} tickers...", file=sys.stderr)
+        results['price_panel'] = benchmark_price_panel(args.panel_tickers, repeat=args.repeat)
+
+    if args.buys:
+        print(f"Benchmarking a portfolio simulation of {args.buys} buys...", file=sys.stderr)
+        results['portfolio'] = benchmark_portfolio(args.buys, repeat=args.repeat)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    output = args.output or os.path.join(
+        DEFAULT_OUTPUT_DIR, f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
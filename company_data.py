@@ -0,0 +1,128 @@
+import hashlib
+import json
+from merchant_matcher import ANYWHERE, WORD
+from ticker_universe import UNIVERSE_PATH
+
+# Constants for company information
+INTERNATIONAL_COMPANIES = [
+    {'name': 'Netflix', 'ticker': 'NFLX', 'exchange': 'NASDAQ', 'aliases': ['netflix', 'netflix.com']},
+    {'name': 'Google', 'ticker': 'GOOGL', 'exchange': 'NASDAQ', 'aliases': ['google', 'youtube', 'alphabet', 'google*']},
+    {'name': 'Alibaba', 'ticker': 'BABA', 'exchange': 'NYSE', 'aliases': ['ali', 'aliexpress', 'alibaba']},
+    {'name': 'Amazon', 'ticker': 'AMZN', 'exchange': 'NASDAQ', 'aliases': ['amazon', 'aws', 'kindle', 'amazon prime']},
+    {'name': 'Apple', 'ticker': 'AAPL', 'exchange': 'NASDAQ', 'aliases': ['apple', 'itunes', 'apple store', 'icloud']},
+    {'name': 'Microsoft', 'ticker': 'MSFT', 'exchange': 'NASDAQ', 'aliases': ['microsoft', 'xbox', 'ms', 'msft', 'azure']},
+    {'name': 'Meta', 'ticker': 'META', 'exchange': 'NASDAQ', 'aliases': ['meta', 'facebook', 'instagram', 'fb', 'whatsapp']},
+    {'name': 'Tesla', 'ticker': 'TSLA', 'exchange': 'NASDAQ', 'aliases': ['tesla', 'tsla']},
+    {'name': 'Disney', 'ticker': 'DIS', 'exchange': 'NYSE', 'aliases': ['disney', 'disney+', 'disneyplus']},
+    {'name': 'PayPal', 'ticker': 'PYPL', 'exchange': 'NASDAQ', 'aliases': ['paypal', 'pay pal']},
+    {'name': 'Uber', 'ticker': 'UBER', 'exchange': 'NYSE', 'aliases': ['uber', 'uber eats']},
+    {'name': 'Spotify', 'ticker': 'SPOT', 'exchange': 'NYSE', 'aliases': ['spotify', 'spot']}
+]
+
+ISRAELI_COMPANIES = [
+    {'name': 'Partner', 'ticker': 'PTNR.TA', 'aliases': ['פרטנר', 'partner', 'פרטנר תקשורת']},
+    {'name': 'Cellcom', 'ticker': 'CEL.TA', 'aliases': ['סלקום', 'cellcom', 'סלקום ישראל']},
+    {'name': 'Menora', 'ticker': 'MMHD.TA', 'aliases': ['מנורה', 'menora', 'מבטחים', 'מנורה מבטחים']},
+    {'name': 'Bank Leumi', 'ticker': 'LUMI.TA', 'aliases': ['לאומי', 'leumi', 'בנק לאומי']},
+    {'name': 'Bank Hapoalim', 'ticker': 'POLI.TA', 'aliases': ['פועלים', 'hapoalim', 'בנק הפועלים']},
+    {'name': 'Bank Discount', 'ticker': 'DSCT.TA', 'aliases': ['דיסקונט', 'discount', 'בנק דיסקונט']},
+    {'name': 'Strauss', 'ticker': 'STRS.TA', 'aliases': ['שטראוס', 'strauss', 'שטראוס גרופ']},
+    {'name': 'Meitav', 'ticker': 'MTDS.TA', 'aliases': ['מיטב', 'meitav', 'מיטב דש', 'מיטב-דש']},
+    {'name': 'El Al', 'ticker': 'ELAL.TA', 'aliases': ['אל על', 'elal', 'el al', 'אל-על']},
+    {'name': 'Yohananof', 'ticker': 'YHNF.TA', 'aliases': ['יוחננוף', 'yohananof', 'יוחננוף ובניו']}
+]
+
+# List of known company names and their common variations
+company_names = [
+    "Apple", "Microsoft", "Amazon", "Google", "Samsung", "Toyota", "Coca-Cola", "Mercedes-Benz",
+    "McDonald's", "BMW", "Louis Vuitton", "Tesla", "Cisco", "Nike", "Instagram", "Disney", "Adobe",
+    "Oracle", "IBM", "SAP", "Facebook", "Hermès", "Chanel", "YouTube", "J.P. Morgan", "Pepsi",
+    "Gucci", "Ford", "L'Oréal", "AXA", "Lexus", "HSBC", "Mastercard", "Citi", "Nissan", "Audi",
+    "T-Mobile", "Daimler", "Barclays", "Johnson & Johnson", "Tiffany & Co.", "Cartier",
+    "Jack Daniel's", "Moët & Chandon", "Credit Suisse", "Shell", "Visa", "Pizza Hut", "Gap", "Corona", "UBS", "Nivea", "Smirnoff",
+    "Walmart", "Kellogg's", "Heineken", "Colgate", "Prada", "Chrysler", "Kia", "Porsche", "Subaru", "Lindt", "H&M", "Kraft Heinz",
+    "DHL", "Barclays", "Unilever", "Nestlé", "Procter & Gamble", "PepsiCo", "Sony", "Gucci", "IKEA", "Honda", "Volvo", "Accenture",
+    "Rolex", "Chanel", "Netflix", "Lululemon", "Under Armour", "Whole Foods Market", "Sephora", "Dell", "Sony", "Pinterest",
+    "Skype", "Uber", "Airbnb", "Spotify", "PayPal", "Alibaba", "Tencent", "Boeing", "Mastercard", "Target",
+    "AliExpress", "Booking.com", "Ebay", "Starbucks", "Zara", "Adidas", "Expedia", "Etsy", "Shopify", "Lyft",
+    "Dropbox", "Twitter", "LinkedIn", "Zoom", "DocuSign", "Slack", "Twilio", "Snap", "Pinterest", "Fiverr"
+]
+
+# Enhanced payment methods list - these should be ignored
+PAYMENT_METHODS = [
+    'visa', 'mastercard', 'amex', 'american express', 'discover',
+    'paypal', 'debit', 'credit', 'card', 'payment', 'bank',
+    'transfer', 'transaction', 'direct debit', 'wire', 'online',
+    'banking', 'mobile', 'pay', 'fee', 'service', 'charge',
+    'purchase', 'payment method', 'venmo', 'chase', 'zelle',
+    'google pay', 'apple pay', 'samsung pay', 'gpay', 'contactless',
+]
+
+# Company mappings
+COMPANY_TO_TICKER = {
+    'Netflix': {'ticker': 'NFLX', 'exchange': 'NASDAQ', 'name': 'Netflix Inc'},
+    'NETFLIX.COM': {'ticker': 'NFLX', 'exchange': 'NASDAQ', 'name': 'Netflix Inc'},
+    'Google': {'ticker': 'GOOGL', 'exchange': 'NASDAQ', 'name': 'Alphabet Inc'},
+    'YouTube': {'ticker': 'GOOGL', 'exchange': 'NASDAQ', 'name': 'Alphabet Inc'},
+    'GOOGLE*': {'ticker': 'GOOGL', 'exchange': 'NASDAQ', 'name': 'Alphabet Inc'},
+    'Alphabet': {'ticker': 'GOOGL', 'exchange': 'NASDAQ', 'name': 'Alphabet Inc'},
+    'Alibaba': {'ticker': 'BABA', 'exchange': 'NYSE', 'name': 'Alibaba Group'},
+    'aliexpress': {'ticker': 'BABA', 'exchange': 'NYSE', 'name': 'Alibaba Group'},
+    'ali': {'ticker': 'BABA', 'exchange': 'NYSE', 'name': 'Alibaba Group'},
+    'Amazon': {'ticker': 'AMZN', 'exchange': 'NASDAQ', 'name': 'Amazon.com Inc'},
+    'AMZN': {'ticker': 'AMZN', 'exchange': 'NASDAQ', 'name': 'Amazon.com Inc'},
+    'Apple': {'ticker': 'AAPL', 'exchange': 'NASDAQ', 'name': 'Apple Inc'},
+    'Microsoft': {'ticker': 'MSFT', 'exchange': 'NASDAQ', 'name': 'Microsoft Corporation'},
+    'Meta': {'ticker': 'META', 'exchange': 'NASDAQ', 'name': 'Meta Platforms Inc'},
+    'Facebook': {'ticker': 'META', 'exchange': 'NASDAQ', 'name': 'Meta Platforms Inc'},
+    'Instagram': {'ticker': 'META', 'exchange': 'NASDAQ', 'name': 'Meta Platforms Inc'},
+}
+
+# Hebrew company mappings
+HEBREW_COMPANY_TO_TICKER = {
+    'פרטנר': {'ticker': 'PTNR', 'exchange': 'NASDAQ', 'name': 'Partner Communications'},
+    'סלקום': {'ticker': 'CEL', 'exchange': 'NYSE', 'name': 'Cellcom Israel'},
+    'בזק': {'ticker': 'BZQIY', 'exchange': 'OTC', 'name': 'Bezeq'},
+    'טבע': {'ticker': 'TEVA', 'exchange': 'NYSE', 'name': 'Teva Pharmaceutical'},
+    'כיל': {'ticker': 'ICL', 'exchange': 'NYSE', 'name': 'ICL Group'},
+    'לאומי': {'ticker': 'LUMI.TA', 'exchange': 'TASE', 'name': 'Bank Leumi'},
+    'פועלים': {'ticker': 'POLI.TA', 'exchange': 'TASE', 'name': 'Bank Hapoalim'},
+    'דיסקונט': {'ticker': 'DSCT.TA', 'exchange': 'TASE', 'name': 'Israel Discount Bank'},
+}
+
+# Hebrew company names as they appear in statements, including RTL-reversed text
+HEBREW_COMPANY_MAPPINGS = {
+    'partner': ['פרטנר', 'רנטרפ'],
+    'cellcom': ['סלקום', 'םוקלס'],
+    'menora': ['מנורה', 'הרונמ', 'מבטחים', 'םיחטבמ'],
+    'discount': ['דיסקונט', 'טנוקסיד'],
+    'leumi': ['לאומי', 'ימואל'],
+    'hapoalim': ['הפועלים', 'םילעופה'],
+    'strauss': ['שטראוס', 'סוארטש'],
+    'el al': ['אל על', 'לע לא'],
+}
+
+# Extra merchant patterns per company beyond its name and aliases
+SPECIAL_COMPANY_PATTERNS = {
+    'amazon': [('amazon.', ANYWHERE), ('amzn', ANYWHERE), ('prime', ANYWHERE)],
+    'paypal': [('paypal', WORD), ('פייפאל', WORD), ('ביט', WORD), ('bit', WORD)],
+}
+
+# TASE patterns only used when a company has no other match in the statement
+ISRAELI_FALLBACK_PATTERNS = {
+    'Cellcom': ['תקשורת שירות'],
+    'Yohananof': ['ףוננחוי', 'סופר שוק', 'סופרמרקט', 'קוש רפוס'],
+}
+
+def _alias_tables_version():
+    """Version stamp of every table that merchant resolution results depend on"""
+    tables = [INTERNATIONAL_COMPANIES, ISRAELI_COMPANIES, PAYMENT_METHODS, COMPANY_TO_TICKER,
+              HEBREW_COMPANY_TO_TICKER, HEBREW_COMPANY_MAPPINGS, SPECIAL_COMPANY_PATTERNS,
+              ISRAELI_FALLBACK_PATTERNS]
+    digest = hashlib.sha256(json.dumps(tables, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+    with open(UNIVERSE_PATH, 'rb') as f:
+        digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+# Cached resolutions are discarded whenever any of the tables above change
+ALIAS_TABLES_VERSION = _alias_tables_version()
@@ -0,0 +1,11 @@
+import os
+import sys
+
+# Enable debug mode with DEBUG_MODE=1; stage timings and counters live in instrumentation.py
+DEBUG_MODE = os.environ.get('DEBUG_MODE', '0') == '1'
+
+def debug_print(*args, **kwargs):
+    """Print debug information if DEBUG_MODE is True"""
+    if DEBUG_MODE:
+        print("DEBUG:", *args, **kwargs)
+        sys.stdout.flush()  # Ensure output is immediately visible
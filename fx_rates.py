@@ -0,0 +1,206 @@
+"""
+Daily exchange rates for converting transaction amounts between currencies.
+
+Every rate is kept as shekels per unit of a currency, read from the Yahoo
+Finance FX tickers (USDILS=X, EURILS=X) through the same price source as
+stock prices. By default that is the persistent PriceCache, so each pair's
+series is downloaded once and later only its missing head or stale tail
+is fetched. Series are loaded into memory once per process and conversions
+look up whole columns of dates at a time.
+"""
+import threading
+import time
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from debug_utils import debug_print
+from price_cache import get_default_price_source
+
+BASE_CURRENCY = 'ILS'
+CURRENCY_SYMBOLS = {'₪': 'ILS', '$': 'USD', '€': 'EUR'}
+FX_TICKERS = {'USD': 'USDILS=X', 'EUR': 'EURILS=X'}  # Shekels per unit of each currency
+# Used only when a pair has no rate data at all, e.g. offline on a cold cache
+FALLBACK_RATES = {'USD': 1 / 0.28, 'EUR': 3.9}
+DEFAULT_HISTORY_START = datetime(2015, 1, 1)  # Earliest day loaded when no earlier date is asked for
+
+
+def currency_code(currency):
+    """
+    ISO code of a currency given as a statement symbol (₪, $, €) or a code.
+
+    Raises:
+        ValueError: If the currency is not supported
+    """
+    code = CURRENCY_SYMBOLS.get(currency, currency)
+    if code != BASE_CURRENCY and code not in FX_TICKERS:
+        raise ValueError(f"Unsupported currency {currency!r}, expected one of {list(CURRENCY_SYMBOLS)}")
+    return code
+
+
+def _row_currency_code(currency):
+    """currency_code of a column value, or None when its rows cannot be converted"""
+    try:
+        return currency_code(currency)
+    except ValueError as e:
+        debug_print(f"{e}; its rows are left unvalued")
+        return None
+
+
+def ticker_currency(ticker):
+    """Currency a ticker trades in: shekels on the Tel Aviv exchange, dollars elsewhere"""
+    return 'ILS' if ticker.endswith('.TA') else 'USD'
+
+
+class FXRates:
+    """
+    Daily rate series per currency, with vectorized conversion by date.
+
+    A date without a rate (a weekend or holiday) uses the last rate before
+    it, and a date before the start of a series uses its first rate.
+
+    Args:
+        source (PriceSource, optional): Where rates are read from; defaults to the
+            persistent price cache in front of Yahoo Finance
+        refresh_after (int): Seconds before a loaded series is read from the source again
+        fallback_rates (dict): Currency code -> fixed rate for pairs the source has no data for
+    """
+
+    def __init__(self, source=None, refresh_after=3600, fallback_rates=FALLBACK_RATES):
+        self.source = source or get_default_price_source()
+        self.refresh_after = refresh_after
+        self.fallback_rates = fallback_rates
+        self._series = {}  # code -> (series, first day requested, load time)
+        self._lock = threading.Lock()
+
+    def series(self, code, start=None):
+        """
+        Shekels per unit of a currency, one value per trading day from start to today.
+
+        Args:
+            code (str): Currency code other than the base currency
+            start (datetime, optional): First day needed; defaults to DEFAULT_HISTORY_START
+
+        Returns:
+            Series: Rates indexed by day; empty if the source has no data
+        """
+        start = pd.Timestamp(start if start is not None else DEFAULT_HISTORY_START).normalize()
+        with self._lock:
+            loaded = self._series.get(code)
+            if (loaded is not None and loaded[1] <= start
+                    and time.time() - loaded[2] < self.refresh_after):
+                return loaded[0]
+
+            first_day = min(start, loaded[1]) if loaded is not None else start
+            try:
+                hist = self.source.history(FX_TICKERS[code], first_day, datetime.now() + timedelta(days=1))
+                rates = hist['Close'].dropna().astype(float) if 'Close' in hist.columns else pd.Series(dtype=float)
+            except Exception as e:
+                debug_print(f"Could not load {code}/{BASE_CURRENCY} rates: {e}")
+                rates = loaded[0] if loaded is not None else pd.Series(dtype=float)
+            self._series[code] = (rates, first_day, time.time())
+            debug_print(f"Loaded {len(rates)} {code}/{BASE_CURRENCY} rates from {first_day.strftime('%Y-%m-%d')}")
+            return rates
+
+    def to_base(self, codes, dates):
+        """
+        Shekels per unit of each row's currency on each row's date.
+
+        Args:
+            codes (ndarray): Currency code per row; None gives NaN
+            dates (DatetimeIndex): Day per row; NaT gives NaN
+
+        Returns:
+            ndarray: One rate per row
+        """
+        rates = np.ones(len(dates))
+        for code in pd.unique(codes):
+            if code == BASE_CURRENCY:
+                continue
+            mask = codes == code
+            rates[mask] = np.nan if code is None else self._rates_on(code, dates[mask])
+        rates[np.asarray(dates.isna())] = np.nan
+        return rates
+
+    def convert(self, amounts, from_currencies, to_currencies=BASE_CURRENCY, dates=None):
+        """
+        Convert a column of amounts, each at the rate of its own date.
+
+        Args:
+            amounts: Amount per row, or a single amount
+            from_currencies: Currency symbol or code per row, or one for every row
+            to_currencies: Target currency per row, or one for every row; defaults to shekels
+            dates: Day per row in any format pandas parses, or one for every row; defaults to today
+
+        Returns:
+            ndarray: Converted amounts, NaN where the date could not be parsed or
+                the currency is not supported
+        """
+        amounts = np.atleast_1d(np.asarray(amounts, dtype=float))
+        size = len(amounts)
+        dates = self._dates(dates if dates is not None else datetime.now(), size)
+        from_codes = self._codes(from_currencies, size)
+        to_codes = self._codes(to_currencies, size)
+
+        same = from_codes == to_codes
+        if same.all():
+            return amounts.copy()
+        return np.where(same, amounts, amounts * self.to_base(from_codes, dates) / self.to_base(to_codes, dates))
+
+    def convert_amount(self, amount, from_currency, to_currency=BASE_CURRENCY, date=None):
+        """Convert one amount at the rate of one date (today by default)"""
+        from_code, to_code = currency_code(from_currency), currency_code(to_currency)
+        if from_code == to_code:
+            return float(amount)
+        if date is None:
+            return float(amount) * self._latest_rate(from_code) / self._latest_rate(to_code)
+        return float(self.convert(amount, from_currency, to_currency, date)[0])
+
+    def clear(self):
+        """Forget the loaded series so the next conversion reads them from the source"""
+        with self._lock:
+            self._series.clear()
+
+    def _latest_rate(self, code):
+        if code == BASE_CURRENCY:
+            return 1.0
+        loaded = self._series.get(code)
+        rates = self.series(code, loaded[1] if loaded is not None else datetime.now() - timedelta(days=7))
+        return float(rates.iloc[-1]) if not rates.empty else self.fallback_rates[code]
+
+    def _rates_on(self, code, dates):
+        valid = dates[~dates.isna()]
+        rates = self.series(code, valid.min() if len(valid) else None)
+        if rates.empty:
+            debug_print(f"No {code}/{BASE_CURRENCY} rates available, using the fixed fallback rate")
+            return np.full(len(dates), self.fallback_rates[code])
+
+        # Last rate on or before each date, the first rate for dates before the series
+        positions = rates.index.values.searchsorted(dates.values, side='right') - 1
+        return rates.values[np.clip(positions, 0, len(rates) - 1)]
+
+    @staticmethod
+    def _dates(dates, size):
+        if np.ndim(dates) == 0:
+            return pd.DatetimeIndex([pd.to_datetime(dates, errors='coerce')]).normalize().repeat(size)
+        if not isinstance(dates, pd.DatetimeIndex):
+            dates = pd.DatetimeIndex(pd.to_datetime(dates, errors='coerce'))
+        return dates.normalize()
+
+    @staticmethod
+    def _codes(currencies, size):
+        if isinstance(currencies, str):
+            return np.full(size, _row_currency_code(currencies), dtype=object)
+        positions, uniques = pd.factorize(np.asarray(currencies, dtype=object))
+        # A missing currency has position -1, which picks the trailing None
+        return np.array([_row_currency_code(currency) for currency in uniques] + [None], dtype=object)[positions]
+
+
+_fx_rates = None
+
+
+def get_fx_rates():
+    """Get the process-wide exchange rate service"""
+    global _fx_rates
+    if _fx_rates is None:
+        _fx_rates = FXRates()
+    return _fx_rates
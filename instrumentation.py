@@ -0,0 +1,195 @@
+"""
+Per-stage timers and counters.
+
+Every stage (PDF open, page extraction, line parsing, company matching,
+yfinance calls, ...) accumulates its call count, item count and wall time.
+Recording is off unless the INSTRUMENTATION environment variable is 1 or
+enable() is called; while off, timed() hands back a shared no-op object so
+instrumented code pays only for a function call.
+
+Usage:
+    with timed('page_extract', items=1):
+        ...
+    count('transactions', len(transactions))
+    summary()            # {'page_extract': {'calls': .., 'items': .., 'seconds': .., 'mean_ms': ..}}
+    prometheus_text()    # Prometheus text exposition format
+"""
+import os
+import threading
+import time
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from debug_utils import debug_print
+
+ENABLED = os.environ.get('INSTRUMENTATION', '0') == '1'
+METRICS_PREFIX = 'expense_tracker'
+
+_stats = {}  # Stage -> [calls, items, seconds]
+_lock = threading.Lock()
+
+
+class _NullTimer:
+    """Stand-in returned by timed() while instrumentation is disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def add_items(self, items):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('stage', 'items', 'start')
+
+    def __init__(self, stage, items):
+        self.stage = stage
+        self.items = items
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self.stage, time.perf_counter() - self.start, self.items)
+        return False
+
+    def add_items(self, items):
+        """Count items processed inside the block, when they are only known at the end"""
+        self.items += items
+
+
+def enable(enabled=True):
+    """Turn recording on or off for this process"""
+    global ENABLED
+    ENABLED = enabled
+
+
+def timed(stage, items=0):
+    """Context manager timing one call of a stage"""
+    if not ENABLED:
+        return _NULL_TIMER
+    return _Timer(stage, items)
+
+
+def instrumented(stage):
+    """Decorator timing every call of a function as a stage"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with _Timer(stage, 0):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record(stage, seconds=0.0, items=0, calls=1):
+    """Add to a stage's counters"""
+    with _lock:
+        stats = _stats.get(stage)
+        if stats is None:
+            stats = _stats[stage] = [0, 0, 0.0]
+        stats[0] += calls
+        stats[1] += items
+        stats[2] += seconds
+
+
+def count(stage, items=1):
+    """Count items for a stage without timing it"""
+    if ENABLED:
+        record(stage, items=items, calls=0)
+
+
+def snapshot():
+    """Raw counters, picklable so worker processes can hand them back"""
+    with _lock:
+        return {stage: tuple(stats) for stage, stats in _stats.items()}
+
+
+def merge(counters):
+    """Add counters from snapshot(), e.g. from a worker process"""
+    for stage, (calls, items, seconds) in counters.items():
+        record(stage, seconds, items, calls)
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def summary():
+    """
+    Counters of every stage recorded so far.
+
+    Returns:
+        dict: Stage -> dict with calls, items, seconds and mean_ms per call
+    """
+    with _lock:
+        return {
+            stage: {
+                'calls': calls,
+                'items': items,
+                'seconds': seconds,
+                'mean_ms': seconds / calls * 1000 if calls else None,
+            }
+            for stage, (calls, items, seconds) in sorted(_stats.items())
+        }
+
+
+def prometheus_text():
+    """Render the counters in the Prometheus text exposition format"""
+    metrics = [
+        ('calls_total', 'Number of times the stage ran', 0),
+        ('items_total', 'Items (pages, lines, transactions, tickers) the stage processed', 1),
+        ('seconds_total', 'Wall time spent in the stage', 2),
+    ]
+    counters = snapshot()
+    lines = []
+    for suffix, help_text, field in metrics:
+        name = f"{METRICS_PREFIX}_stage_{suffix}"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for stage, stats in sorted(counters.items()):
+            lines.append(f'{name}{{stage="{stage}"}} {stats[field]}')
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip('/') != '/metrics':
+            self.send_error(404)
+            return
+        body = prometheus_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_metrics_server = None
+
+
+def start_metrics_server(port, host='127.0.0.1'):
+    """
+    Serve prometheus_text() at http://host:port/metrics from a background thread.
+
+    Only one server is started per process; later calls return the running one.
+    """
+    global _metrics_server
+    if _metrics_server is None:
+        _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        threading.Thread(target=_metrics_server.serve_forever, daemon=True).start()
+        debug_print(f"Serving metrics on http://{host}:{port}/metrics")
+    return _metrics_server
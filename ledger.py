@@ -0,0 +1,329 @@
+"""
+Append-only ledger of every statement uploaded, in a local SQLite file.
+
+Statements are appended by content hash, so a statement already in the
+ledger is recognized without parsing it again. Each transaction gets a
+fingerprint of its date, merchant, amount, currency and how many identical
+transactions came before it in the same statement; monthly statements that
+overlap share those fingerprints and their common transactions are stored
+once, while two identical purchases within one statement are both kept.
+
+Only transactions new to the ledger are matched to companies and valued.
+Their shares and amounts are added in place to one holdings row per company,
+so summaries over the whole history read a row per company however many
+years of statements the ledger holds.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+import pandas as pd
+from debug_utils import debug_print
+from fx_rates import BASE_CURRENCY, get_fx_rates, ticker_currency
+
+# Off unless configured: every visitor of a shared app would otherwise see every upload
+DEFAULT_LEDGER_PATH = os.environ.get('LEDGER_PATH', '')
+LEDGER_COLUMNS = ['Ledger Id', 'Date', 'Merchant', 'Amount', 'Currency']
+HOLDING_COLUMNS = ['Company', 'Ticker', 'Exchange', 'Transactions', 'Amount (₪)', 'Shares', 'Invested',
+                   'Amount Per Close', 'First Date', 'Last Date']
+
+
+def transaction_fingerprints(transactions_df):
+    """
+    Fingerprint of each transaction of a statement.
+
+    Args:
+        transactions_df (DataFrame): Transactions with Date, Merchant, Amount and optionally Currency columns
+
+    Returns:
+        list: One SHA-1 hex digest per row
+    """
+    currency = transactions_df['Currency'].fillna('₪') if 'Currency' in transactions_df.columns else '₪'
+    keys = (transactions_df['Date'].astype(str) + '|' + transactions_df['Merchant'].astype(str) + '|'
+            + transactions_df['Amount'].map('{:.2f}'.format) + '|' + currency)
+    occurrences = keys.groupby(keys).cumcount().astype(str)
+    return [hashlib.sha1(key.encode('utf-8')).hexdigest() for key in keys + '|' + occurrences]
+
+
+class Ledger:
+    """
+    SQLite store of statements, their transactions, company matches and per-company holdings.
+
+    Args:
+        path (str): SQLite file location, or ':memory:'
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS statements ('
+                'key TEXT PRIMARY KEY, added REAL, transactions INTEGER, new_transactions INTEGER)'
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS transactions ('
+                'id INTEGER PRIMARY KEY, fingerprint TEXT UNIQUE, statement TEXT, '
+                'date TEXT, merchant TEXT, amount REAL, currency TEXT)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS transactions_statement ON transactions (statement)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS transactions_date ON transactions (date)')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS matches ('
+                'transaction_id INTEGER, company TEXT, ticker TEXT, exchange TEXT, '
+                'amount_ils REAL, shares REAL, invested REAL, first_close REAL, '
+                'PRIMARY KEY (transaction_id, company))'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS matches_unvalued ON matches (shares) WHERE shares IS NULL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS holdings ('
+                'company TEXT, ticker TEXT, exchange TEXT, transactions INTEGER, amount_ils REAL, '
+                'shares REAL, invested REAL, amount_per_close REAL, first_date TEXT, last_date TEXT, '
+                'PRIMARY KEY (company, ticker))'
+            )
+
+    def has_statement(self, key):
+        """Whether a statement (by statement_key) was already appended"""
+        with self._lock:
+            return self._conn.execute('SELECT 1 FROM statements WHERE key = ?', (key,)).fetchone() is not None
+
+    def append(self, key, transactions_df, match=None):
+        """
+        Append a statement's transactions, skipping those already in the ledger.
+
+        The statement, its new transactions and their matches are committed
+        together: if matching fails nothing is stored, and the statement is
+        appended again on the next attempt instead of being skipped unmatched.
+
+        Args:
+            key (str): statement_key of the statement
+            transactions_df (DataFrame): Transactions with YYYY-MM-DD Date, Merchant,
+                Amount and optionally Currency columns
+            match (callable, optional): Called with the new transactions (LEDGER_COLUMNS),
+                returns their match table to store as by record_matches
+
+        Returns:
+            DataFrame: LEDGER_COLUMNS of the transactions new to the ledger, in
+                statement order; empty if the statement was appended before
+        """
+        if transactions_df is None or transactions_df.empty:
+            return pd.DataFrame(columns=LEDGER_COLUMNS)
+
+        fingerprints = transaction_fingerprints(transactions_df)
+        currencies = (transactions_df['Currency'].fillna('₪') if 'Currency' in transactions_df.columns
+                      else pd.Series('₪', index=transactions_df.index))
+        rows = list(zip(fingerprints, [key] * len(fingerprints), transactions_df['Date'].astype(str),
+                        transactions_df['Merchant'].astype(str), transactions_df['Amount'].astype(float), currencies))
+
+        with self._lock, self._conn:
+            if self._conn.execute('SELECT 1 FROM statements WHERE key = ?', (key,)).fetchone() is not None:
+                debug_print(f"Statement {key[:12]} is already in the ledger")
+                return pd.DataFrame(columns=LEDGER_COLUMNS)
+
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO transactions (fingerprint, statement, date, merchant, amount, currency) '
+                'VALUES (?, ?, ?, ?, ?, ?)', rows
+            )
+            # Rows stored under this statement's key are exactly the ones it added
+            new = pd.DataFrame(self._conn.execute(
+                'SELECT id, date, merchant, amount, currency FROM transactions WHERE statement = ? ORDER BY id', (key,)
+            ).fetchall(), columns=LEDGER_COLUMNS)
+            if match is not None and not new.empty:
+                self._insert_matches(new['Ledger Id'], match(new))
+            # Recorded last, so a statement is only known once its transactions are matched
+            self._conn.execute('INSERT INTO statements VALUES (?, ?, ?, ?)',
+                               (key, time.time(), len(rows), len(new)))
+
+        debug_print(f"Ledger: {len(new)} of {len(rows)} transactions of {key[:12]} are new")
+        return new
+
+    def record_matches(self, ledger_ids, companies_df):
+        """
+        Store the company matches of newly appended transactions, not yet valued.
+
+        Args:
+            ledger_ids (array-like): Ledger Id per row of the frame that was matched
+            companies_df (DataFrame): Match table of that frame (see match_table.build_match_table)
+        """
+        with self._lock, self._conn:
+            self._insert_matches(ledger_ids, companies_df)
+
+    def _insert_matches(self, ledger_ids, companies_df):
+        if companies_df is None or companies_df.empty:
+            return
+        ids = np.asarray(ledger_ids, dtype=np.int64)[companies_df['Row'].to_numpy()]
+        rows = list(zip(ids.tolist(), companies_df['Company'].astype(str), companies_df['Ticker'].astype(str),
+                        companies_df['Exchange'].astype(str)))
+        self._conn.executemany(
+            'INSERT OR IGNORE INTO matches (transaction_id, company, ticker, exchange) VALUES (?, ?, ?, ?)', rows
+        )
+
+    def unvalued_matches(self):
+        """
+        Matches whose shares are not known yet: new ones, and ones no price was found for before.
+
+        Returns:
+            DataFrame: Ledger Id, Company, Ticker, Exchange, Date (datetime), Amount and Currency
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT m.transaction_id, m.company, m.ticker, m.exchange, t.date, t.amount, t.currency '
+                'FROM matches m JOIN transactions t ON t.id = m.transaction_id WHERE m.shares IS NULL '
+                'ORDER BY m.transaction_id'
+            ).fetchall()
+        matches = pd.DataFrame(rows, columns=['Ledger Id', 'Company', 'Ticker', 'Exchange', 'Date', 'Amount', 'Currency'])
+        matches['Date'] = pd.to_datetime(matches['Date'], errors='coerce')
+        return matches
+
+    def record_valuations(self, matches, purchases):
+        """
+        Store the shares bought by matches and add them to the company holdings.
+
+        Args:
+            matches (DataFrame): Rows of unvalued_matches
+            purchases (DataFrame): compute_purchases output for those rows, in the same order;
+                rows without shares stay unvalued and are retried on the next update
+        """
+        valued = purchases['Shares'].notna().to_numpy()
+        if not valued.any():
+            return
+        matches = matches[valued].reset_index(drop=True)
+        purchases = purchases[valued].reset_index(drop=True)
+        updates = list(zip(purchases['Amount (₪)'], purchases['Shares'], purchases['Invested'],
+                           purchases['First Close'], matches['Ledger Id'].astype(int), matches['Company']))
+
+        # Fold the new rows into one increment per holding
+        increments = matches[['Company', 'Ticker', 'Exchange']].assign(
+            Transactions=1,
+            amount_ils=purchases['Amount (₪)'],
+            shares=purchases['Shares'],
+            invested=purchases['Invested'],
+            amount_per_close=purchases['Amount (₪)'] / purchases['First Close'],
+            first_date=matches['Date'].dt.strftime('%Y-%m-%d'),
+            last_date=matches['Date'].dt.strftime('%Y-%m-%d'),
+        ).groupby(['Company', 'Ticker', 'Exchange'], as_index=False).agg({
+            'Transactions': 'sum', 'amount_ils': 'sum', 'shares': 'sum', 'invested': 'sum',
+            'amount_per_close': 'sum', 'first_date': 'min', 'last_date': 'max',
+        })
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'UPDATE matches SET amount_ils = ?, shares = ?, invested = ?, first_close = ? '
+                'WHERE transaction_id = ? AND company = ? AND shares IS NULL', updates
+            )
+            self._conn.executemany(
+                'INSERT INTO holdings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (company, ticker) DO UPDATE SET '
+                'transactions = transactions + excluded.transactions, '
+                'amount_ils = amount_ils + excluded.amount_ils, '
+                'shares = shares + excluded.shares, '
+                'invested = invested + excluded.invested, '
+                'amount_per_close = amount_per_close + excluded.amount_per_close, '
+                'first_date = MIN(first_date, excluded.first_date), '
+                'last_date = MAX(last_date, excluded.last_date)',
+                list(increments.itertuples(index=False, name=None))
+            )
+        debug_print(f"Ledger: valued {len(updates)} matches across {len(increments)} holdings")
+
+    def holdings(self):
+        """
+        Every company's totals over the whole ledger.
+
+        Returns:
+            DataFrame: HOLDING_COLUMNS, one row per company and ticker, largest amount first
+        """
+        with self._lock:
+            rows = self._conn.execute('SELECT * FROM holdings ORDER BY amount_ils DESC').fetchall()
+        return pd.DataFrame(rows, columns=HOLDING_COLUMNS)
+
+    def performance(self, current_prices, fx_rates=None):
+        """
+        Performance of every company over the whole ledger, from the holdings alone.
+
+        Value change and amount-weighted percent change equal the sums the
+        per-transaction performance would give, since every transaction's
+        shares, cost and amount per first close are summed in its holding.
+
+        Args:
+            current_prices (dict): Ticker -> current price; holdings without one are left out
+            fx_rates (FXRates, optional): Exchange rates; defaults to the shared get_fx_rates()
+
+        Returns:
+            DataFrame: Company, Ticker, Exchange, Amount (₪), Value Change (₪),
+                Current Value (₪) and Percent Change per company
+        """
+        fx_rates = fx_rates or get_fx_rates()
+        holdings = self.holdings()
+        current = holdings['Ticker'].map(lambda ticker: current_prices.get(ticker) or np.nan).astype(float)
+        rates = np.array([fx_rates.convert_amount(1.0, ticker_currency(ticker), BASE_CURRENCY)
+                          for ticker in holdings['Ticker']], dtype=float)
+
+        value_change = (holdings['Shares'] * current - holdings['Invested']) * rates
+        performance = pd.DataFrame({
+            'Company': holdings['Company'],
+            'Ticker': holdings['Ticker'],
+            'Exchange': holdings['Exchange'],
+            'Amount (₪)': holdings['Amount (₪)'],
+            'Value Change (₪)': value_change,
+            'Current Value (₪)': holdings['Amount (₪)'] + value_change,
+            'Percent Change': (current * holdings['Amount Per Close'] - holdings['Amount (₪)'])
+                              / holdings['Amount (₪)'] * 100,
+        })
+        return performance[current.notna()].reset_index(drop=True)
+
+    def transactions(self, start=None, end=None):
+        """
+        Ledger transactions between two days, using the date index.
+
+        Args:
+            start (str, optional): First YYYY-MM-DD day to include
+            end (str, optional): Last YYYY-MM-DD day to include
+
+        Returns:
+            DataFrame: LEDGER_COLUMNS ordered by date
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id, date, merchant, amount, currency FROM transactions '
+                'WHERE date >= ? AND date <= ? ORDER BY date, id',
+                (start or '0000-00-00', end or '9999-99-99')
+            ).fetchall()
+        return pd.DataFrame(rows, columns=LEDGER_COLUMNS)
+
+    def stats(self):
+        """Statement, transaction and match counts, for the dashboard"""
+        with self._lock:
+            statements, = self._conn.execute('SELECT COUNT(*) FROM statements').fetchone()
+            transactions, first_date, last_date = self._conn.execute(
+                'SELECT COUNT(*), MIN(date), MAX(date) FROM transactions').fetchone()
+            matches, unvalued = self._conn.execute(
+                'SELECT COUNT(*), COUNT(*) - COUNT(shares) FROM matches').fetchone()
+        return {'statements': statements, 'transactions': transactions, 'matches': matches,
+                'unvalued': unvalued, 'first_date': first_date, 'last_date': last_date}
+
+    def clear(self):
+        """Remove every statement and everything derived from them"""
+        with self._lock, self._conn:
+            for table in ('statements', 'transactions', 'matches', 'holdings'):
+                self._conn.execute(f'DELETE FROM {table}')
+
+
+_ledger = None
+
+
+def get_ledger():
+    """Get the process-wide ledger, or None when LEDGER_PATH is not set or the file cannot be opened"""
+    global _ledger
+    if _ledger is None and DEFAULT_LEDGER_PATH:
+        try:
+            _ledger = Ledger(DEFAULT_LEDGER_PATH)
+        except sqlite3.Error as e:
+            debug_print(f"Could not open the ledger at {DEFAULT_LEDGER_PATH}: {e}")
+            return None
+    return _ledger
@@ -0,0 +1,196 @@
+import re
+from company_data import COMPANY_TO_TICKER, PAYMENT_METHODS
+from instrumentation import count
+from merchant_matcher import ANYWHERE, MerchantMatcher
+from debug_utils import debug_print
+
+# Israeli statement line: Amount Amount Type Description Date
+TRANSACTION_PATTERN = re.compile(r'([₪€$])\s+([\d,\.]+)\s+\1\s+([\d,\.]+)\s*(.*?)\s+(\d{2}/\d{2}/\d{4})')
+HEADER_WORDS = ('ךותמ', 'רושיאל', 'תויביר')  # Header/footer lines contain one of these
+HEADER_PATTERN = re.compile('|'.join(HEADER_WORDS))
+LATIN_PATTERN = re.compile(r'[a-zA-Z]')
+MAX_MEMO_ENTRIES = 10000  # Descriptions remembered per parser before starting over
+
+# Keywords tagging a description with a well-known company, checked in order
+# against the uppercased description; only the first group that matches counts
+ENGLISH_SPECIAL_CASES = (
+    ('Google', ('GOOGLE', 'YOUTUBE')),
+    ('Netflix', ('NETFLIX',)),
+    ('Alibaba', ('ALI', 'BABA')),
+    ('Amazon', ('AMAZON',)),
+    ('Apple', ('APPLE', 'ICLOUD')),
+    ('Microsoft', ('MICROSOFT', 'MSFT')),
+    ('Meta', ('META', 'FACEBOOK', 'INSTAGRAM')),
+)
+# Israeli companies, matched by Hebrew name in the description or English name in uppercase
+ISRAELI_SPECIAL_CASES = (
+    ('Partner', 'פרטנר', 'PARTNER'),
+    ('Cellcom', 'סלקום', 'CELLCOM'),
+    ('Menora', 'מנורה', 'MENORA'),
+)
+
+
+def fix_date_direction(date):
+    """Convert date to YYYY-MM-DD format for consistency."""
+    if isinstance(date, str):
+        parts = date.split('/')
+        if len(parts) == 3:
+            day, month, year = parts[0], parts[1], parts[2]
+            # Check date format and convert
+            if len(year) == 4:  # DD/MM/YYYY format
+                return f"{year}-{month}-{day}"
+            else:  # Possibly MM/DD/YY format
+                # Assuming year is the last part
+                return f"20{year}-{month}-{day}" if len(year) == 2 else date
+    return date
+
+
+class LineParser:
+    """
+    Single-pass parser for the transaction lines of an Israeli statement.
+
+    Patterns are compiled once, each description is upper- and lowercased
+    once, and payment methods and company names are found with Aho-Corasick
+    automatons instead of a substring loop per keyword.
+
+    Args:
+        payment_methods (list): Lowercase payment method names; a description containing
+            one, or contained in one, is not a purchase
+        company_keys (iterable): Company names tagged as English merchants when they appear
+            in a description; names of 2 characters or fewer are ignored
+    """
+
+    def __init__(self, payment_methods=PAYMENT_METHODS, company_keys=COMPANY_TO_TICKER):
+        self._payment_matcher = MerchantMatcher([(method, method, ANYWHERE, False) for method in payment_methods])
+        # Every substring of every payment method, for descriptions that are part of one
+        self._payment_fragments = frozenset(
+            method[start:end]
+            for method in payment_methods
+            for start in range(len(method))
+            for end in range(start + 1, len(method) + 1)
+        )
+
+        company_keys = [key for key in company_keys if isinstance(key, str) and len(key) > 2]
+        self._company_order = {key: position for position, key in enumerate(company_keys)}
+        self._company_matcher = MerchantMatcher([(key, key, ANYWHERE, False) for key in company_keys])
+        self._payment_memo = {}
+        self._tag_memo = {}
+
+    @classmethod
+    def from_sample(cls, sample_text):
+        """Build a parser for one statement; formats needing context from its first page override this"""
+        return cls()
+
+    def is_payment_method(self, lowered):
+        """Check a lowercased, stripped description against the payment method list"""
+        verdict = self._payment_memo.get(lowered)
+        if verdict is None:
+            verdict = (lowered in self._payment_fragments or
+                       bool(self._payment_matcher.find(lowered)))
+            if len(self._payment_memo) >= MAX_MEMO_ENTRIES:
+                self._payment_memo.clear()
+            self._payment_memo[lowered] = verdict
+        return verdict
+
+    def tag_merchants(self, description):
+        """English merchant names a description mentions, in the order the original checks ran"""
+        # The same merchants come back again and again on a statement
+        tags = self._tag_memo.get(description)
+        if tags is None:
+            tags = self._tag(description)
+            if len(self._tag_memo) >= MAX_MEMO_ENTRIES:
+                self._tag_memo.clear()
+            self._tag_memo[description] = tags
+        return tags
+
+    def _tag(self, description):
+        upper = description.upper()
+        tags = []
+
+        for name, keywords in ENGLISH_SPECIAL_CASES:
+            if any(keyword in upper for keyword in keywords):
+                tags.append(name)
+                break
+
+        for name, hebrew, english in ISRAELI_SPECIAL_CASES:
+            if hebrew in description or english in upper:
+                tags.append(name)
+                break
+
+        found = self._company_matcher.find(description)
+        if found:
+            tags.extend(sorted(found, key=self._company_order.__getitem__))
+        return tuple(tags)
+
+    def match_line(self, line):
+        """
+        Split a transaction line into its fields.
+
+        Returns:
+            tuple: (currency, amount text, stripped description, date), or None for
+                headers and lines that are not transactions
+        """
+        if HEADER_PATTERN.search(line):
+            return None
+
+        match = TRANSACTION_PATTERN.search(line)
+        if not match:
+            return None
+
+        currency, amount_str, _, description, date = match.groups()
+        return currency, amount_str, description.strip(), date
+
+    def parse_text(self, text):
+        """
+        Parse the transactions on one page of an Israeli credit card statement.
+
+        Args:
+            text (str): Layout text of the page
+
+        Returns:
+            tuple: (list of transaction dicts, list of English merchant names found)
+        """
+        transactions = []
+        english_merchants = []
+        skipped = 0
+
+        for line in text.split('\n'):
+            fields = self.match_line(line)
+            if fields is None:
+                continue
+            currency, amount_str, description, date = fields
+
+            # Skip if it's a payment method or empty description
+            if not description or self.is_payment_method(description.lower()):
+                skipped += 1
+                continue
+
+            english_merchants.extend(self.tag_merchants(description))
+            try:
+                amount = float(amount_str.replace(',', ''))
+            except ValueError as e:
+                debug_print(f"Error processing line match: {e}")
+                continue
+
+            transactions.append({
+                "Date": fix_date_direction(date),
+                "Merchant": description,
+                "Amount": amount,
+                "Currency": currency,
+                "HasEnglishCompany": LATIN_PATTERN.search(description) is not None
+            })
+
+        count('payment_methods_skipped', skipped)
+        count('transactions_parsed', len(transactions))
+        return transactions, english_merchants
+
+
+_line_parser = None
+
+
+def get_line_parser():
+    """Build the line parser once and reuse it"""
+    global _line_parser
+    if _line_parser is None:
+        _line_parser = LineParser()
+    return _line_parser
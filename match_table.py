@@ -0,0 +1,96 @@
+"""
+Columnar table of merchant-to-company matches.
+
+Each match is one row of typed columns: the position of the transaction in
+its statement's frame, the company, ticker and exchange as categoricals
+over the fixed list of known companies (so their codes are the same ids in
+every statement) followed by any companies the statement's merchants were
+resolved to in the ticker universe, and the date, amount and currency the
+performance engine needs, copied out of the transactions frame as plain arrays.
+"""
+import numpy as np
+import pandas as pd
+from company_data import INTERNATIONAL_COMPANIES, ISRAELI_COMPANIES
+from price_engine import parse_transaction_dates
+
+MATCH_COLUMNS = ['Row', 'Company', 'Ticker', 'Exchange', 'Date', 'Amount', 'Currency']
+CURRENCIES = ['₪', '$', '€']
+
+_company_table = None
+
+
+def get_company_table():
+    """
+    Every known company once, indexed by company id.
+
+    Israeli companies trade on TASE; a name in both lists takes its Israeli
+    ticker, as the name lookup always has.
+
+    Returns:
+        DataFrame: Company, Ticker and Exchange columns, index 0..n-1
+    """
+    global _company_table
+    if _company_table is None:
+        details = {info['name']: (info['ticker'], info['exchange']) for info in INTERNATIONAL_COMPANIES}
+        details.update({info['name']: (info['ticker'], 'TASE') for info in ISRAELI_COMPANIES})
+        _company_table = pd.DataFrame(
+            [(name, ticker, exchange) for name, (ticker, exchange) in details.items()],
+            columns=['Company', 'Ticker', 'Exchange']
+        )
+    return _company_table
+
+
+def _categorical(values, codes):
+    """Categorical of values[codes] with the distinct values as categories, in first-seen order"""
+    positions, categories = pd.factorize(values)
+    return pd.Categorical.from_codes(positions[codes], categories=categories)
+
+
+def build_match_table(transactions_df, matches, extra_companies=None):
+    """
+    Lay out matches as a columnar table.
+
+    Args:
+        transactions_df (DataFrame): Transactions with Date, Amount and optionally Currency columns
+        matches (list): (position in transactions_df, company name) pairs
+        extra_companies (dict, optional): Company name -> (ticker, exchange) of matched
+            companies that are not known companies, e.g. from the ticker universe
+
+    Returns:
+        DataFrame: MATCH_COLUMNS, one row per match in the order given
+    """
+    companies = get_company_table()
+    if extra_companies:
+        known = set(companies['Company'])
+        extra = [(name, ticker, exchange) for name, (ticker, exchange) in extra_companies.items() if name not in known]
+        if extra:
+            companies = pd.concat([companies, pd.DataFrame(extra, columns=companies.columns)], ignore_index=True)
+    company_ids = {name: company_id for company_id, name in enumerate(companies['Company'])}
+    rows = np.fromiter((position for position, _ in matches), dtype=np.int32, count=len(matches))
+    ids = np.fromiter((company_ids[name] for _, name in matches), dtype=np.int32, count=len(matches))
+
+    if 'Currency' in transactions_df.columns:
+        currency = transactions_df['Currency'].to_numpy(dtype=object)[rows]
+    else:
+        currency = np.full(len(rows), '₪', dtype=object)
+
+    return pd.DataFrame({
+        'Row': rows,
+        'Company': pd.Categorical.from_codes(ids, categories=companies['Company']),
+        'Ticker': _categorical(companies['Ticker'], ids),
+        'Exchange': _categorical(companies['Exchange'], ids),
+        'Date': parse_transaction_dates(transactions_df['Date'].to_numpy(dtype=object)[rows]).as_unit('ns'),
+        'Amount': transactions_df['Amount'].to_numpy(dtype=float)[rows],
+        'Currency': pd.Categorical(currency, categories=CURRENCIES + sorted(
+            {value for value in pd.unique(currency) if isinstance(value, str)} - set(CURRENCIES))),
+    })
+
+
+def empty_match_table():
+    """A match table without rows, with the same columns and types"""
+    return build_match_table(pd.DataFrame({'Date': [], 'Amount': []}), [])
+
+
+def match_table_memory(table):
+    """Bytes held by a match table, including its categories"""
+    return int(table.memory_usage(deep=True).sum())
@@ -0,0 +1,138 @@
+from collections import deque
+from resolution_cache import normalize_merchant
+
+# How a pattern has to be delimited inside the merchant text
+ANYWHERE = 'anywhere'  # plain substring
+SHORT_WORD = 'short_word'  # whole word, or touching the start or end of the text
+WORD = 'word'  # whole word only
+
+
+def _is_word_char(char):
+    """Match the definition of \\w used by the re module for str patterns"""
+    return char.isalnum() or char == '_'
+
+
+class MerchantMatcher:
+    """
+    Aho-Corasick automaton tagging merchant strings with companies in one pass.
+
+    Args:
+        patterns (list): Tuples of (text, company key, boundary, fallback). text is
+            matched case-insensitively; boundary is ANYWHERE, SHORT_WORD or WORD;
+            fallback patterns only count for a merchant list in which the company
+            has no regular match.
+        cache (ResolutionCache, optional): Cache of find results by normalize_merchant key
+    """
+
+    def __init__(self, patterns, cache=None):
+        self.cache = cache
+        self.patterns = [(text.lower(), company, boundary, fallback)
+                         for text, company, boundary, fallback in patterns if text]
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        for pattern_id, (text, _, _, _) in enumerate(self.patterns):
+            node = 0
+            for char in text:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                node = next_node
+            self._output[node].append(pattern_id)
+
+        # Breadth-first pass to set failure links and merge outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def _accepts(self, text, start, end, boundary):
+        if boundary == ANYWHERE:
+            return True
+        bounded = ((start == 0 or not _is_word_char(text[start - 1])) and
+                   (end == len(text) or not _is_word_char(text[end])))
+        if boundary == WORD:
+            return bounded
+        return bounded or start == 0 or end == len(text)
+
+    def find(self, text):
+        """
+        Find every company mentioned in a merchant string.
+
+        Returns:
+            dict: Company key -> True for a regular match, False if only fallback patterns matched
+        """
+        text = text.lower()
+        found = {}
+        node = 0
+
+        for position, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+
+            for pattern_id in self._output[node]:
+                pattern, company, boundary, fallback = self.patterns[pattern_id]
+                if found.get(company):
+                    continue
+                end = position + 1
+                if self._accepts(text, end - len(pattern), end, boundary):
+                    found[company] = found.get(company, False) or not fallback
+
+        return found
+
+    def lookup(self, merchant):
+        """
+        Like find, but served from the resolution cache when one is configured.
+
+        The normalized merchant is matched rather than the raw one, so every
+        merchant sharing a cache key gets the same result.
+        """
+        if self.cache is None:
+            return self.find(merchant)
+        key = normalize_merchant(merchant)
+        return self.cache.get_or_compute(key, lambda: self.find(key))
+
+    def match_merchants(self, merchants):
+        """
+        Tag a column of merchant strings.
+
+        Args:
+            merchants (iterable): Merchant strings; non-strings never match
+
+        Returns:
+            list: (position, company key) pairs, sorted by company key order in
+                the patterns and then by position
+        """
+        company_order = {}
+        for _, company, _, _ in self.patterns:
+            company_order.setdefault(company, len(company_order))
+
+        # Merchant strings repeat a lot on statements, so scan each distinct one once
+        found_by_merchant = {}
+        regular, fallback = [], []
+        for position, merchant in enumerate(merchants):
+            if not isinstance(merchant, str):
+                continue
+            if merchant not in found_by_merchant:
+                found_by_merchant[merchant] = self.lookup(merchant)
+            for company, is_regular in found_by_merchant[merchant].items():
+                (regular if is_regular else fallback).append((position, company))
+
+        # Fallback patterns only apply to companies with no regular match at all
+        matched_companies = {company for _, company in regular}
+        matches = regular + [(position, company) for position, company in fallback
+                             if company not in matched_companies]
+
+        return sorted(matches, key=lambda match: (company_order[match[1]], match[0]))
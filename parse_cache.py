@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+from debug_utils import debug_print
+
+# Parsed statements are only written to disk when a directory is configured: they hold
+# every uploader's transactions, which a shared deployment must not keep around
+DEFAULT_CACHE_DIR = os.environ.get('PARSE_CACHE_DIR', '')
+
+
+def statement_key(pdf_bytes, parser_version):
+    """Cache key of a statement: SHA-256 of its bytes plus the parser version (or pdf_extraction.parser_stamp)"""
+    return f"{hashlib.sha256(pdf_bytes).hexdigest()}-{parser_version}"
+
+
+class ParseCache:
+    """
+    Cache of parsed statements keyed by content hash.
+
+    Entries are kept in memory with LRU eviction and, when a cache directory
+    is given and pyarrow is installed, written to disk as Parquet so re-uploads
+    in later sessions are also served without parsing.
+
+    Args:
+        max_entries (int): Maximum number of statements kept in memory
+        cache_dir (str, optional): Directory for Parquet files, None keeps the cache in memory only
+    """
+
+    def __init__(self, max_entries=32, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _paths(self, key):
+        return (os.path.join(self.cache_dir, f"{key}.parquet"),
+                os.path.join(self.cache_dir, f"{key}.json"))
+
+    def get(self, key):
+        """
+        Get a cached statement.
+
+        Returns:
+            tuple: (transactions DataFrame, english merchants list), or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is None:
+            entry = self._load(key)
+            if entry is not None:
+                self._remember(key, entry)
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_seconds += entry[2]
+
+        debug_print(f"Parse cache hit for {key[:12]}, saved {entry[2]:.2f}s")
+        return entry[0].copy(), list(entry[1])
+
+    def put(self, key, transactions_df, english_merchants, seconds):
+        """Store a parsed statement along with the time it took to parse"""
+        entry = (transactions_df.copy(), list(english_merchants), seconds)
+        self._remember(key, entry)
+        self._save(key, entry)
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _load(self, key):
+        if not self.cache_dir:
+            return None
+        parquet_path, meta_path = self._paths(key)
+        if not os.path.exists(parquet_path) or not os.path.exists(meta_path):
+            return None
+
+        try:
+            transactions_df = pd.read_parquet(parquet_path)
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        except Exception as e:
+            debug_print(f"Could not read cached statement {key[:12]}: {e}")
+            return None
+        return transactions_df, meta['english_merchants'], meta['seconds']
+
+    def _save(self, key, entry):
+        if not self.cache_dir:
+            return
+        parquet_path, meta_path = self._paths(key)
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entry[0].to_parquet(parquet_path, index=False)
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump({'english_merchants': entry[1], 'seconds': entry[2]}, f, ensure_ascii=False)
+        except ImportError as e:
+            # Parquet needs pyarrow; without it the cache simply stays in memory
+            debug_print(f"Parse cache disk storage disabled: {e}")
+            self.cache_dir = None
+        except Exception as e:
+            debug_print(f"Could not write cached statement {key[:12]}: {e}")
+
+    def clear(self):
+        """Forget the statements held in memory; Parquet files on disk are kept"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit rate and parse time saved, for the diagnostics panel"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'saved_seconds': self.saved_seconds,
+        }
+
+
+_parse_cache = None
+
+
+def get_parse_cache():
+    """Get the process-wide parse cache, which outlives Streamlit reruns"""
+    global _parse_cache
+    if _parse_cache is None:
+        _parse_cache = ParseCache(cache_dir=DEFAULT_CACHE_DIR or None)
+    return _parse_cache
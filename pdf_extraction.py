@@ -0,0 +1,323 @@
+import os
+import time
+import pdfplumber
+import pymupdf
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from debug_utils import debug_print
+from statement_formats import detect_format, get_format
+from table_geometry import ColumnLayout, extract_page_rows, rows_text
+import instrumentation
+from instrumentation import count, timed
+
+# Parallel extraction settings
+EXTRACTION_WORKERS = int(os.environ.get('PDF_EXTRACTION_WORKERS', min(os.cpu_count() or 1, 8)))
+PARALLEL_MIN_PAGES = 8  # Smaller statements are parsed sequentially, a pool costs more than it saves
+PAGES_PER_TASK = 4  # Pages handed to a worker at once; small batches keep workers evenly loaded
+
+# 'pymupdf' reads text with PyMuPDF and only falls back to pdfplumber for pages where it
+# finds no transactions; 'geometry' does the same from PyMuPDF's word boxes and the
+# statement's learned columns (see table_geometry); 'pdfplumber' always uses pdfplumber's
+# slower layout mode
+EXTRACTION_BACKEND = os.environ.get('PDF_EXTRACTION_BACKEND', 'pymupdf')
+GEOMETRY_SAMPLE_PAGES = 2  # Pages the 'geometry' backend learns a statement's columns from
+# Name of a registered statement format, or empty to detect it from the first page
+STATEMENT_FORMAT = os.environ.get('STATEMENT_FORMAT', '')
+LINE_TOLERANCE = 3.0  # Points two characters' vertical centers may differ by and still share a line
+WORD_GAP = 0.2  # Fraction of the font size a gap between characters must exceed to count as a space
+
+# Bump whenever a change here or in line_parser alters the transactions extracted from a statement,
+# so statements parsed by an older version are not served from the parse cache
+PARSER_VERSION = 2
+
+
+def parser_stamp(backend=None, statement_format=None):
+    """
+    Version stamp of the parse settings, for parse cache keys.
+
+    The backend and a forced statement format change the rows extracted, so
+    switching either one must not serve statements parsed under the other.
+    """
+    return f"{PARSER_VERSION}-{backend or EXTRACTION_BACKEND}-{statement_format or STATEMENT_FORMAT or 'auto'}"
+
+
+def extract_page_text(page):
+    """Extract the layout-preserving text of a pdfplumber page"""
+    return page.extract_text(
+        x_tolerance=1,
+        y_tolerance=1,
+        layout=True,
+        x_density=7.25,
+        y_density=13
+    )
+
+
+def extract_pymupdf_page_text(page):
+    """
+    Rebuild the text lines of a PyMuPDF page from character coordinates.
+
+    Characters are grouped into lines by vertical position and ordered left to
+    right, the same visual order pdfplumber's layout mode produces (PyMuPDF's
+    own word text reorders right-to-left runs, which would flip Hebrew names).
+    A horizontal gap wider than WORD_GAP of the font size becomes a space.
+    """
+    chars = []
+    for block in page.get_text('rawdict')['blocks']:
+        for line in block.get('lines', ()):
+            for span in line['spans']:
+                for char in span['chars']:
+                    x0, y0, x1, y1 = char['bbox']
+                    chars.append(((y0 + y1) / 2, x0, x1, char['c'], span['size']))
+    chars.sort()
+
+    # Group characters whose vertical centers are close into lines
+    lines = []
+    current_line, current_center = [], None
+    for center, x0, x1, char, size in chars:
+        if current_center is not None and abs(center - current_center) > LINE_TOLERANCE:
+            lines.append(current_line)
+            current_line = []
+        if not current_line:
+            current_center = center
+        current_line.append((x0, x1, char, size))
+    if current_line:
+        lines.append(current_line)
+
+    text_lines = []
+    for line in lines:
+        line.sort()
+        parts = []
+        previous_x1 = None
+        for x0, x1, char, size in line:
+            if previous_x1 is not None and x0 - previous_x1 > WORD_GAP * size:
+                parts.append(' ')
+            parts.append(char)
+            previous_x1 = x1
+        text_lines.append(' '.join(''.join(parts).split()))
+
+    return '\n'.join(text_lines)
+
+
+def read_pdf_bytes(pdf_file):
+    """Read a PDF given as a path, raw bytes or a file-like object such as a Streamlit upload"""
+    if isinstance(pdf_file, (bytes, bytearray)):
+        return bytes(pdf_file)
+    if isinstance(pdf_file, (str, os.PathLike)):
+        with open(pdf_file, 'rb') as f:
+            return f.read()
+    if hasattr(pdf_file, 'getvalue'):
+        return pdf_file.getvalue()
+    pdf_file.seek(0)
+    return pdf_file.read()
+
+
+class StatementDocument:
+    """
+    PyMuPDF and pdfplumber views of the same PDF bytes, each opened on first use.
+
+    Args:
+        pdf_bytes (bytes): The PDF file contents
+        backend (str): 'pymupdf' or 'geometry' for the fast paths with pdfplumber fallback,
+            or 'pdfplumber'
+        statement_format (LineParser, optional): Parser of the statement's format;
+            detected from the first page when omitted
+        column_layout (ColumnLayout, optional): Columns of the statement's transaction
+            table for the 'geometry' backend; learned from the first pages when omitted
+    """
+
+    def __init__(self, pdf_bytes, backend=None, statement_format=None, column_layout=None):
+        self.pdf_bytes = pdf_bytes
+        self.backend = backend or EXTRACTION_BACKEND
+        self._mupdf = None
+        self._plumber = None
+        self._statement_format = statement_format
+        self._column_layout = column_layout
+
+    @property
+    def mupdf(self):
+        if self._mupdf is None:
+            with timed('pdf_open_pymupdf', items=1):
+                self._mupdf = pymupdf.open(stream=self.pdf_bytes, filetype='pdf')
+        return self._mupdf
+
+    @property
+    def plumber(self):
+        if self._plumber is None:
+            with timed('pdf_open_pdfplumber', items=1):
+                self._plumber = pdfplumber.open(BytesIO(self.pdf_bytes))
+        return self._plumber
+
+    @property
+    def page_count(self):
+        if self.backend == 'pdfplumber':
+            return len(self.plumber.pages)
+        return self.mupdf.page_count
+
+    @property
+    def statement_format(self):
+        """Parser for this statement's format, picked once from the first page's text"""
+        if self._statement_format is None:
+            with timed('format_detect', items=1):
+                sample = ''
+                if self.page_count:
+                    if self.backend == 'pymupdf':
+                        sample = extract_pymupdf_page_text(self.mupdf[0])
+                    elif self.backend == 'geometry':
+                        sample = rows_text(extract_page_rows(self.mupdf[0]))
+                    if not sample.strip():
+                        sample = extract_page_text(self.plumber.pages[0]) or ''
+                self._statement_format = detect_format(sample)
+        return self._statement_format
+
+    @property
+    def column_layout(self):
+        """Transaction table columns, learned once from the first GEOMETRY_SAMPLE_PAGES pages"""
+        if self._column_layout is None:
+            with timed('column_learn', items=1):
+                rows = [row
+                        for page_number in range(min(GEOMETRY_SAMPLE_PAGES, self.page_count))
+                        for row in extract_page_rows(self.mupdf[page_number])]
+                self._column_layout = ColumnLayout.learn(rows, self.statement_format)
+        return self._column_layout
+
+    def parse_page(self, page_number):
+        """
+        Extract and parse one page.
+
+        Returns:
+            dict: page number, transactions, english_merchants, the backend that
+                produced them, the statement format and the seconds spent on the page
+        """
+        start = time.perf_counter()
+        transactions, english_merchants, backend = [], [], self.backend
+
+        if self.backend == 'pymupdf':
+            page = self.mupdf[page_number]
+            with timed('page_extract_pymupdf', items=1):
+                text = extract_pymupdf_page_text(page)
+            with timed('line_parse', items=text.count('\n') + 1):
+                transactions, english_merchants = self.statement_format.parse_text(text)
+        elif self.backend == 'geometry':
+            page = self.mupdf[page_number]
+            with timed('page_extract_geometry', items=1):
+                rows = extract_page_rows(page)
+                lines = self.column_layout.transaction_lines(rows, self.statement_format)
+            count('geometry_rows_skipped', len(rows) - len(lines))
+            with timed('line_parse', items=len(lines)):
+                transactions, english_merchants = self.statement_format.parse_text('\n'.join(lines))
+
+        # Scanned layouts or unusual text layers can defeat the fast path
+        if not transactions:
+            if self.backend != 'pdfplumber':
+                debug_print(f"No transactions on page {page_number + 1} with {self.backend}, "
+                            f"falling back to pdfplumber")
+            backend = 'pdfplumber'
+            page = self.plumber.pages[page_number]
+            with timed('page_extract_pdfplumber', items=1):
+                text = extract_page_text(page)
+            with timed('line_parse', items=text.count('\n') + 1):
+                transactions, english_merchants = self.statement_format.parse_text(text)
+
+        return {
+            'page': page_number,
+            'transactions': transactions,
+            'english_merchants': english_merchants,
+            'backend': backend,
+            'format': self.statement_format.name,
+            'seconds': time.perf_counter() - start,
+        }
+
+    def close(self):
+        if self._mupdf is not None:
+            self._mupdf.close()
+        if self._plumber is not None:
+            self._plumber.close()
+
+
+def _parse_pages(document, page_numbers):
+    """Parse the given pages of an open statement"""
+    return [document.parse_page(page_number) for page_number in page_numbers]
+
+
+_worker_document = None
+
+
+def _init_worker(pdf_bytes, backend, statement_format, column_layout, instrumentation_enabled):
+    """Open the PDF once per worker process"""
+    global _worker_document
+    instrumentation.enable(instrumentation_enabled)
+    _worker_document = StatementDocument(pdf_bytes, backend, statement_format, column_layout)
+
+
+def _parse_worker_pages(page_numbers):
+    """Parse a batch in a worker; its stage counters go back with the results"""
+    instrumentation.reset()
+    return _parse_pages(_worker_document, page_numbers), instrumentation.snapshot()
+
+
+def iter_pages(pdf_file, workers=None, backend=None, statement_format=None):
+    """
+    Extract and parse a statement page by page, in parallel for long statements.
+
+    Pages are yielded as soon as they are parsed and nothing is kept after
+    that, so memory stays flat however long the statement is.
+
+    Args:
+        pdf_file: Path, bytes or file-like object of the PDF
+        workers (int, optional): Worker processes; defaults to PDF_EXTRACTION_WORKERS.
+            Statements shorter than PARALLEL_MIN_PAGES are always parsed sequentially.
+        backend (str, optional): 'pymupdf', 'geometry' or 'pdfplumber'; defaults to PDF_EXTRACTION_BACKEND
+        statement_format (str, optional): Registered format name; defaults to STATEMENT_FORMAT,
+            and the format is detected from the first page when neither is set
+
+    Yields:
+        dict: One dict per page as returned by StatementDocument.parse_page plus
+            'page_count', in page order
+    """
+    workers = EXTRACTION_WORKERS if workers is None else workers
+    backend = backend or EXTRACTION_BACKEND
+    pdf_bytes = read_pdf_bytes(pdf_file)
+
+    statement_format = statement_format or STATEMENT_FORMAT
+    document = StatementDocument(pdf_bytes, backend, get_format(statement_format) if statement_format else None)
+    try:
+        page_count = document.page_count
+        # Detected and learned once here so every worker parses with the same format and columns
+        parser = document.statement_format if page_count else None
+        column_layout = document.column_layout if page_count and backend == 'geometry' else None
+        if workers <= 1 or page_count < PARALLEL_MIN_PAGES:
+            for page_number in range(page_count):
+                yield dict(document.parse_page(page_number), page_count=page_count)
+            return
+    finally:
+        document.close()
+
+    batches = [list(range(start, min(start + PAGES_PER_TASK, page_count)))
+               for start in range(0, page_count, PAGES_PER_TASK)]
+    debug_print(f"Extracting {page_count} pages in {len(batches)} batches on {workers} processes")
+
+    # Each worker opens its own copy of the PDF; map yields batches in submission order
+    with ProcessPoolExecutor(max_workers=min(workers, len(batches)),
+                             initializer=_init_worker,
+                             initargs=(pdf_bytes, backend, parser, column_layout, instrumentation.ENABLED)) as executor:
+        for batch_results, counters in executor.map(_parse_worker_pages, batches):
+            instrumentation.merge(counters)
+            for page_result in batch_results:
+                yield dict(page_result, page_count=page_count)
+
+
+def extract_pages(pdf_file, workers=None, backend=None, statement_format=None):
+    """Extract and parse every page of a statement; see iter_pages"""
+    return list(iter_pages(pdf_file, workers=workers, backend=backend, statement_format=statement_format))
+
+
+def summarize_pages(page_results):
+    """One-line report of the backend used and time spent per page"""
+    backends = {}
+    for result in page_results:
+        backends[result['backend']] = backends.get(result['backend'], 0) + 1
+    total = sum(result['seconds'] for result in page_results)
+    per_page = ', '.join(f"p{result['page'] + 1}:{result['backend']}:{result['seconds'] * 1000:.0f}ms"
+                         for result in page_results)
+    formats = sorted({result['format'] for result in page_results})
+    return f"{len(page_results)} pages in {total:.2f}s, format {', '.join(formats)}, backends {backends} ({per_page})"
@@ -0,0 +1,104 @@
+"""
+Vectorized investment performance over a whole frame of matched transactions.
+
+Closes of every ticker come from one PricePanel (days x tickers), so the
+first close on or after each transaction date is a single searchsorted on
+the shared day index plus a fancy-indexing read. Shares, value change and
+percent change are then plain NumPy column operations, with NaN marking
+the rows that cannot be valued.
+"""
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from debug_utils import debug_print
+from fx_rates import BASE_CURRENCY, get_fx_rates, ticker_currency
+from price_engine import parse_transaction_dates
+
+PERFORMANCE_COLUMNS = ['Amount (₪)', 'Value Change (₪)', 'Percent Change']
+PURCHASE_COLUMNS = ['Amount (₪)', 'Stock Currency', 'Invested', 'First Close', 'Shares']
+
+
+def compute_purchases(tickers, dates, amounts, currencies, panel, fx_rates=None, now=None):
+    """
+    Shares of the matched stock each transaction's amount would have bought.
+
+    Each amount is converted to the stock's currency at the rate of its date
+    and buys shares at the first close on or after that date.
+
+    Args:
+        tickers (array-like): Ticker per transaction
+        dates (array-like): Transaction date per row, in any format parse_transaction_dates accepts
+        amounts (array-like): Transaction amount per row
+        currencies (array-like or str): Currency per row, as a statement symbol or code
+        panel (PricePanel): Closes of the tickers
+        fx_rates (FXRates, optional): Exchange rates; defaults to the shared get_fx_rates()
+        now (datetime, optional): Dates after this buy nothing; defaults to the current time
+
+    Returns:
+        DataFrame: PURCHASE_COLUMNS per transaction in input order, with NaN
+            first close and shares for rows that could not be placed
+    """
+    fx_rates = fx_rates or get_fx_rates()
+    tickers = np.asarray(tickers, dtype=object)
+    amounts = np.asarray(amounts, dtype=float)
+    dates = parse_transaction_dates(dates)
+    dates = dates.where(dates <= pd.Timestamp(now or datetime.now())).normalize()
+
+    ticker_positions, unique_tickers = pd.factorize(tickers)
+    stock_currencies = np.array([ticker_currency(ticker) for ticker in unique_tickers], dtype=object)[ticker_positions]
+    invested = fx_rates.convert(amounts, currencies, stock_currencies, dates)
+    first_prices = panel.first_closes_on_or_after(tickers, dates)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shares = invested / first_prices
+
+    return pd.DataFrame({
+        'Amount (₪)': fx_rates.convert(amounts, currencies, BASE_CURRENCY, dates),
+        'Stock Currency': stock_currencies,
+        'Invested': invested,
+        'First Close': first_prices,
+        'Shares': np.where(np.isfinite(shares), shares, np.nan),
+    })
+
+
+def compute_performance(tickers, dates, amounts, currencies, panel, current_prices, fx_rates=None, now=None):
+    """
+    Value every transaction as if its amount had bought the matched stock instead.
+
+    Shares are bought as in compute_purchases, and the change in their value
+    at the current price is converted back to shekels at today's rate.
+
+    Args:
+        tickers (array-like): Ticker per transaction
+        dates (array-like): Transaction date per row, in any format parse_transaction_dates accepts
+        amounts (array-like): Transaction amount per row
+        currencies (array-like or str): Currency per row, as a statement symbol or code
+        panel (PricePanel): Closes of the tickers
+        current_prices (dict): Ticker -> current price; missing, None or 0 leaves the rows unvalued
+        fx_rates (FXRates, optional): Exchange rates; defaults to the shared get_fx_rates()
+        now (datetime, optional): Dates after this are skipped; defaults to the current time
+
+    Returns:
+        DataFrame: PERFORMANCE_COLUMNS per transaction in input order, with NaN
+            value and percent change for rows that could not be valued
+    """
+    fx_rates = fx_rates or get_fx_rates()
+    purchases = compute_purchases(tickers, dates, amounts, currencies, panel, fx_rates, now)
+    first_prices = purchases['First Close'].to_numpy()
+
+    ticker_positions, unique_tickers = pd.factorize(np.asarray(tickers, dtype=object))
+    current = np.array([current_prices.get(ticker) or np.nan for ticker in unique_tickers], dtype=float)
+    current = current[ticker_positions]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        value_change = fx_rates.convert(purchases['Shares'].to_numpy() * (current - first_prices),
+                                        purchases['Stock Currency'].to_numpy(), BASE_CURRENCY)
+        percent_change = (current - first_prices) / first_prices * 100
+
+    valid = np.isfinite(percent_change) & np.isfinite(value_change)
+    if not valid.all():
+        debug_print(f"Could not value {int((~valid).sum())} of {len(valid)} transactions")
+    return pd.DataFrame({
+        'Amount (₪)': purchases['Amount (₪)'].to_numpy(),
+        'Value Change (₪)': np.where(valid, value_change, np.nan),
+        'Percent Change': np.where(valid, percent_change, np.nan),
+    })
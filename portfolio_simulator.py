@@ -0,0 +1,118 @@
+"""
+Daily history of a portfolio that bought the matched stock on every purchase.
+
+Each matched transaction is treated as a buy of its amount on the first
+trading day on or after its date. Buys are scattered into a days x holdings
+matrix of share and cost deltas (one holding per company and ticker), and a
+cumulative sum down the days gives the shares held and the cost basis of
+every holding on every day. Multiplying by the panel's forward-filled closes
+and each day's exchange rate values all holdings at once; per-company and
+portfolio series are sums over the holding axis.
+"""
+import numpy as np
+import pandas as pd
+from debug_utils import debug_print
+from fx_rates import BASE_CURRENCY, get_fx_rates, ticker_currency
+from price_engine import parse_transaction_dates
+
+PORTFOLIO_COLUMNS = ['Value (₪)', 'Cost Basis (₪)', 'Gain (₪)', 'Drawdown (%)']
+
+
+def simulate_portfolio(tickers, dates, amounts, panel, groups=None, currencies=BASE_CURRENCY, fx_rates=None):
+    """
+    Simulate buying the matched stock with every transaction's amount.
+
+    Drawdown is measured on a time-weighted return index, so new buys raise
+    the portfolio's value without counting as gains.
+
+    Args:
+        tickers (array-like): Ticker per buy
+        dates (array-like): Transaction date per buy, in any format parse_transaction_dates accepts
+        amounts (array-like): Amount per buy
+        panel (PricePanel): Closes of the tickers
+        groups (array-like, optional): Label per buy the contributions are summed by; defaults to the ticker
+        currencies (array-like or str): Currency per buy, as a statement symbol or code; defaults to shekels
+        fx_rates (FXRates, optional): Exchange rates; defaults to the shared get_fx_rates()
+
+    Returns:
+        tuple: (daily, contributions) DataFrames indexed by day from the first buy
+            to the panel's last day: PORTFOLIO_COLUMNS, and the gain in shekels
+            of each group. Both are empty if no buy could be placed.
+    """
+    fx_rates = fx_rates or get_fx_rates()
+    tickers = np.asarray(tickers, dtype=object)
+    groups = tickers if groups is None else np.asarray(groups, dtype=object)
+    amounts = np.asarray(amounts, dtype=float)
+    dates = parse_transaction_dates(dates).normalize()
+
+    rows, columns = panel.first_close_positions(tickers, dates)
+    placed = (rows >= 0) & np.isfinite(amounts)
+    if not placed.all():
+        debug_print(f"Could not place {int((~placed).sum())} of {len(placed)} buys in the price panel")
+    if not placed.any():
+        return (pd.DataFrame(columns=PORTFOLIO_COLUMNS, dtype=float),
+                pd.DataFrame(dtype=float))
+
+    tickers, groups, amounts, dates = tickers[placed], groups[placed], amounts[placed], dates[placed]
+    rows, columns = rows[placed], columns[placed]
+    if not isinstance(currencies, str):
+        currencies = np.asarray(currencies, dtype=object)[placed]
+
+    holding_codes, holdings = pd.MultiIndex.from_arrays([groups, tickers]).factorize()
+    holding_currencies = np.array([ticker_currency(ticker) for ticker in holdings.get_level_values(1)], dtype=object)
+    amounts_ils = fx_rates.convert(amounts, currencies, BASE_CURRENCY, dates)
+    invested = fx_rates.convert(amounts, currencies, holding_currencies[holding_codes], dates)
+    shares = invested / panel.closes[rows, columns]
+
+    # Buys in a currency that cannot be converted would turn their holding's totals into NaN
+    converted = np.isfinite(amounts_ils) & np.isfinite(shares)
+    if not converted.all():
+        debug_print(f"Could not convert {int((~converted).sum())} of {len(converted)} buys")
+        if not converted.any():
+            return (pd.DataFrame(columns=PORTFOLIO_COLUMNS, dtype=float),
+                    pd.DataFrame(dtype=float))
+        rows, holding_codes = rows[converted], holding_codes[converted]
+        shares, amounts_ils = shares[converted], amounts_ils[converted]
+
+    # Scatter each buy into its day and holding, then accumulate down the days
+    start = int(rows.min())
+    days = panel.dates[start:]
+    share_deltas = np.zeros((len(days), len(holdings)))
+    cost_deltas = np.zeros((len(days), len(holdings)))
+    np.add.at(share_deltas, (rows - start, holding_codes), shares)
+    np.add.at(cost_deltas, (rows - start, holding_codes), amounts_ils)
+    held = np.cumsum(share_deltas, axis=0)
+    cost = np.cumsum(cost_deltas, axis=0)
+
+    # Value every holding in shekels at each day's close and exchange rate
+    holding_columns = panel.column_indexes(holdings.get_level_values(1))
+    closes = panel.forward_filled[start:, holding_columns]
+    currency_positions, currency_codes = pd.factorize(holding_currencies)
+    rates = np.column_stack([fx_rates.convert(np.ones(len(days)), code, BASE_CURRENCY, days)
+                             for code in currency_codes])
+    value = np.where(held > 0, held * closes, 0.0) * rates[:, currency_positions]
+
+    total_value = value.sum(axis=1)
+    total_cost = cost_deltas.sum(axis=1).cumsum()
+    flows = cost_deltas.sum(axis=1)
+
+    # Time-weighted returns: each day's change in value less the money put in that day
+    previous_value = np.concatenate([[0.0], total_value[:-1]])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.where(previous_value > 0, (total_value - flows) / previous_value - 1, 0.0)
+    index = np.cumprod(1 + returns)
+    drawdown = (index / np.maximum.accumulate(index) - 1) * 100
+
+    daily = pd.DataFrame({
+        'Value (₪)': total_value,
+        'Cost Basis (₪)': total_cost,
+        'Gain (₪)': total_value - total_cost,
+        'Drawdown (%)': drawdown,
+    }, index=pd.Index(days, name='Date'))
+
+    # Sum the holdings' gains into their groups with a one-hot product
+    group_codes, group_labels = pd.factorize(holdings.get_level_values(0))
+    membership = np.zeros((len(holdings), len(group_labels)))
+    membership[np.arange(len(holdings)), group_codes] = 1.0
+    contributions = pd.DataFrame((value - cost) @ membership, index=daily.index, columns=group_labels)
+    return daily, contributions
@@ -0,0 +1,243 @@
+import os
+import sqlite3
+import threading
+import time
+import pandas as pd
+import yfinance as yf
+from datetime import timedelta
+from debug_utils import debug_print
+from instrumentation import timed
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    'PRICE_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'prices.sqlite')
+)
+
+
+def _normalize_history(hist):
+    """Keep the OHLCV columns and index the frame by tz-naive calendar day"""
+    if hist is None or hist.empty:
+        return pd.DataFrame(columns=PRICE_COLUMNS, index=pd.DatetimeIndex([], name='Date'))
+
+    hist = hist[[column for column in PRICE_COLUMNS if column in hist.columns]].copy()
+    index = pd.DatetimeIndex(hist.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    hist.index = index.normalize().rename('Date')
+    return hist[~hist.index.duplicated(keep='last')].sort_index()
+
+
+def _covered_end(end):
+    """End of the days a fetch ending at end can cover: days after today have no prices yet"""
+    return min(end, pd.Timestamp.today().normalize() + timedelta(days=1))
+
+
+class PriceSource:
+    """Interface for anything that can provide daily price history for a ticker"""
+
+    def history(self, ticker, start, end):
+        """
+        Get the daily history of a ticker.
+
+        Args:
+            ticker (str): Stock ticker symbol
+            start (datetime): First day to include
+            end (datetime): Day after the last day to include
+
+        Returns:
+            DataFrame: OHLCV columns indexed by trading day, empty if no data
+        """
+        raise NotImplementedError
+
+
+class YahooPriceSource(PriceSource):
+    """Price source backed by yf.Ticker.history"""
+
+    def history(self, ticker, start, end):
+        with timed('yfinance_history', items=1):
+            hist = yf.Ticker(ticker).history(start=start.strftime('%Y-%m-%d'), end=end.strftime('%Y-%m-%d'))
+        return _normalize_history(hist)
+
+
+class StaticPriceSource(PriceSource):
+    """
+    Price source serving fixed in-memory frames, for offline runs and tests.
+
+    Args:
+        histories (dict): Ticker -> DataFrame with at least a 'Close' column
+        latency (float): Seconds to sleep per call, to simulate network round trips
+    """
+
+    def __init__(self, histories, latency=0.0):
+        self.histories = {ticker: _normalize_history(hist) for ticker, hist in histories.items()}
+        self.latency = latency
+        self.calls = []
+
+    def history(self, ticker, start, end):
+        self.calls.append((ticker, start, end))
+        if self.latency:
+            time.sleep(self.latency)
+        hist = self.histories.get(ticker)
+        if hist is None:
+            return _normalize_history(None)
+        return hist[(hist.index >= pd.Timestamp(start).normalize()) & (hist.index < pd.Timestamp(end).normalize())]
+
+
+class PriceCache(PriceSource):
+    """
+    Persistent SQLite store of daily prices in front of another price source.
+
+    Historical closes never change, so each ticker is downloaded once and later
+    requests only fetch the missing head or tail of the cached range. The store
+    keeps at most max_tickers tickers and evicts the least recently used one.
+
+    Args:
+        source (PriceSource): Upstream source for data missing from the cache
+        path (str): SQLite file location
+        max_tickers (int): Maximum number of tickers kept on disk
+        refresh_after (int): Seconds before a cached day that may have been intraday is re-read
+    """
+
+    def __init__(self, source=None, path=DEFAULT_CACHE_PATH, max_tickers=500, refresh_after=3600):
+        self.source = source or YahooPriceSource()
+        self.path = path
+        self.max_tickers = max_tickers
+        self.refresh_after = refresh_after
+        self._lock = threading.Lock()
+
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS prices ('
+                'ticker TEXT, date TEXT, open REAL, high REAL, low REAL, close REAL, volume REAL, '
+                'PRIMARY KEY (ticker, date))'
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS tickers ('
+                'ticker TEXT PRIMARY KEY, first_date TEXT, last_date TEXT, '
+                'last_refresh REAL, last_access REAL)'
+            )
+
+    def history(self, ticker, start, end):
+        start = pd.Timestamp(start).normalize()
+        end = pd.Timestamp(end).normalize()
+
+        with self._lock:
+            meta = self._conn.execute(
+                'SELECT first_date, last_date, last_refresh FROM tickers WHERE ticker = ?', (ticker,)
+            ).fetchone()
+
+        # Work out the missing ranges as (fetch start, fetch end, covered start, covered end)
+        missing = []
+        if meta is None:
+            debug_print(f"Price cache miss for {ticker}, fetching from {start.strftime('%Y-%m-%d')}")
+            missing.append((start, end, start, end))
+        else:
+            first_date, last_date, last_refresh = pd.Timestamp(meta[0]), pd.Timestamp(meta[1]), meta[2]
+
+            # Fetch the head if this request starts before the cached range
+            if start < first_date:
+                debug_print(f"Price cache extending {ticker} back to {start.strftime('%Y-%m-%d')}")
+                missing.append((start, first_date, start, None))
+
+            # Days after the cached range are always fetched. The last cached day is re-read
+            # with them, and on its own every refresh_after seconds until it was fetched on a
+            # later day, since until then its bar may have been intraday
+            if _covered_end(end) > last_date + timedelta(days=1):
+                debug_print(f"Price cache extending {ticker} to {end.strftime('%Y-%m-%d')}")
+                missing.append((last_date, end, None, end))
+            elif (end > last_date and pd.Timestamp.fromtimestamp(last_refresh).normalize() <= last_date
+                  and time.time() - last_refresh > self.refresh_after):
+                debug_print(f"Price cache refreshing {ticker} from {last_date.strftime('%Y-%m-%d')}")
+                missing.append((last_date, end, None, end))
+
+        # Download outside the lock so concurrent fetches of different tickers overlap
+        fetched = [(self.source.history(ticker, fetch_start, fetch_end), covered_start, covered_end)
+                   for fetch_start, fetch_end, covered_start, covered_end in missing]
+
+        with self._lock:
+            for hist, covered_start, covered_end in fetched:
+                self._store(ticker, hist, covered_start, covered_end)
+            self._conn.execute('UPDATE tickers SET last_access = ? WHERE ticker = ?', (time.time(), ticker))
+            self._evict()
+            self._conn.commit()
+
+            return self._load(ticker, start, end)
+
+    def clear(self):
+        """Remove every cached ticker"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM prices')
+            self._conn.execute('DELETE FROM tickers')
+
+    def cached_tickers(self):
+        """List cached tickers, most recently used first"""
+        rows = self._conn.execute('SELECT ticker FROM tickers ORDER BY last_access DESC').fetchall()
+        return [row[0] for row in rows]
+
+    def _store(self, ticker, hist, start, end):
+        """Write fetched rows and widen the ticker's cached range to [start, end)"""
+        hist = _normalize_history(hist)
+        rows = [
+            (ticker, day.strftime('%Y-%m-%d'),
+             *(float(row[column]) if column in hist.columns and pd.notna(row[column]) else None
+               for column in PRICE_COLUMNS))
+            for day, row in hist.iterrows()
+        ]
+        self._conn.executemany('INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+        # The covered range is what was requested, even if its first or last days were not
+        # trading days, up to today
+        first_date = start.strftime('%Y-%m-%d') if start is not None else None
+        last_date = (_covered_end(end) - timedelta(days=1)).strftime('%Y-%m-%d') if end is not None else None
+
+        now = time.time()
+        meta = self._conn.execute('SELECT first_date, last_date FROM tickers WHERE ticker = ?', (ticker,)).fetchone()
+        if meta is None:
+            self._conn.execute('INSERT INTO tickers VALUES (?, ?, ?, ?, ?)', (ticker, first_date, last_date, now, now))
+        else:
+            self._conn.execute(
+                'UPDATE tickers SET first_date = ?, last_date = ?, last_refresh = COALESCE(?, last_refresh) WHERE ticker = ?',
+                (min(meta[0], first_date) if first_date else meta[0],
+                 max(meta[1], last_date) if last_date else meta[1],
+                 now if last_date else None, ticker)
+            )
+
+    def _load(self, ticker, start, end):
+        rows = self._conn.execute(
+            'SELECT date, open, high, low, close, volume FROM prices '
+            'WHERE ticker = ? AND date >= ? AND date < ? ORDER BY date',
+            (ticker, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+        ).fetchall()
+        hist = pd.DataFrame(rows, columns=['Date'] + PRICE_COLUMNS)
+        hist.index = pd.DatetimeIndex(pd.to_datetime(hist.pop('Date')), name='Date')
+        return hist
+
+    def _evict(self):
+        """Drop least recently used tickers beyond max_tickers"""
+        stale = self._conn.execute(
+            'SELECT ticker FROM tickers ORDER BY last_access DESC LIMIT -1 OFFSET ?', (self.max_tickers,)
+        ).fetchall()
+        for (ticker,) in stale:
+            debug_print(f"Price cache evicting {ticker}")
+            self._conn.execute('DELETE FROM prices WHERE ticker = ?', (ticker,))
+            self._conn.execute('DELETE FROM tickers WHERE ticker = ?', (ticker,))
+
+
+_default_source = None
+
+
+def get_default_price_source():
+    """Get the process-wide price source: a PriceCache in front of Yahoo Finance"""
+    global _default_source
+    if _default_source is None:
+        try:
+            _default_source = PriceCache()
+        except sqlite3.Error as e:
+            debug_print(f"Could not open price cache at {DEFAULT_CACHE_PATH}, using Yahoo directly: {e}")
+            _default_source = YahooPriceSource()
+    return _default_source
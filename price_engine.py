@@ -0,0 +1,274 @@
+import os
+import threading
+import time
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime, timedelta
+from debug_utils import debug_print
+from price_cache import get_default_price_source
+from quote_service import get_quote_service, last_closes
+
+# Concurrent fetch settings; one worker keeps the original sequential behaviour
+FETCH_WORKERS = int(os.environ.get('PRICE_FETCH_WORKERS', '1'))
+FETCH_RATE_LIMIT = float(os.environ.get('PRICE_FETCH_RATE', '0'))  # requests per second, 0 = unlimited
+FETCH_TIMEOUT = float(os.environ.get('PRICE_FETCH_TIMEOUT', '30'))  # seconds per request
+FETCH_RETRIES = int(os.environ.get('PRICE_FETCH_RETRIES', '2'))
+FETCH_BACKOFF = 0.5  # seconds before the first retry, doubled on every further retry
+# Threads timed calls run on. A call abandoned after its timeout holds one until it returns,
+# so this also caps how many hung requests can pile up
+FETCH_CALL_THREADS = int(os.environ.get('PRICE_FETCH_CALL_THREADS', '16'))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Args:
+        rate (float): Tokens added per second
+        capacity (int, optional): Maximum burst size, defaults to one second of tokens
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_call_executor = None
+_call_executor_lock = threading.Lock()
+
+
+def get_call_executor():
+    """Get the shared, bounded thread pool timed calls run on"""
+    global _call_executor
+    with _call_executor_lock:
+        if _call_executor is None:
+            _call_executor = ThreadPoolExecutor(max_workers=FETCH_CALL_THREADS, thread_name_prefix='price-call')
+        return _call_executor
+
+
+def _call_with_timeout(func, args, timeout):
+    """
+    Run func(*args) and raise TimeoutError if it takes longer than timeout seconds.
+
+    Raises:
+        TimeoutError: With the abandoned call's Future as its future attribute,
+            so the caller can tell when the call has actually stopped
+    """
+    if not timeout:
+        return func(*args)
+
+    future = get_call_executor().submit(func, *args)
+    try:
+        return future.result(timeout)
+    except FutureTimeoutError:
+        # A call still queued behind hung ones is dropped; a running one is left to
+        # finish on its pool thread and its late result is discarded
+        future.cancel()
+        error = TimeoutError(f"Request timed out after {timeout}s")
+        error.future = future
+        raise error
+
+
+def _call_with_retry(func, args, limiter=None, timeout=None, retries=0, backoff=FETCH_BACKOFF):
+    """
+    Call func(*args) through the rate limiter, retrying failures with exponential backoff.
+
+    A timed-out attempt is only retried once it has actually stopped, so a
+    hung request never has a second copy running next to it.
+    """
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return _call_with_timeout(func, args, timeout)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            debug_print(f"Attempt {attempt + 1} failed for {args[0]}: {e}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+            abandoned = getattr(e, 'future', None)
+            if abandoned is not None and not abandoned.done():
+                raise TimeoutError(f"Request still running after {timeout}s and a {delay:.1f}s backoff, "
+                                   f"not retrying") from e
+
+
+def run_per_ticker(func, jobs, workers=None, rate_limit=None, timeout=None, retries=None):
+    """
+    Run one network call per ticker, optionally on a bounded thread pool.
+
+    Args:
+        func (callable): Called as func(ticker, *args) for every job
+        jobs (dict): Ticker -> tuple of extra arguments
+        workers (int, optional): Thread pool size, 1 runs sequentially
+        rate_limit (float, optional): Maximum calls per second across all workers, 0 for no limit
+        timeout (float, optional): Seconds allowed per call attempt
+        retries (int, optional): Extra attempts after a failed call
+
+    Returns:
+        dict: Ticker -> result, in the order of jobs. Tickers whose calls
+            failed on every attempt are left out.
+    """
+    workers = FETCH_WORKERS if workers is None else workers
+    rate_limit = FETCH_RATE_LIMIT if rate_limit is None else rate_limit
+    timeout = FETCH_TIMEOUT if timeout is None else timeout
+    retries = FETCH_RETRIES if retries is None else retries
+    limiter = TokenBucket(rate_limit) if rate_limit else None
+
+    def run(ticker):
+        try:
+            return _call_with_retry(func, (ticker,) + tuple(jobs[ticker]), limiter, timeout, retries)
+        except Exception as e:
+            debug_print(f"Giving up on {ticker}: {e}")
+            return None
+
+    if workers <= 1 or len(jobs) <= 1:
+        outcomes = [run(ticker) for ticker in jobs]
+    else:
+        with ThreadPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+            # map keeps the submission order, so results stay deterministic
+            outcomes = list(executor.map(run, jobs))
+
+    return {ticker: outcome for ticker, outcome in zip(jobs, outcomes) if outcome is not None}
+
+
+def parse_transaction_date(date):
+    """Parse a transaction date in YYYY-MM-DD, DD/MM/YYYY or YYYY/MM/DD format"""
+    if isinstance(date, datetime):
+        return date
+
+    date = str(date)
+
+    # Convert from YYYY-MM-DD to DD/MM/YYYY
+    if '-' in date:
+        date_parts = date.split('-')
+        date = f"{date_parts[2]}/{date_parts[1]}/{date_parts[0]}"
+
+    for date_format in ('%d/%m/%Y', '%Y/%m/%d'):
+        try:
+            return datetime.strptime(date, date_format)
+        except ValueError:
+            continue
+
+    debug_print(f"Error parsing date {date} with any known format")
+    return None
+
+
+def parse_transaction_dates(dates):
+    """
+    Parse a column of transaction dates in the formats parse_transaction_date accepts.
+
+    YYYY-MM-DD strings, the format normalize_transaction_dates produces, are
+    parsed in one vectorized call; any other distinct value is parsed once.
+
+    Returns:
+        DatetimeIndex: One day per row, NaT where the date could not be parsed
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return pd.DatetimeIndex(dates)
+    dates = pd.Series(dates, dtype=object)
+    parsed = pd.to_datetime(dates, format='%Y-%m-%d', errors='coerce')
+    unparsed = parsed.isna() & dates.notna()
+    if unparsed.any():
+        others = {date: parse_transaction_date(date) for date in dates[unparsed].unique()}
+        parsed[unparsed] = pd.to_datetime(dates[unparsed].map(others), errors='coerce')
+    return pd.DatetimeIndex(parsed)
+
+
+def collect_start_dates(ticker_dates):
+    """
+    Reduce (ticker, transaction date) pairs to the earliest date per ticker.
+
+    Args:
+        ticker_dates (iterable): Pairs of (ticker, date) in any format accepted
+            by parse_transaction_date
+
+    Returns:
+        dict: Ticker -> earliest transaction datetime. Unparseable and future
+            dates are skipped.
+    """
+    now = datetime.now()
+    start_dates = {}
+
+    for ticker, date in ticker_dates:
+        transaction_date = parse_transaction_date(date)
+        if transaction_date is None or pd.isna(transaction_date) or transaction_date > now:
+            continue
+        if ticker not in start_dates or transaction_date < start_dates[ticker]:
+            start_dates[ticker] = transaction_date
+
+    return start_dates
+
+
+def fetch_price_histories(start_dates, source=None, workers=None, rate_limit=None):
+    """
+    Download the daily history of every ticker exactly once.
+
+    Args:
+        start_dates (dict): Ticker -> earliest date that will be looked up
+        source (PriceSource, optional): Where to read prices from. Defaults to
+            the persistent price cache in front of Yahoo Finance.
+        workers (int, optional): Number of tickers fetched concurrently
+        rate_limit (float, optional): Maximum requests per second
+
+    Returns:
+        dict: Ticker -> history DataFrame covering the earliest date up to
+            today, in the order of start_dates. Tickers without data are left out.
+    """
+    source = source or get_default_price_source()
+    end = datetime.now() + timedelta(days=1)
+
+    fetched = run_per_ticker(
+        source.history,
+        {ticker: (start, end) for ticker, start in start_dates.items()},
+        workers=workers, rate_limit=rate_limit
+    )
+
+    histories = {}
+    for ticker, hist in fetched.items():
+        if hist.empty:
+            debug_print(f"No historical data found for {ticker}")
+            continue
+        debug_print(f"Fetched {len(hist)} rows for {ticker} from {start_dates[ticker].strftime('%Y-%m-%d')}")
+        histories[ticker] = hist
+
+    return histories
+
+
+def fetch_market_price(ticker):
+    """Look up a ticker's current price through the shared quote service"""
+    return get_quote_service().quote(ticker)
+
+
+def fetch_current_prices(tickers, histories=None):
+    """
+    Look up the current price of several tickers.
+
+    Args:
+        tickers (iterable): Tickers to quote
+        histories (dict, optional): Ticker -> history just fetched up to today; the
+            last close of each is used as its current price
+
+    Returns:
+        dict: Ticker -> current price; tickers without one are left out
+    """
+    quotes = get_quote_service()
+    if histories:
+        quotes.remember(last_closes(histories))
+    return quotes.quotes(list(tickers))
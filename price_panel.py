@@ -0,0 +1,248 @@
+"""
+Daily closes of many tickers as one float32 matrix (days x tickers).
+
+The panel is built once from the fetched histories and then answers every
+price question the app asks: the first close on or after each transaction
+date for the performance engine, and value-over-time curves since each
+purchase for the dashboard charts. Forward- and backward-filled copies of
+the matrix are only materialized the first time a lookup needs them, and
+curves are computed per transaction on demand.
+
+Ten years of 500 tickers is about 2,600 x 500 x 4 bytes, 5 MB per matrix.
+"""
+import time
+import numpy as np
+import pandas as pd
+from debug_utils import debug_print
+from fx_rates import BASE_CURRENCY, get_fx_rates, ticker_currency
+
+MAX_CACHED_CURVES = 1000  # Value curves remembered per panel before starting over
+
+
+def _fill_positions(valid, reverse=False):
+    """Row of the nearest valid value at or before (or after, when reverse) each cell, -1 for none"""
+    rows = np.arange(valid.shape[0])[:, None]
+    if reverse:
+        positions = np.where(valid[::-1], rows, -1)
+        positions = np.maximum.accumulate(positions, axis=0)
+        return np.where(positions >= 0, valid.shape[0] - 1 - positions, -1)[::-1]
+    return np.maximum.accumulate(np.where(valid, rows, -1), axis=0)
+
+
+class PricePanel:
+    """
+    Closes of several tickers on a shared day index.
+
+    Args:
+        dates (DatetimeIndex): Sorted tz-naive days, one per matrix row
+        tickers (list): Ticker per matrix column
+        closes (ndarray): float32 closes, NaN on days a ticker did not trade
+        build_seconds (float): Time it took to build the panel, for reporting
+    """
+
+    def __init__(self, dates, tickers, closes, build_seconds=0.0):
+        self.dates = dates
+        self.tickers = list(tickers)
+        self.closes = closes
+        self.build_seconds = build_seconds
+        self.built_at = time.time()
+        self._columns = pd.Index(self.tickers)
+        self._forward = None
+        self._backward = None
+        self._curves = {}
+
+    @classmethod
+    def from_histories(cls, histories):
+        """
+        Build a panel from fetched histories.
+
+        Args:
+            histories (dict): Ticker -> history frame with a 'Close' column
+
+        Returns:
+            PricePanel: The panel; tickers without rows are left out
+        """
+        start = time.perf_counter()
+        columns = {}
+        for ticker, hist in histories.items():
+            if hist is None or hist.empty:
+                continue
+            index = pd.DatetimeIndex(hist.index)
+            if index.tz is not None:
+                index = index.tz_localize(None)
+            index = index.normalize()
+            keep = ~index.duplicated(keep='last')
+            columns[ticker] = (index[keep].as_unit('ns').asi8, hist['Close'].to_numpy(dtype=np.float32)[keep])
+
+        # Place each ticker's closes on the union of all trading days
+        days = np.unique(np.concatenate([day_values for day_values, _ in columns.values()])) if columns else \
+            np.empty(0, dtype=np.int64)
+        matrix = np.full((len(days), len(columns)), np.nan, dtype=np.float32)
+        for column, (day_values, close_values) in enumerate(columns.values()):
+            matrix[days.searchsorted(day_values), column] = close_values
+        dates = pd.DatetimeIndex(days.astype('datetime64[ns]'))
+        panel = cls(dates, list(columns), matrix, time.perf_counter() - start)
+        debug_print(f"Built a {matrix.shape[0]} x {matrix.shape[1]} price panel "
+                    f"({panel.memory_bytes / 1e6:.1f} MB) in {panel.build_seconds * 1000:.0f} ms")
+        return panel
+
+    @property
+    def empty(self):
+        return self.closes.size == 0
+
+    @property
+    def memory_bytes(self):
+        """Bytes held by the closes, the day index and any filled copies built so far"""
+        filled = sum(matrix.nbytes for matrix in (self._forward, self._backward) if matrix is not None)
+        return self.closes.nbytes + self.dates.nbytes + filled
+
+    def column_indexes(self, tickers):
+        """Matrix column of each ticker, -1 for tickers not in the panel"""
+        return self._columns.get_indexer(tickers)
+
+    @property
+    def forward_filled(self):
+        """Closes with each gap holding the last close before it, built on first use"""
+        if self._forward is None:
+            self._forward = self._filled(reverse=False)
+        return self._forward
+
+    @property
+    def backward_filled(self):
+        """Closes with each gap holding the first close after it, built on first use"""
+        if self._backward is None:
+            self._backward = self._filled(reverse=True)
+        return self._backward
+
+    def last_closes(self):
+        """Last close of every ticker, the current price when the histories end today"""
+        valid = np.isfinite(self.closes)
+        rows = self.closes.shape[0] - 1 - np.argmax(valid[::-1], axis=0)
+        closes = self.closes[rows, np.arange(self.closes.shape[1])]
+        return {ticker: float(close) for ticker, close, found in zip(self.tickers, closes, valid.any(axis=0)) if found}
+
+    def first_closes_on_or_after(self, tickers, dates):
+        """
+        First close of each ticker on or after each date.
+
+        Args:
+            tickers (array-like): Ticker per row
+            dates (DatetimeIndex): Day per row
+
+        Returns:
+            ndarray: float64 close per row, NaN for unknown tickers, unparsed dates
+                and dates after a ticker's last close
+        """
+        closes = np.full(len(dates), np.nan)
+        if self.empty:
+            return closes
+        columns = self.column_indexes(tickers)
+        positions = self.dates.searchsorted(dates, side='left')
+        found = (columns >= 0) & (positions < len(self.dates)) & ~np.asarray(dates.isna())
+        closes[found] = self.backward_filled[positions[found], columns[found]]
+        return closes
+
+    def first_close_positions(self, tickers, dates):
+        """
+        Matrix position of the first close of each ticker on or after each date.
+
+        Args:
+            tickers (array-like): Ticker per row
+            dates (DatetimeIndex): Day per row
+
+        Returns:
+            tuple: (rows, columns) int arrays; rows is -1 for unknown tickers,
+                unparsed dates and dates after a ticker's last close
+        """
+        columns = self.column_indexes(tickers)
+        rows = np.full(len(columns), -1, dtype=np.int64)
+        known = (columns >= 0) & ~np.asarray(dates.isna())
+        positions = self.dates.searchsorted(dates, side='left')
+        for column in np.unique(columns[known]):
+            traded = np.flatnonzero(np.isfinite(self.closes[:, column]))
+            if not len(traded):
+                continue
+            mask = known & (columns == column)
+            next_trades = traded.searchsorted(positions[mask])
+            found = next_trades < len(traded)
+            rows[mask] = np.where(found, traded[np.minimum(next_trades, len(traded) - 1)], -1)
+        return rows, columns
+
+    def value_curve(self, ticker, date, invested):
+        """
+        Daily value of the shares an amount bought, from the first close on or after the date.
+
+        Args:
+            ticker (str): Ticker in the panel
+            date: Purchase day
+            invested (float): Amount in the ticker's currency
+
+        Returns:
+            Series: Value in the ticker's currency indexed by day, empty if the
+                ticker has no close on or after the date
+        """
+        day = pd.Timestamp(date).normalize()
+        key = (ticker, day, float(invested))
+        curve = self._curves.get(key)
+        if curve is None:
+            curve = self._value_curve(ticker, day, invested)
+            if len(self._curves) >= MAX_CACHED_CURVES:
+                self._curves.clear()
+            self._curves[key] = curve
+        return curve
+
+    def value_curves(self, tickers, dates, amounts, labels, fx_rates=None):
+        """
+        Value-over-time curves of several purchases in shekels, in long form for plotly.
+
+        Each shekel amount is converted to the stock's currency at the rate of
+        its date, and every day's value back to shekels at that day's rate.
+
+        Args:
+            tickers (array-like): Ticker per purchase
+            dates (array-like): Purchase day per purchase
+            amounts (array-like): Amount in shekels per purchase
+            labels (array-like): Legend label per purchase
+            fx_rates (FXRates, optional): Exchange rates; defaults to the shared get_fx_rates()
+
+        Returns:
+            DataFrame: Date, Value (₪) and Transaction columns, one row per purchase and day
+        """
+        fx_rates = fx_rates or get_fx_rates()
+        frames = []
+        for ticker, date, amount, label in zip(tickers, dates, amounts, labels):
+            currency = ticker_currency(ticker)
+            invested = fx_rates.convert_amount(amount, BASE_CURRENCY, currency, date)
+            curve = self.value_curve(ticker, date, invested)
+            if curve.empty:
+                continue
+            frames.append(pd.DataFrame({
+                'Date': curve.index,
+                'Value (₪)': fx_rates.convert(curve.to_numpy(), currency, BASE_CURRENCY, curve.index),
+                'Transaction': label,
+            }))
+        if not frames:
+            return pd.DataFrame(columns=['Date', 'Value (₪)', 'Transaction'])
+        return pd.concat(frames, ignore_index=True)
+
+    def _value_curve(self, ticker, day, invested):
+        column = self.column_indexes([ticker])[0]
+        position = self.dates.searchsorted(day, side='left')
+        if column < 0 or position >= len(self.dates):
+            return pd.Series(dtype=float)
+        first_close = self.backward_filled[position, column]
+        if not np.isfinite(first_close) or first_close == 0:
+            return pd.Series(dtype=float)
+
+        # Start on the purchase's first trading day, skipping days before it
+        start = position + int(np.argmax(np.isfinite(self.closes[position:, column])))
+        closes = self.forward_filled[start:, column].astype(float)
+        return pd.Series(invested / float(first_close) * closes, index=self.dates[start:])
+
+    def _filled(self, reverse):
+        valid = np.isfinite(self.closes)
+        positions = _fill_positions(valid, reverse)
+        columns = np.arange(self.closes.shape[1])[None, :]
+        filled = self.closes[np.maximum(positions, 0), columns]
+        filled[positions < 0] = np.nan
+        return filled
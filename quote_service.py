@@ -0,0 +1,178 @@
+"""
+Current prices without yfinance's per-ticker .info lookups.
+
+A ticker's current price is the last close of its daily history: the
+histories fetched for the performance calculation end today, so their last
+row already is the quote. Tickers without a fetched history are quoted
+together in one yf.download call over the last few days. Quotes are kept
+for a short TTL, and a ticker already being fetched by another thread is
+waited for instead of fetched twice. A ticker the bulk call found no price
+for is asked for again after a much shorter TTL, and nothing is kept from a
+bulk call that failed.
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from debug_utils import debug_print
+from instrumentation import timed
+
+QUOTE_TTL = float(os.environ.get('QUOTE_TTL', '300'))  # Seconds a quote is reused before it is fetched again
+QUOTE_MISS_TTL = float(os.environ.get('QUOTE_MISS_TTL', '30'))  # Seconds a ticker without a price is not asked for again
+QUOTE_LOOKBACK = '5d'  # Daily bars a bulk quote call reads, enough to cover weekends and holidays
+
+
+def last_closes(histories):
+    """
+    Last close of each history.
+
+    Args:
+        histories (dict): Ticker -> history frame with a 'Close' column
+
+    Returns:
+        dict: Ticker -> last non-NaN close; tickers without one are left out
+    """
+    closes = {}
+    for ticker, hist in histories.items():
+        if hist is None or hist.empty or 'Close' not in hist.columns:
+            continue
+        close = hist['Close'].dropna()
+        if not close.empty:
+            closes[ticker] = float(close.iloc[-1])
+    return closes
+
+
+def download_last_closes(tickers):
+    """
+    Last daily close of several tickers in one Yahoo Finance request.
+
+    Returns:
+        dict: Ticker -> last close; tickers Yahoo returned nothing for are left out
+    """
+    with timed('yfinance_download', items=len(tickers)):
+        data = yf.download(list(tickers), period=QUOTE_LOOKBACK, interval='1d', progress=False,
+                           auto_adjust=False, threads=False)
+    if data is None or data.empty:
+        return {}
+    close = data['Close']
+    if isinstance(close, pd.Series):
+        close = close.to_frame(tickers[0])
+    latest = close.ffill().iloc[-1]
+    return {ticker: float(price) for ticker, price in latest.items() if np.isfinite(price)}
+
+
+class QuoteService:
+    """
+    Current prices with a TTL cache and de-duplicated fetching.
+
+    Args:
+        bulk_fetch (callable): Called with a list of tickers, returns ticker -> price
+            for the ones it found; defaults to one yf.download call
+        ttl (float): Seconds a quote is reused
+        miss_ttl (float): Seconds a ticker the bulk call returned no price for is not fetched again
+    """
+
+    def __init__(self, bulk_fetch=download_last_closes, ttl=QUOTE_TTL, miss_ttl=QUOTE_MISS_TTL):
+        self.bulk_fetch = bulk_fetch
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.hits = 0
+        self.misses = 0
+        self.bulk_calls = 0
+        self._quotes = {}  # ticker -> (price or None, time quoted)
+        self._inflight = {}  # ticker -> Future of its price
+        self._lock = threading.Lock()
+
+    def remember(self, prices, as_of=None):
+        """
+        Store prices already known, such as last_closes of freshly fetched histories.
+
+        Args:
+            prices (dict): Ticker -> price
+            as_of (float, optional): time.time() the prices were read; defaults to now
+        """
+        as_of = time.time() if as_of is None else as_of
+        with self._lock:
+            for ticker, price in prices.items():
+                quoted = self._quotes.get(ticker)
+                if quoted is None or quoted[1] <= as_of:
+                    self._quotes[ticker] = (price, as_of)
+
+    def quote(self, ticker):
+        """Current price of one ticker, or None if it has none"""
+        return self.quotes([ticker]).get(ticker)
+
+    def quotes(self, tickers):
+        """
+        Current prices of several tickers, fetching the ones without a fresh quote in one bulk call.
+
+        Tickers another thread is already fetching are waited for rather than fetched again.
+
+        Returns:
+            dict: Ticker -> price for every ticker that has one
+        """
+        now = time.time()
+        prices, waiting, owned = {}, {}, []
+        with self._lock:
+            for ticker in dict.fromkeys(tickers):
+                quoted = self._quotes.get(ticker)
+                if quoted is not None and now - quoted[1] < (self.ttl if quoted[0] is not None else self.miss_ttl):
+                    self.hits += 1
+                    prices[ticker] = quoted[0]
+                elif ticker in self._inflight:
+                    self.hits += 1
+                    waiting[ticker] = self._inflight[ticker]
+                else:
+                    self.misses += 1
+                    self._inflight[ticker] = Future()
+                    owned.append(ticker)
+            if owned:
+                self.bulk_calls += 1
+
+        if owned:
+            fetched, failed = {}, True
+            try:
+                fetched = self.bulk_fetch(owned)
+                failed = False
+                debug_print(f"Quoted {len(fetched)} of {len(owned)} tickers in one call")
+            except Exception as e:
+                debug_print(f"Could not quote {len(owned)} tickers: {e}")
+            finally:
+                now = time.time()
+                with self._lock:
+                    for ticker in owned:
+                        price = fetched.get(ticker)
+                        # A failed call says nothing about the tickers, so the next request retries them
+                        if not failed:
+                            self._quotes[ticker] = (price, now)
+                        self._inflight.pop(ticker).set_result(price)
+                        prices[ticker] = price
+
+        for ticker, future in waiting.items():
+            prices[ticker] = future.result()
+        return {ticker: price for ticker, price in prices.items() if price is not None}
+
+    def clear(self):
+        """Forget every quote"""
+        with self._lock:
+            self._quotes.clear()
+
+    def stats(self):
+        """Quote cache hits, misses and bulk calls made, for the diagnostics panel"""
+        lookups = self.hits + self.misses
+        return {'size': len(self._quotes), 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0, 'bulk_calls': self.bulk_calls}
+
+
+_quote_service = None
+
+
+def get_quote_service():
+    """Get the process-wide quote service"""
+    global _quote_service
+    if _quote_service is None:
+        _quote_service = QuoteService()
+    return _quote_service
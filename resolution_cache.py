@@ -0,0 +1,167 @@
+import atexit
+import json
+import os
+import threading
+from collections import OrderedDict
+from debug_utils import debug_print
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'RESOLUTION_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+)
+
+MISSING = object()  # Sentinel for lookups, since None is a valid cached result
+
+
+def normalize_merchant(merchant_name):
+    """Cache key for a merchant string: lowercase with collapsed whitespace"""
+    return ' '.join(str(merchant_name).lower().split())
+
+
+class ResolutionCache:
+    """
+    Bounded LRU cache of merchant resolution results.
+
+    Negative results (None, False, empty) are cached like any other value. Every
+    cache carries a version stamp of the tables its results were derived from;
+    a persisted cache with a different stamp is discarded on load.
+
+    Args:
+        name (str): Cache name, also used for the file name when persisted
+        version (str): Version stamp of the alias tables
+        max_entries (int): Maximum number of cached merchants
+        cache_dir (str, optional): Directory to persist to as JSON, None keeps it in memory only
+    """
+
+    def __init__(self, name, version, max_entries=10000, cache_dir=None):
+        self.name = name
+        self.version = version
+        self.max_entries = max_entries
+        self.path = os.path.join(cache_dir, f"{name}_resolutions.json") if cache_dir else None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.load()
+
+    def get(self, key, default=None):
+        """Get a cached value, returning default on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        return default
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss"""
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def stats(self):
+        """Hit/miss counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            'name': self.name,
+            'version': self.version,
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def load(self):
+        """Warm the cache from disk if a file with the same version stamp exists"""
+        if not self.path or not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            debug_print(f"Could not load {self.name} resolution cache: {e}")
+            return
+
+        if data.get('version') != self.version:
+            debug_print(f"Discarding {self.name} resolution cache from alias tables version {data.get('version')}")
+            return
+
+        with self._lock:
+            for key, value in data.get('entries', [])[-self.max_entries:]:
+                self._entries[key] = value
+        debug_print(f"Loaded {len(self._entries)} entries into {self.name} resolution cache")
+
+    def save(self):
+        """Persist the cache to disk, least recently used entries first"""
+        if not self.path:
+            return
+
+        with self._lock:
+            data = {'version': self.version, 'entries': list(self._entries.items())}
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            debug_print(f"Could not save {self.name} resolution cache: {e}")
+
+
+_caches = {}
+
+
+def get_resolution_cache(name, version, max_entries=10000, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Get the process-wide resolution cache with this name.
+
+    The cache outlives Streamlit reruns of the app script, and is replaced by
+    a fresh (or persisted, if versions match) one when the version changes.
+    """
+    cache = _caches.get(name)
+    if cache is None or cache.version != version:
+        cache = ResolutionCache(name, version, max_entries=max_entries, cache_dir=cache_dir)
+        _caches[name] = cache
+    return cache
+
+
+def get_resolution_cache_stats():
+    """Hit/miss counters of every resolution cache, keyed by cache name"""
+    return {name: cache.stats() for name, cache in _caches.items()}
+
+
+def clear_resolution_caches():
+    """Empty every resolution cache in memory, e.g. to measure cold lookups"""
+    for cache in _caches.values():
+        cache.clear()
+
+
+def save_resolution_caches():
+    """Persist every resolution cache so the next process starts warm"""
+    for cache in _caches.values():
+        cache.save()
+
+
+atexit.register(save_resolution_caches)
@@ -0,0 +1,172 @@
+"""
+Registry of statement formats, one plugin per issuer layout.
+
+Each format is a LineParser subclass that declares its line grammar
+(line_pattern and match_line), its date and amount conventions, and the
+keywords that identify it. detect_format scores every registered format
+against text sampled from a statement's first page once, so the chosen
+parser runs on every line instead of every pattern being tried per line.
+
+Adding an issuer:
+
+    @register_format
+    class MyBankFormat(LineParser):
+        name = 'my_bank'
+        title = 'My Bank Visa'
+        keywords = ('My Bank',)
+        line_pattern = re.compile(...)
+
+        def match_line(self, line):
+            ...  # (currency, amount text, description, date) or None
+"""
+import re
+from datetime import datetime
+from debug_utils import debug_print
+from line_parser import LineParser, TRANSACTION_PATTERN
+
+DEFAULT_FORMAT = 'israeli'
+KEYWORD_WEIGHT = 5  # A format keyword in the sample counts as much as this many matching lines
+
+_formats = {}
+
+
+def register_format(format_class):
+    """Class decorator adding a statement format to the registry under its name"""
+    _formats[format_class.name] = format_class
+    return format_class
+
+
+def available_formats():
+    """Names and titles of every registered format, in registration order"""
+    return {name: format_class.title for name, format_class in _formats.items()}
+
+
+def get_format(name, sample_text=''):
+    """
+    Build the parser of a registered format.
+
+    Args:
+        name (str): Format name, e.g. 'israeli'
+        sample_text (str): First-page text, for formats that read statement context from it
+
+    Raises:
+        KeyError: If no format with that name is registered
+    """
+    if name not in _formats:
+        raise KeyError(f"Unknown statement format {name!r}, expected one of {list(_formats)}")
+    return _formats[name].from_sample(sample_text)
+
+
+def score_format(format_class, sample_text):
+    """How well a sample looks like a format: matching lines plus weighted keyword hits"""
+    matching_lines = sum(1 for line in sample_text.split('\n') if format_class.line_pattern.search(line))
+    keyword_hits = sum(1 for keyword in format_class.keywords if keyword in sample_text)
+    return matching_lines + KEYWORD_WEIGHT * keyword_hits if matching_lines else 0
+
+
+def detect_format(sample_text):
+    """
+    Pick the format of a statement from text sampled from its first page.
+
+    Returns:
+        LineParser: Parser of the best scoring format, or of DEFAULT_FORMAT when
+            no format's line grammar matches the sample. Ties go to the format
+            registered first.
+    """
+    scores = {name: score_format(format_class, sample_text) for name, format_class in _formats.items()}
+    best = max(scores, key=scores.get) if scores else DEFAULT_FORMAT
+    if not scores.get(best):
+        best = DEFAULT_FORMAT
+    debug_print(f"Detected statement format {best} (scores: {scores})")
+    return get_format(best, sample_text)
+
+
+@register_format
+class IsraeliFormat(LineParser):
+    """Israeli issuers (Isracard, Cal, Max): "₪ amount ₪ amount description DD/MM/YYYY" in visual order"""
+    name = 'israeli'
+    title = 'Israeli credit card (₪, DD/MM/YYYY)'
+    keywords = ('תויביר', 'ךותמ', 'רושיאל', '₪')
+    line_pattern = TRANSACTION_PATTERN
+
+
+def _statement_date(sample_text, labels):
+    """
+    Closing date printed next to one of the labels, or the last full MM/DD/YYYY
+    date in the sample. For an "opening - closing" range the second date is used.
+    """
+    date = r'(\d{1,2})/(\d{1,2})/(\d{4}|\d{2})(?!\d)'
+    label_pattern = re.compile(r'(?:' + '|'.join(labels) + r')\D{0,20}' + date + r'(?:\s*-\s*' + date + ')?',
+                               re.IGNORECASE)
+    match = label_pattern.search(sample_text)
+    if match is None:
+        dates = re.findall(r'\b(\d{1,2})/(\d{1,2})/(\d{4})\b', sample_text)
+        if not dates:
+            return None
+        month, day, year = dates[-1]
+    else:
+        month, day, year = match.groups()[3:] if match.group(4) else match.groups()[:3]
+    year = int(year) + 2000 if len(year) == 2 else int(year)
+    try:
+        return datetime(year, int(month), int(day))
+    except ValueError:
+        return None
+
+
+@register_format
+class USCardFormat(LineParser):
+    """
+    US bank Visa and Mastercard statements: "MM/DD [MM/DD] description [$]amount".
+
+    Lines carry no year, so it comes from the statement's closing date:
+    transactions in a month after the closing month belong to the year
+    before (a January statement listing December purchases). Negative
+    amounts are payments and credits and are skipped.
+
+    Args:
+        closing_date (datetime, optional): Statement closing date, defaults to today
+    """
+    name = 'us_card'
+    title = 'US Visa / Mastercard ($, MM/DD)'
+    currency = '$'
+    keywords = ('Visa', 'VISA', 'Mastercard', 'MASTERCARD', 'Closing Date', 'Payment Due Date', 'New Balance')
+    closing_labels = ('Closing Date', 'Statement Date', 'Statement Closing Date', 'Opening/Closing Date')
+    line_pattern = re.compile(r'^\s*(\d{2})/(\d{2})\s+(?:\d{2}/\d{2}\s+)?(.+?)\s+(-?)\$?([\d,]+\.\d{2})\s*$')
+
+    def __init__(self, closing_date=None, **kwargs):
+        super().__init__(**kwargs)
+        self.closing_date = closing_date or datetime.now()
+
+    @classmethod
+    def from_sample(cls, sample_text):
+        return cls(closing_date=_statement_date(sample_text, cls.closing_labels))
+
+    def match_line(self, line):
+        match = self.line_pattern.match(line)
+        if not match or match.group(4) == '-':
+            return None
+        month, day, description, _, amount_str = match.groups()
+        year = self.closing_date.year - (1 if int(month) > self.closing_date.month else 0)
+        return self.currency, amount_str, description.strip(), f"{year}-{month}-{day}"
+
+
+@register_format
+class AmexFormat(LineParser):
+    """
+    American Express statements: "MM/DD/YY[*] description $amount".
+
+    Negative amounts are payments and credits and are skipped.
+    """
+    name = 'amex'
+    title = 'American Express ($, MM/DD/YY)'
+    currency = '$'
+    keywords = ('American Express', 'AMERICAN EXPRESS', 'Membership Rewards', 'amex')
+    line_pattern = re.compile(r'^\s*(\d{2})/(\d{2})/(\d{2}|\d{4})\*?\s+(.+?)\s+(-?)\$([\d,]+\.\d{2})\s*$')
+
+    def match_line(self, line):
+        match = self.line_pattern.match(line)
+        if not match or match.group(5) == '-':
+            return None
+        month, day, year, description, _, amount_str = match.groups()
+        year = f"20{year}" if len(year) == 2 else year
+        return self.currency, amount_str, description.strip(), f"{year}-{month}-{day}"
@@ -0,0 +1,228 @@
+"""
+Coordinate-based reading of statement tables.
+
+Words are read once per page with their boxes (PyMuPDF's word list, much
+cheaper than walking every character), grouped into rows by vertical
+position and ordered left to right. Column boundaries are learned once
+per statement from the transaction rows of its first pages and reused for
+every later page: rows missing a word in any column every sample
+transaction filled (headers, totals, footers) are dropped before the line
+parser sees them, so no page runs its own table detection. A dropped row
+the line parser still reads as a transaction (its amount shifted into
+another column on a later page, say) is kept and counted instead of lost.
+
+The learned description column also puts wrapped descriptions back
+together. A row with words in the description column only is a piece of
+the description of the transaction row next to it: the one below when
+that row has no description of its own (the other cells vertically
+centered in a two-line cell), else the one above. Reading text line by
+line loses those pieces, and with them any transaction whose description
+sits entirely on other lines than its amount.
+"""
+import re
+from debug_utils import debug_print
+from instrumentation import count
+
+ROW_TOLERANCE = 3.0  # Points two words' vertical centers may differ by and still share a row
+COLUMN_GAP = 2.0  # Word extents closer than this many points are merged into one column
+WRAP_DISTANCE = 1.5  # Line heights a description piece may sit from its transaction row
+RTL_PATTERN = re.compile(r'[֐-׿יִ-ﭏ]')
+
+
+def extract_page_rows(page):
+    """
+    Read the words of a PyMuPDF page and group them into rows.
+
+    PyMuPDF returns right-to-left words in logical order; they are flipped
+    back so row text matches the visual order the other extraction paths
+    produce.
+
+    Returns:
+        list: Rows top to bottom, each a list of (x0, x1, text, y0, y1) words left to right
+    """
+    words = sorted(((y0 + y1) / 2, x0, x1, text[::-1] if RTL_PATTERN.search(text) else text, y0, y1)
+                   for x0, y0, x1, y1, text, *_ in page.get_text('words'))
+
+    rows = []
+    current_row, current_center = [], None
+    for center, x0, x1, text, y0, y1 in words:
+        if current_center is not None and abs(center - current_center) > ROW_TOLERANCE:
+            rows.append(current_row)
+            current_row = []
+        if not current_row:
+            current_center = center
+        current_row.append((x0, x1, text, y0, y1))
+    if current_row:
+        rows.append(current_row)
+
+    for row in rows:
+        row.sort()
+    return rows
+
+
+def row_text(row):
+    """Text of a row, words joined left to right"""
+    return ' '.join(word[2] for word in row)
+
+
+def rows_text(rows):
+    """Text of a page given as rows, one line per row"""
+    return '\n'.join(row_text(row) for row in rows)
+
+
+class ColumnLayout:
+    """
+    Column boundaries of a statement's transaction table.
+
+    Args:
+        columns (list): (x0, x1) extent of each column, left to right
+        required (list): Indexes of the columns every transaction row has a word in
+        description (list): Indexes of the columns holding transaction descriptions
+    """
+
+    def __init__(self, columns=(), required=(), description=()):
+        self.columns = list(columns)
+        self.required = list(required)
+        self.description = list(description)
+        self._required_extents = [self.columns[index] for index in self.required]
+        self._description_extents = [self.columns[index] for index in self.description]
+
+    @classmethod
+    def learn(cls, rows, parser):
+        """
+        Learn the columns from sample rows, using the rows a statement format's parser
+        recognizes as transactions.
+
+        Description columns are the ones holding words of the parsed description
+        in at least half of the transaction rows. They are never required, so a
+        row whose description wrapped onto the lines around it still counts.
+
+        Args:
+            rows (list): Rows from extract_page_rows, usually from the first pages
+            parser (LineParser): Parser of the statement's format
+
+        Returns:
+            ColumnLayout: The layout; empty, and so keeping every row, when no sample row is a transaction
+        """
+        transaction_rows = []
+        for row in rows:
+            fields = parser.match_line(row_text(row))
+            if fields is not None:
+                transaction_rows.append((row, set(fields[2].split())))
+        if not transaction_rows:
+            debug_print("No transaction rows to learn columns from, keeping every row")
+            return cls()
+
+        columns = []
+        for x0, x1 in sorted((x0, x1) for row, _ in transaction_rows for x0, x1, *_ in row):
+            if columns and x0 - columns[-1][1] <= COLUMN_GAP:
+                columns[-1] = (columns[-1][0], max(columns[-1][1], x1))
+            else:
+                columns.append((x0, x1))
+
+        description_rows = [0] * len(columns)
+        for row, description_words in transaction_rows:
+            for index in {_column_index(columns, word) for word in row if word[2] in description_words}:
+                description_rows[index] += 1
+        description = [index for index, hits in enumerate(description_rows) if 2 * hits >= len(transaction_rows)]
+        required = [index for index, (start, end) in enumerate(columns)
+                    if index not in description and all(_overlaps(row, start, end) for row, _ in transaction_rows)]
+        debug_print(f"Learned {len(columns)} columns ({len(required)} required, {len(description)} description) "
+                    f"from {len(transaction_rows)} transaction rows")
+        return cls(columns, required, description)
+
+    def __len__(self):
+        return len(self.columns)
+
+    def is_candidate(self, row):
+        """Whether a row has a word in every required column and could be a transaction"""
+        return all(_overlaps(row, start, end) for start, end in self._required_extents)
+
+    def is_description_piece(self, row):
+        """Whether every word of a row lies in a description column"""
+        return bool(self._description_extents) and all(
+            any(x0 <= end and x1 >= start for start, end in self._description_extents)
+            for x0, x1, *_ in row
+        )
+
+    def transaction_lines(self, rows, parser=None):
+        """
+        Text of the rows that could be transactions, with wrapped descriptions joined back in.
+
+        Args:
+            rows (list): Rows from extract_page_rows
+            parser (LineParser, optional): Parser of the statement's format; rows missing
+                a required column are still kept when it matches them as transactions
+
+        Returns:
+            list: One line per candidate row, top to bottom
+        """
+        candidates, pieces, recovered = [], {}, 0
+        for index, row in enumerate(rows):
+            if self.is_candidate(row):
+                candidates.append(index)
+            elif parser is not None and parser.match_line(row_text(row)) is not None:
+                candidates.append(index)
+                recovered += 1
+            elif self.is_description_piece(row):
+                pieces[index] = row
+
+        # Pieces go to the next row when it has no description, else continue the one above
+        above, below = {}, {}
+        is_candidate = set(candidates).__contains__
+        for index in sorted(pieces):
+            owner = index
+            while owner - 1 in pieces and _adjacent(rows[owner - 1], rows[owner]):
+                owner -= 1
+            if (is_candidate(index + 1) and not self._has_description(rows[index + 1])
+                    and _adjacent(pieces[index], rows[index + 1])):
+                above.setdefault(index + 1, []).append(pieces[index])
+            elif is_candidate(owner - 1) and _adjacent(rows[owner - 1], rows[owner]):
+                below.setdefault(owner - 1, []).append(pieces[index])
+
+        lines = [self._join(rows[index], above.get(index, ()), below.get(index, ())) for index in candidates]
+        joined = sum(len(group) for group in above.values()) + sum(len(group) for group in below.values())
+        if recovered:
+            debug_print(f"Kept {recovered} transaction rows outside the learned columns")
+        count('geometry_rows_recovered', recovered)
+        count('geometry_description_pieces', joined)
+        return lines
+
+    def _has_description(self, row):
+        return any(_overlaps(row, start, end) for start, end in self._description_extents)
+
+    def _join(self, row, above, below):
+        """Row text with the description pieces above and below it inserted into its description"""
+        if not above and not below:
+            return row_text(row)
+
+        start = self._description_extents[0][0]
+        end = self._description_extents[-1][1]
+        before = [word for word in row if word[1] < start]
+        after = [word for word in row if word[0] > end]
+        own = [word for word in row if word[1] >= start and word[0] <= end]
+        parts = list(above) + [own] + list(below)
+        # Visual order: lines of a right-to-left description read from the right
+        if any(RTL_PATTERN.search(word[2]) for part in parts for word in part):
+            parts.reverse()
+        return row_text(before + [word for part in parts for word in part] + after)
+
+
+def _overlaps(row, start, end):
+    return any(x0 <= end and x1 >= start for x0, x1, *_ in row)
+
+
+def _column_index(columns, word):
+    """Index of the column a word falls in"""
+    x0, x1 = word[0], word[1]
+    return next(index for index, (start, end) in enumerate(columns) if x0 <= end and x1 >= start)
+
+
+def _adjacent(upper, lower):
+    """Whether two rows are close enough to be lines of one table cell"""
+    height = max(y1 - y0 for *_, y0, y1 in upper + lower)
+    return _center(lower) - _center(upper) <= WRAP_DISTANCE * height
+
+
+def _center(row):
+    return sum(y0 + y1 for *_, y0, y1 in row) / (2 * len(row))
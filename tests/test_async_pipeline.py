@@ -0,0 +1,56 @@
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from async_pipeline import AsyncPriceFetcher, iter_statement_events
+from price_cache import StaticPriceSource
+
+PAGE_SECONDS = 0.2  # Parse time of each fake page
+LATENCY = 0.1  # Seconds the stub price server takes per request
+
+
+def make_source():
+    days = pd.bdate_range('2024-01-01', datetime.now().date())
+    return StaticPriceSource({ticker: pd.DataFrame({'Close': np.linspace(100, 150, len(days))}, index=days)
+                              for ticker in ('AAPL', 'MSFT')}, latency=LATENCY)
+
+
+def slow_pages(pages):
+    """Yield page tuples as a parser would, taking PAGE_SECONDS per page"""
+    for page_number, page_df in enumerate(pages):
+        time.sleep(PAGE_SECONDS)
+        yield page_number, len(pages), page_df
+
+
+def test_prices_arrive_while_later_pages_are_parsed():
+    pages = [
+        pd.DataFrame({'Date': ['2024-02-01', '2024-02-03'], 'Ticker': ['AAPL', None]}),
+        pd.DataFrame({'Date': ['2024-03-01'], 'Ticker': ['MSFT']}),
+        pd.DataFrame({'Date': ['2024-01-15', '2024-03-05'], 'Ticker': ['AAPL', 'NOPE']}),
+    ]
+    source = make_source()
+    fetcher = AsyncPriceFetcher(source, current_price=lambda ticker: None, timeout=5, retries=0)
+
+    events = list(iter_statement_events(slow_pages(pages), fetcher))
+
+    assert [event[1] for event in events if event[0] == 'page'] == [0, 1, 2]
+    # AAPL's first fetch finishes long before the last page is parsed
+    first_prices = next(index for index, event in enumerate(events) if event[0] == 'prices')
+    last_page = max(index for index, event in enumerate(events) if event[0] == 'page')
+    assert first_prices < last_page
+
+    assert set(fetcher.histories) == {'AAPL', 'MSFT'}
+    # Tickers are fetched from the statement's earliest date seen so far
+    assert fetcher.start_dates['AAPL'] == datetime(2024, 1, 15)
+    assert fetcher.histories['AAPL'].index[0] == pd.Timestamp('2024-01-15')
+    assert ('prices', 'NOPE') in {event[:2] for event in events}
+
+
+def test_current_price_defaults_to_the_last_close():
+    pages = [pd.DataFrame({'Date': ['2024-02-01'], 'Ticker': ['AAPL']})]
+    fetcher = AsyncPriceFetcher(make_source(), timeout=5, retries=0)
+
+    prices = [event for event in iter_statement_events(slow_pages(pages), fetcher) if event[0] == 'prices']
+
+    assert len(prices) == 1
+    assert prices[0][3] == 150.0
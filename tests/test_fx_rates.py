@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+from fx_rates import FXRates, currency_code
+from price_cache import StaticPriceSource
+
+# Shekels per dollar and per euro on four trading days around a weekend
+DAYS = pd.to_datetime(['2024-01-03', '2024-01-04', '2024-01-05', '2024-01-08'])
+USD = [3.60, 3.70, 3.75, 3.80]
+EUR = [4.00, 4.05, 4.10, 4.20]
+
+
+def make_rates():
+    source = StaticPriceSource({
+        'USDILS=X': pd.DataFrame({'Close': USD}, index=DAYS),
+        'EURILS=X': pd.DataFrame({'Close': EUR}, index=DAYS),
+    })
+    return FXRates(source=source)
+
+
+def test_each_row_uses_its_own_days_rate():
+    converted = make_rates().convert([10.0, 10.0, 10.0], ['$', '$', '€'],
+                                     dates=['2024-01-03', '2024-01-04', '2024-01-08'])
+    np.testing.assert_allclose(converted, [36.0, 37.0, 42.0])
+
+
+def test_weekends_and_holidays_carry_the_last_rate_forward():
+    converted = make_rates().convert([1.0, 1.0, 1.0], 'USD', dates=['2024-01-06', '2024-01-07', '2024-01-02'])
+    # Saturday and Sunday use Friday's rate; a day before the series uses its first rate
+    np.testing.assert_allclose(converted, [3.75, 3.75, 3.60])
+
+
+def test_conversion_direction():
+    rates = make_rates()
+
+    np.testing.assert_allclose(rates.convert(37.0, '₪', 'USD', dates='2024-01-04'), [10.0])
+    np.testing.assert_allclose(rates.convert(10.0, 'USD', 'ILS', dates='2024-01-04'), [37.0])
+    # Dollars to euros goes through shekels: 10 * 3.80 / 4.20
+    assert rates.convert_amount(10.0, '$', '€', date='2024-01-08') == pytest.approx(38.0 / 4.2)
+    assert rates.convert_amount(5.0, '₪', 'ILS') == 5.0
+
+
+def test_unsupported_currency_rows_are_nan():
+    converted = make_rates().convert([10.0, 10.0, 10.0], ['$', '£', None], dates='2024-01-05')
+
+    assert converted[0] == pytest.approx(37.5)
+    assert np.isnan(converted[1:]).all()
+    with pytest.raises(ValueError):
+        currency_code('£')
+
+
+def test_missing_series_uses_the_fallback_rate():
+    rates = FXRates(source=StaticPriceSource({}), fallback_rates={'USD': 3.5, 'EUR': 4.0})
+    np.testing.assert_allclose(rates.convert([2.0], '$', dates='2024-01-05'), [7.0])
@@ -0,0 +1,105 @@
+import pandas as pd
+import pytest
+from ledger import Ledger, transaction_fingerprints
+from match_table import build_match_table
+
+COMPANIES = {'NETFLIX.COM': 'Netflix', 'AMAZON MKTPLACE': 'Amazon'}
+
+
+def statement(rows):
+    return pd.DataFrame(rows, columns=['Date', 'Merchant', 'Amount', 'Currency'])
+
+
+def match_known(transactions_df):
+    """Match table of the merchants in COMPANIES, standing in for get_companies_with_transactions"""
+    matches = [(position, COMPANIES[merchant]) for position, merchant in enumerate(transactions_df['Merchant'])
+               if merchant in COMPANIES]
+    return build_match_table(transactions_df, matches)
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return Ledger(str(tmp_path / 'ledger.sqlite'))
+
+
+JANUARY = statement([
+    ['2024-01-05', 'NETFLIX.COM', 50.0, '₪'],
+    ['2024-01-20', 'COFFEE SHOP', 12.0, '₪'],
+    ['2024-01-20', 'COFFEE SHOP', 12.0, '₪'],
+])
+FEBRUARY = statement([
+    ['2024-01-20', 'COFFEE SHOP', 12.0, '₪'],
+    ['2024-02-03', 'AMAZON MKTPLACE', 200.0, '₪'],
+])
+
+
+def test_identical_rows_within_a_statement_get_distinct_fingerprints():
+    fingerprints = transaction_fingerprints(JANUARY)
+
+    assert len(set(fingerprints)) == 3
+    assert transaction_fingerprints(FEBRUARY)[0] == fingerprints[1]
+
+
+def test_append_skips_known_statements_and_overlapping_transactions(ledger):
+    first = ledger.append('jan', JANUARY, match=match_known)
+    again = ledger.append('jan', JANUARY, match=match_known)
+    second = ledger.append('feb', FEBRUARY, match=match_known)
+
+    assert len(first) == 3
+    assert again.empty
+    assert second['Merchant'].tolist() == ['AMAZON MKTPLACE']
+    assert ledger.has_statement('jan') and ledger.has_statement('feb')
+    assert ledger.stats()['transactions'] == 4
+    assert ledger.stats()['matches'] == 2
+
+
+def test_failed_match_leaves_the_statement_unrecorded(ledger):
+    def failing_match(transactions_df):
+        raise RuntimeError('no network')
+
+    with pytest.raises(RuntimeError):
+        ledger.append('jan', JANUARY, match=failing_match)
+
+    assert not ledger.has_statement('jan')
+    assert len(ledger.append('jan', JANUARY, match=match_known)) == 3
+
+
+def test_unvalued_matches_until_valued_then_holdings_sum(ledger):
+    ledger.append('jan', JANUARY, match=match_known)
+    ledger.append('feb', FEBRUARY, match=match_known)
+    ledger.append('mar', statement([['2024-03-01', 'NETFLIX.COM', 30.0, '₪']]), match=match_known)
+
+    pending = ledger.unvalued_matches()
+    assert pending['Company'].tolist() == ['Netflix', 'Amazon', 'Netflix']
+    assert pending['Date'].dt.strftime('%Y-%m-%d').tolist() == ['2024-01-05', '2024-02-03', '2024-03-01']
+
+    # No price for Amazon yet: it stays unvalued and is retried on the next update
+    purchases = pd.DataFrame({
+        'Amount (₪)': [50.0, 200.0, 30.0],
+        'Shares': [0.1, None, 0.05],
+        'Invested': [40.0, None, 22.0],
+        'First Close': [400.0, None, 440.0],
+    })
+    ledger.record_valuations(pending, purchases)
+
+    assert ledger.unvalued_matches()['Company'].tolist() == ['Amazon']
+    holdings = ledger.holdings()
+    assert holdings['Company'].tolist() == ['Netflix']
+    netflix = holdings.iloc[0]
+    assert netflix['Transactions'] == 2
+    assert netflix['Amount (₪)'] == pytest.approx(80.0)
+    assert netflix['Shares'] == pytest.approx(0.15)
+    assert netflix['Invested'] == pytest.approx(62.0)
+    assert netflix['Amount Per Close'] == pytest.approx(50.0 / 400.0 + 30.0 / 440.0)
+    assert (netflix['First Date'], netflix['Last Date']) == ('2024-01-05', '2024-03-01')
+
+
+def test_app_ledger_is_off_unless_configured(monkeypatch, tmp_path):
+    import ledger as ledger_module
+
+    monkeypatch.setattr(ledger_module, '_ledger', None)
+    monkeypatch.setattr(ledger_module, 'DEFAULT_LEDGER_PATH', '')
+    assert ledger_module.get_ledger() is None
+
+    monkeypatch.setattr(ledger_module, 'DEFAULT_LEDGER_PATH', str(tmp_path / 'ledger.sqlite'))
+    assert ledger_module.get_ledger().path == str(tmp_path / 'ledger.sqlite')
@@ -0,0 +1,75 @@
+import pandas as pd
+import pytest
+from match_table import MATCH_COLUMNS, build_match_table, empty_match_table, get_company_table
+
+TRANSACTIONS = pd.DataFrame({
+    'Date': ['2024-01-03', '05/01/2024', '2024-01-12', 'not a date'],
+    'Merchant': ['NETFLIX.COM', 'AMAZON PRIME', 'סלקום', 'STARBUCKS 1234'],
+    'Amount': [54.90, 120.0, 89.50, 18.0],
+    'Currency': ['₪', '$', '₪', '£'],
+})
+MATCHES = [(0, 'Netflix'), (1, 'Amazon'), (2, 'Cellcom'), (3, 'Starbucks Corp.'), (1, 'Netflix')]
+UNIVERSE = {'Starbucks Corp.': ('SBUX', 'NASDAQ')}
+
+
+def company_details(name):
+    companies = get_company_table().set_index('Company')
+    if name in companies.index:
+        return tuple(companies.loc[name, ['Ticker', 'Exchange']])
+    return UNIVERSE[name]
+
+
+def test_rows_map_back_to_their_transactions():
+    table = build_match_table(TRANSACTIONS, MATCHES, UNIVERSE)
+
+    assert table.columns.tolist() == MATCH_COLUMNS
+    assert table['Row'].tolist() == [position for position, _ in MATCHES]
+    # One record per match, as the per-row dicts of Series the table replaced held them
+    for record, (position, name) in zip(table.itertuples(index=False), MATCHES):
+        transaction = TRANSACTIONS.iloc[record.Row]
+        assert record.Company == name
+        assert (record.Ticker, record.Exchange) == company_details(name)
+        assert record.Amount == transaction['Amount']
+        assert record.Currency == transaction['Currency']
+    assert table['Date'].tolist()[:3] == [pd.Timestamp('2024-01-03'), pd.Timestamp('2024-01-05'),
+                                          pd.Timestamp('2024-01-12')]
+    assert pd.isna(table['Date'][3])
+
+
+def test_company_codes_are_stable_across_statements():
+    first = build_match_table(TRANSACTIONS, [(0, 'Netflix')])
+    second = build_match_table(TRANSACTIONS, [(2, 'Cellcom'), (1, 'Netflix')], UNIVERSE)
+
+    assert first['Company'].cat.codes[0] == second['Company'].cat.codes[1]
+    assert list(first['Company'].cat.categories) == list(get_company_table()['Company'])
+    assert list(second['Company'].cat.categories)[-1] == 'Starbucks Corp.'
+
+
+def test_known_currencies_come_first():
+    table = build_match_table(TRANSACTIONS, MATCHES, UNIVERSE)
+    assert list(table['Currency'].cat.categories) == ['₪', '$', '€', '£']
+
+    without_currency = build_match_table(TRANSACTIONS.drop(columns='Currency'), [(0, 'Netflix')])
+    assert without_currency['Currency'].tolist() == ['₪']
+
+
+def test_empty_table_has_the_same_columns_and_types():
+    empty = empty_match_table()
+    built = build_match_table(TRANSACTIONS, MATCHES, UNIVERSE)
+
+    assert empty.empty
+    assert empty.columns.tolist() == MATCH_COLUMNS
+    assert [str(dtype) for dtype in empty.dtypes[['Row', 'Date', 'Amount']]] == \
+        [str(dtype) for dtype in built.dtypes[['Row', 'Date', 'Amount']]]
+    assert all(isinstance(empty[column].dtype, pd.CategoricalDtype)
+               for column in ('Company', 'Ticker', 'Exchange', 'Currency'))
+
+
+def test_parquet_round_trip(tmp_path):
+    pytest.importorskip('pyarrow')
+    table = build_match_table(TRANSACTIONS, MATCHES, UNIVERSE)
+    path = tmp_path / 'matches.parquet'
+
+    table.to_parquet(path, index=False)
+
+    pd.testing.assert_frame_equal(pd.read_parquet(path), table, check_dtype=False, check_categorical=False)
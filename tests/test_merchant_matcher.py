@@ -0,0 +1,134 @@
+import re
+import pytest
+from benchmark import SYNTHETIC_MERCHANTS
+from company_data import INTERNATIONAL_COMPANIES, ISRAELI_COMPANIES
+from merchant_matcher import ANYWHERE, SHORT_WORD, WORD, MerchantMatcher
+from resolution_cache import ResolutionCache
+
+MERCHANTS = SYNTHETIC_MERCHANTS + [
+    'AMZN Mktp US*2K4', 'AMAZON.CO.UK', 'PRIME VIDEO', 'AWS EMEA', 'KINDLE SVCS', 'ALIBABA.COM',
+    'ALI EXPRESS', 'VALI SHOP', 'MS OFFICE 365', 'SMS GATEWAY', 'ITEMS', 'XBOX LIVE', 'FB ADS',
+    'WHATSAPP BUSINESS', 'GOOGLE *CLOUD', 'GOOGL STORAGE', 'DISNEY PLUS', 'TESLA SUPERCHARGER',
+    'UBER EATS', 'SPOTIFYSTOCKHOLM', 'SPOT HERO', 'BIT PAYMENT', 'HABIT BURGER', 'ביט העברה',
+    'EL AL AIRLINES', 'ELAL TICKETS', 'אל-על', 'מיטב דש גמל', 'בנק לאומי', 'דיסקונט', 'NETFLIXX',
+    'תקשורת שירות לקוחות', 'סופר שוק השכונה', 'סופרמרקט הגליל', 'APPLE STORE', 'ICLOUD STORAGE',
+]
+
+# find_company_transactions as it was: aliases were regexes, plus hard-coded special cases
+BASELINE_HEBREW_MAPPINGS = {
+    'partner': ['פרטנר', 'רנטרפ'],
+    'cellcom': ['סלקום', 'םוקלס'],
+    'menora': ['מנורה', 'הרונמ', 'מבטחים', 'םיחטבמ'],
+    'discount': ['דיסקונט', 'טנוקסיד'],
+    'leumi': ['לאומי', 'ימואל'],
+    'hapoalim': ['הפועלים', 'םילעופה'],
+    'strauss': ['שטראוס', 'סוארטש'],
+    'el al': ['אל על', 'לע לא'],
+}
+BASELINE_FORCED = {
+    'Partner': lambda m: 'תקשורת' in m and re.search('פרטנר|רנטרפ|partner', m, re.I),
+    'Cellcom': lambda m: 'תקשורת שירות' in m or re.search('סלקום|םוקלס|cellcom', m, re.I),
+    'Menora': lambda m: re.search('מבטחים|םיחטבמ|מנורה|הרונמ|menora', m, re.I),
+    'Yohananof': lambda m: re.search('יוחננוף|ףוננחוי|סופר שוק|סופרמרקט|קוש רפוס', m, re.I),
+}
+
+
+def baseline_match(merchant, company_info):
+    lower = merchant.lower()
+    name = company_info['name'].lower()
+    for term in [name] + [alias.lower() for alias in company_info.get('aliases', [])]:
+        pattern = rf'\b{term}\b|^{term}|{term}$' if len(term) <= 3 else term
+        if re.search(pattern, lower):
+            return True
+    special = {
+        'google': [r'google[*]'],
+        'netflix': [r'netflix\.com'],
+        'amazon': [r'amazon\.', 'amzn', 'prime'],
+        'paypal': [r'\bpaypal\b|\bפייפאל\b|\bביט\b|\bbit\b'],
+    }
+    if any(re.search(pattern, lower) for pattern in special.get(name, [])):
+        return True
+    return any(hebrew in merchant for hebrew in BASELINE_HEBREW_MAPPINGS.get(name, []))
+
+
+def baseline_matches(merchants):
+    matches = []
+    for company_info in INTERNATIONAL_COMPANIES + ISRAELI_COMPANIES:
+        rows = [position for position, merchant in enumerate(merchants) if baseline_match(merchant, company_info)]
+        forced = BASELINE_FORCED.get(company_info['name'])
+        if not rows and forced:
+            rows = [position for position, merchant in enumerate(merchants) if forced(merchant)]
+        matches.extend((position, company_info['name']) for position in rows)
+    return matches
+
+
+@pytest.fixture(scope='module')
+def company_matcher():
+    from app import get_company_matcher
+    return get_company_matcher()
+
+
+def test_company_matcher_agrees_with_the_baseline_regexes(company_matcher):
+    assert company_matcher.match_merchants(MERCHANTS) == baseline_matches(MERCHANTS)
+
+
+def test_fallback_patterns_agree_with_the_baseline_when_nothing_else_matches(company_matcher):
+    merchants = ['תקשורת שירות לקוחות', 'סופר שוק השכונה', 'COFFEE SHOP', 'סופרמרקט הגליל']
+    matches = company_matcher.match_merchants(merchants)
+
+    assert matches == baseline_matches(merchants)
+    assert matches == [(0, 'Cellcom'), (1, 'Yohananof'), (3, 'Yohananof')]
+
+
+@pytest.mark.parametrize('boundary, text, expected', [
+    (ANYWHERE, 'SMS GATEWAY', True),
+    (ANYWHERE, 'items', True),
+    (WORD, 'MS OFFICE', True),
+    (WORD, 'SMS GATEWAY', False),
+    (WORD, 'ITEMS', False),
+    (WORD, 'PAY-MS', True),
+    (SHORT_WORD, 'MS OFFICE', True),
+    (SHORT_WORD, 'ITEMS', True),  # Touches the end of the text
+    (SHORT_WORD, 'MSN', True),  # Touches the start of the text
+    (SHORT_WORD, 'SMSX', False),
+    (SHORT_WORD, 'MS_OFFICE', True),
+    (WORD, 'MS_OFFICE', False),  # Underscore is a word character, as in re
+])
+def test_boundaries(boundary, text, expected):
+    matcher = MerchantMatcher([('ms', 'Microsoft', boundary, False)])
+    assert bool(matcher.find(text)) is expected
+
+
+def test_overlapping_patterns_all_match():
+    matcher = MerchantMatcher([
+        ('el al', 'El Al', ANYWHERE, False),
+        ('al', 'Other', WORD, False),
+        ('amazon prime', 'Amazon', ANYWHERE, False),
+        ('prime', 'Amazon', ANYWHERE, False),
+        ('prime video', 'Video', ANYWHERE, False),
+    ])
+
+    assert matcher.find('EL AL TICKETS') == {'El Al': True, 'Other': True}
+    assert matcher.find('amazon prime video') == {'Amazon': True, 'Video': True}
+
+
+def test_regular_match_beats_fallback_and_results_follow_company_order():
+    matcher = MerchantMatcher([
+        ('cellcom', 'Cellcom', ANYWHERE, False),
+        ('תקשורת', 'Cellcom', ANYWHERE, True),
+        ('netflix', 'Netflix', ANYWHERE, False),
+    ])
+
+    assert matcher.find('cellcom תקשורת') == {'Cellcom': True}
+    assert matcher.find('תקשורת') == {'Cellcom': False}
+    # Cellcom has a regular match in the list, so its fallback-only row is dropped
+    assert matcher.match_merchants(['NETFLIX', 'תקשורת', 'CELLCOM', None]) == [(2, 'Cellcom'), (0, 'Netflix')]
+    assert matcher.match_merchants(['NETFLIX', 'תקשורת']) == [(1, 'Cellcom'), (0, 'Netflix')]
+
+
+def test_lookup_shares_results_across_spellings_of_one_merchant():
+    matcher = MerchantMatcher([('home depot', 'Home Depot', WORD, False)], cache=ResolutionCache('test', '1'))
+
+    assert matcher.lookup('HOME  DEPOT 4411') == {'Home Depot': True}
+    assert matcher.lookup('home depot 4411') == {'Home Depot': True}
+    assert matcher.cache.stats()['hits'] == 1
@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+import parse_cache
+from parse_cache import ParseCache, statement_key
+from pdf_extraction import PARSER_VERSION, parser_stamp
+
+PDF_BYTES = b'%PDF-1.7 statement'
+TRANSACTIONS = pd.DataFrame({
+    'Date': ['2024-01-03', '2024-01-05'],
+    'Merchant': ['NETFLIX.COM', 'קפה נמרוד'],
+    'Amount': [54.90, 1250.00],
+    'Currency': ['₪', '₪'],
+})
+
+
+def test_hit_after_put_and_miss_for_other_statements():
+    cache = ParseCache()
+    key = statement_key(PDF_BYTES, parser_stamp('pymupdf'))
+    assert cache.get(key) is None
+
+    cache.put(key, TRANSACTIONS, ['Netflix'], 1.5)
+    transactions_df, english_merchants = cache.get(key)
+
+    pd.testing.assert_frame_equal(transactions_df, TRANSACTIONS)
+    assert english_merchants == ['Netflix']
+    assert cache.get(statement_key(b'%PDF-1.7 another statement', parser_stamp('pymupdf'))) is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2
+    assert cache.stats()['saved_seconds'] == 1.5
+
+
+def test_disk_entries_survive_a_restart(tmp_path):
+    pytest.importorskip('pyarrow')
+    key = statement_key(PDF_BYTES, parser_stamp('pymupdf'))
+    ParseCache(cache_dir=str(tmp_path)).put(key, TRANSACTIONS, ['Netflix'], 1.5)
+
+    transactions_df, english_merchants = ParseCache(cache_dir=str(tmp_path)).get(key)
+
+    pd.testing.assert_frame_equal(transactions_df, TRANSACTIONS)
+    assert english_merchants == ['Netflix']
+
+
+def test_parser_version_backend_or_format_change_makes_entries_stale(monkeypatch, tmp_path):
+    pytest.importorskip('pyarrow')
+    cache = ParseCache(cache_dir=str(tmp_path))
+    cache.put(statement_key(PDF_BYTES, parser_stamp('pymupdf')), TRANSACTIONS, [], 1.0)
+    restarted = ParseCache(cache_dir=str(tmp_path))
+
+    assert restarted.get(statement_key(PDF_BYTES, parser_stamp('geometry'))) is None
+    assert restarted.get(statement_key(PDF_BYTES, parser_stamp('pymupdf', 'amex'))) is None
+    monkeypatch.setattr('pdf_extraction.PARSER_VERSION', PARSER_VERSION + 1)
+    assert restarted.get(statement_key(PDF_BYTES, parser_stamp('pymupdf'))) is None
+
+
+def test_disk_cache_is_off_unless_configured(monkeypatch, tmp_path):
+    monkeypatch.setattr(parse_cache, '_parse_cache', None)
+    monkeypatch.setattr(parse_cache, 'DEFAULT_CACHE_DIR', '')
+    assert parse_cache.get_parse_cache().cache_dir is None
+
+    monkeypatch.setattr(parse_cache, '_parse_cache', None)
+    monkeypatch.setattr(parse_cache, 'DEFAULT_CACHE_DIR', str(tmp_path))
+    assert parse_cache.get_parse_cache().cache_dir == str(tmp_path)
@@ -0,0 +1,102 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from fx_rates import FXRates, ticker_currency
+from performance_engine import compute_performance, compute_purchases
+from price_cache import StaticPriceSource
+from price_engine import parse_transaction_date
+from price_panel import PricePanel
+
+NOW = datetime(2024, 3, 1)
+DAYS = pd.bdate_range('2024-01-01', '2024-02-29')
+HISTORIES = {
+    'AAPL': pd.DataFrame({'Close': np.linspace(180.0, 200.0, len(DAYS))}, index=DAYS),
+    'TEVA.TA': pd.DataFrame({'Close': np.linspace(40.0, 50.0, len(DAYS))}, index=DAYS),
+}
+REL = 1e-5  # The panel keeps closes as float32
+CURRENT_PRICES = {'AAPL': 210.0, 'TEVA.TA': 45.0, 'NOHIST': 10.0}
+TRANSACTIONS = pd.DataFrame([
+    ('AAPL', '2024-01-10', 100.0, '₪'),
+    ('AAPL', '13/01/2024', 50.0, '$'),  # Saturday: buys at Monday's close
+    ('TEVA.TA', '2024/02/01', 300.0, '₪'),
+    ('AAPL', 'not a date', 100.0, '₪'),
+    ('AAPL', '31/02/2024', 100.0, '₪'),
+    ('NOHIST', '2024-01-10', 100.0, '₪'),  # Quoted, but no price history
+    ('AAPL', '2024-03-15', 100.0, '₪'),  # After NOW
+    ('TEVA.TA', '2024-01-10', 100.0, '€'),
+], columns=['Ticker', 'Date', 'Amount', 'Currency'])
+
+
+def make_fx_rates():
+    days = pd.bdate_range('2023-12-01', '2024-03-01')
+    return FXRates(source=StaticPriceSource({
+        'USDILS=X': pd.DataFrame({'Close': np.linspace(3.6, 3.8, len(days))}, index=days),
+        'EURILS=X': pd.DataFrame({'Close': np.linspace(4.0, 4.2, len(days))}, index=days),
+    }))
+
+
+def baseline_row(ticker, date, amount, currency, fx_rates):
+    """The per-row calculation the vectorized engine replaced, with exchange rates instead of a fixed one"""
+    transaction_date = parse_transaction_date(date)
+    if transaction_date is None or transaction_date > NOW:
+        return None
+    hist = HISTORIES.get(ticker)
+    if hist is None:
+        return None
+    hist = hist[hist.index >= pd.Timestamp(transaction_date)]
+    if hist.empty:
+        return None
+
+    stock_currency = ticker_currency(ticker)
+    first_price = hist['Close'].iloc[0]
+    invested = fx_rates.convert_amount(amount, currency, stock_currency, transaction_date)
+    shares = invested / first_price
+    current_price = CURRENT_PRICES[ticker]
+    return {
+        'Amount (₪)': fx_rates.convert_amount(amount, currency, 'ILS', transaction_date),
+        'Shares': shares,
+        'Value Change (₪)': fx_rates.convert_amount(shares * (current_price - first_price), stock_currency),
+        'Percent Change': (current_price - first_price) / first_price * 100,
+    }
+
+
+def run_engine(fx_rates):
+    args = (TRANSACTIONS['Ticker'], TRANSACTIONS['Date'], TRANSACTIONS['Amount'], TRANSACTIONS['Currency'],
+            PricePanel.from_histories(HISTORIES))
+    purchases = compute_purchases(*args, fx_rates=fx_rates, now=NOW)
+    performance = compute_performance(*args, CURRENT_PRICES, fx_rates=fx_rates, now=NOW)
+    return purchases, performance
+
+
+def test_matches_the_per_row_calculation():
+    fx_rates = make_fx_rates()
+    purchases, performance = run_engine(fx_rates)
+
+    for position, row in TRANSACTIONS.iterrows():
+        expected = baseline_row(row['Ticker'], row['Date'], row['Amount'], row['Currency'], fx_rates)
+        if expected is None:
+            assert np.isnan(purchases['Shares'][position]), row.tolist()
+            assert np.isnan(performance['Value Change (₪)'][position]), row.tolist()
+            assert np.isnan(performance['Percent Change'][position]), row.tolist()
+            continue
+        assert purchases['Shares'][position] == pytest.approx(expected['Shares'], rel=REL), row.tolist()
+        for column in ('Amount (₪)', 'Value Change (₪)', 'Percent Change'):
+            assert performance[column][position] == pytest.approx(expected[column], rel=REL), (column, row.tolist())
+
+
+def test_unvalued_rows():
+    purchases, performance = run_engine(make_fx_rates())
+
+    # Unparseable dates, the ticker without history and the future date
+    assert performance['Percent Change'].isna().tolist() == [False, False, False, True, True, True, True, False]
+    assert purchases['First Close'].isna().tolist() == [False, False, False, True, True, True, True, False]
+    # Shekel amounts need no rate, so they are kept even where the date did not parse
+    assert performance['Amount (₪)'][[3, 4, 5]].tolist() == [100.0, 100.0, 100.0]
+
+
+def test_missing_current_price_leaves_rows_unvalued():
+    fx_rates = make_fx_rates()
+    performance = compute_performance(['AAPL'], ['2024-01-10'], [100.0], '₪', PricePanel.from_histories(HISTORIES),
+                                      {'AAPL': None}, fx_rates=fx_rates, now=NOW)
+    assert np.isnan(performance['Value Change (₪)'][0])
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+from fx_rates import FXRates
+from portfolio_simulator import PORTFOLIO_COLUMNS, simulate_portfolio
+from price_cache import StaticPriceSource
+from price_panel import PricePanel
+
+DAYS = pd.bdate_range('2024-01-01', '2024-01-05')
+PANEL = PricePanel.from_histories({
+    'TEVA.TA': pd.DataFrame({'Close': [50.0, 40.0, 60.0, 30.0, 45.0]}, index=DAYS),
+    'AAPL': pd.DataFrame({'Close': [10.0, 10.0, 15.0, 20.0, 10.0]}, index=DAYS),
+})
+# 100₪ of Teva on the first day buys 2 shares; 120₪ of Apple on the third day is $30 at $15, 2 shares
+TICKERS = ['TEVA.TA', 'AAPL']
+DATES = ['2024-01-01', '2024-01-03']
+AMOUNTS = [100.0, 120.0]
+GROUPS = ['Teva', 'Apple']
+
+
+def make_fx_rates():
+    days = pd.bdate_range('2023-12-01', '2024-01-31')
+    return FXRates(source=StaticPriceSource({'USDILS=X': pd.DataFrame({'Close': np.full(len(days), 4.0)}, index=days)}))
+
+
+def test_two_buys_by_hand():
+    daily, contributions = simulate_portfolio(TICKERS, DATES, AMOUNTS, PANEL, groups=GROUPS, fx_rates=make_fx_rates())
+
+    assert daily.columns.tolist() == PORTFOLIO_COLUMNS
+    assert daily.index.tolist() == DAYS.tolist()
+    np.testing.assert_allclose(daily['Value (₪)'], [100, 80, 240, 220, 170])
+    np.testing.assert_allclose(daily['Cost Basis (₪)'], [100, 100, 220, 220, 220])
+    np.testing.assert_allclose(daily['Gain (₪)'], [0, -20, 20, 0, -50])
+    # Time-weighted: the Apple buy on day three is not a gain, so the index goes 1, 0.8, 1.2, 1.1, 0.85
+    np.testing.assert_allclose(daily['Drawdown (%)'], [0, -20, 0, -100 / 12, -100 * 0.35 / 1.2], atol=1e-9)
+
+    assert contributions.columns.tolist() == GROUPS
+    np.testing.assert_allclose(contributions['Teva'], [0, -20, 20, -40, -10])
+    np.testing.assert_allclose(contributions['Apple'], [0, 0, 0, 40, -40])
+    np.testing.assert_allclose(contributions.sum(axis=1), daily['Gain (₪)'])
+
+
+@pytest.mark.parametrize('ticker, date, currency', [
+    ('MSFT', '2024-01-02', '₪'),  # Not in the panel
+    ('AAPL', '2024-01-08', '₪'),  # After the panel's last day
+    ('AAPL', 'not a date', '₪'),
+    ('AAPL', '2024-01-02', '£'),  # No exchange rate
+])
+def test_buys_that_cannot_be_placed_are_dropped(ticker, date, currency):
+    fx_rates = make_fx_rates()
+    expected = simulate_portfolio(TICKERS, DATES, AMOUNTS, PANEL, groups=GROUPS, fx_rates=fx_rates)
+
+    daily, contributions = simulate_portfolio(TICKERS + [ticker], DATES + [date], AMOUNTS + [50.0], PANEL,
+                                              groups=GROUPS + ['Other'], currencies=['₪', '₪', currency],
+                                              fx_rates=fx_rates)
+
+    pd.testing.assert_frame_equal(daily, expected[0])
+    np.testing.assert_allclose(contributions[GROUPS], expected[1])
+
+
+def test_nothing_placed_gives_empty_frames():
+    daily, contributions = simulate_portfolio(['MSFT'], ['2024-01-02'], [50.0], PANEL, fx_rates=make_fx_rates())
+
+    assert daily.empty and daily.columns.tolist() == PORTFOLIO_COLUMNS
+    assert contributions.empty
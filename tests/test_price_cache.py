@@ -0,0 +1,91 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from price_cache import PriceCache, StaticPriceSource
+
+START, END = datetime(2024, 1, 1), datetime(2024, 4, 1)
+
+
+def make_source(tickers=('AAPL', 'MSFT', 'NFLX'), latency=0.0):
+    days = pd.bdate_range(START, END, inclusive='left')
+    histories = {ticker: pd.DataFrame({'Close': np.linspace(100 + offset, 200 + offset, len(days))}, index=days)
+                 for offset, ticker in enumerate(tickers)}
+    return StaticPriceSource(histories, latency=latency)
+
+
+def test_second_request_is_served_from_the_cache():
+    source = make_source()
+    cache = PriceCache(source, path=':memory:')
+
+    first = cache.history('AAPL', START, END)
+    second = cache.history('AAPL', START, END)
+
+    assert len(source.calls) == 1
+    pd.testing.assert_series_equal(first['Close'], second['Close'])
+    pd.testing.assert_series_equal(first['Close'], source.histories['AAPL']['Close'], check_freq=False)
+
+
+def test_earlier_start_only_fetches_the_missing_head():
+    source = make_source()
+    cache = PriceCache(source, path=':memory:')
+
+    cache.history('AAPL', datetime(2024, 2, 1), END)
+    hist = cache.history('AAPL', START, END)
+
+    assert [(call[1], call[2]) for call in source.calls] == [
+        (pd.Timestamp(2024, 2, 1), pd.Timestamp(END)),
+        (pd.Timestamp(START), pd.Timestamp(2024, 2, 1)),
+    ]
+    assert hist.index[0] == pd.Timestamp(2024, 1, 1)
+    assert len(hist) == len(source.histories['AAPL'])
+
+
+def test_later_end_fetches_the_tail_right_after_a_refresh():
+    source = make_source()
+    cache = PriceCache(source, path=':memory:', refresh_after=3600)
+
+    cache.history('AAPL', START, datetime(2024, 2, 1))
+    hist = cache.history('AAPL', START, END)
+
+    assert [(call[1], call[2]) for call in source.calls] == [
+        (pd.Timestamp(START), pd.Timestamp(2024, 2, 1)),
+        (pd.Timestamp(2024, 1, 31), pd.Timestamp(END)),
+    ]
+    assert len(hist) == len(source.histories['AAPL'])
+
+
+def test_only_a_possibly_intraday_last_day_waits_for_refresh_after():
+    today = pd.Timestamp.today().normalize()
+    tomorrow = today + pd.Timedelta(days=1)
+    days = pd.date_range(today - pd.Timedelta(days=10), today)
+    source = StaticPriceSource({'AAPL': pd.DataFrame({'Close': np.arange(len(days), dtype=float)}, index=days)})
+    cache = PriceCache(source, path=':memory:', refresh_after=3600)
+
+    cache.history('AAPL', days[0], tomorrow)
+    cache.history('AAPL', days[0], tomorrow)
+    assert len(source.calls) == 1
+
+    # Today's close moved since the first fetch
+    source.histories['AAPL'].loc[today, 'Close'] = 99.0
+    cache.refresh_after = 0
+    hist = cache.history('AAPL', days[0], tomorrow)
+    assert (source.calls[-1][1], source.calls[-1][2]) == (today, tomorrow)
+    assert hist['Close'].iloc[-1] == 99.0
+
+    # Days before today were final when fetched and are not read again
+    cache.history('AAPL', days[0], today)
+    assert len(source.calls) == 2
+
+
+def test_least_recently_used_ticker_is_evicted():
+    cache = PriceCache(make_source(), path=':memory:', max_tickers=2)
+
+    for ticker in ('AAPL', 'MSFT', 'NFLX'):
+        cache.history(ticker, START, END)
+
+    assert cache.cached_tickers() == ['NFLX', 'MSFT']
+
+
+def test_unknown_ticker_is_empty():
+    cache = PriceCache(make_source(), path=':memory:')
+    assert cache.history('NOPE', START, END).empty
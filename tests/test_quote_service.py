@@ -0,0 +1,89 @@
+import threading
+import time
+from quote_service import QuoteService
+
+
+class FakeBulkFetch:
+    """Stands in for download_last_closes, recording every call"""
+
+    def __init__(self, prices, latency=0.0):
+        self.prices = prices
+        self.latency = latency
+        self.calls = []
+
+    def __call__(self, tickers):
+        self.calls.append(list(tickers))
+        time.sleep(self.latency)
+        return {ticker: self.prices[ticker] for ticker in tickers if ticker in self.prices}
+
+
+def test_missing_tickers_are_quoted_in_one_call_and_cached():
+    fetch = FakeBulkFetch({'AAPL': 190.0, 'MSFT': 410.0})
+    service = QuoteService(bulk_fetch=fetch, ttl=60)
+
+    assert service.quotes(['AAPL', 'MSFT', 'NOPE']) == {'AAPL': 190.0, 'MSFT': 410.0}
+    assert service.quotes(['AAPL', 'NOPE']) == {'AAPL': 190.0}
+    assert fetch.calls == [['AAPL', 'MSFT', 'NOPE']]
+
+
+def test_remembered_prices_need_no_call():
+    fetch = FakeBulkFetch({})
+    service = QuoteService(bulk_fetch=fetch, ttl=60)
+    service.remember({'AAPL': 185.5})
+
+    assert service.quote('AAPL') == 185.5
+    assert fetch.calls == []
+
+
+def test_expired_quote_is_fetched_again():
+    fetch = FakeBulkFetch({'AAPL': 190.0})
+    service = QuoteService(bulk_fetch=fetch, ttl=60)
+    service.remember({'AAPL': 150.0}, as_of=time.time() - 120)
+
+    assert service.quote('AAPL') == 190.0
+    assert fetch.calls == [['AAPL']]
+
+
+def test_concurrent_requests_share_one_fetch():
+    fetch = FakeBulkFetch({'AAPL': 190.0}, latency=0.2)
+    service = QuoteService(bulk_fetch=fetch, ttl=60)
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(service.quote('AAPL'))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [190.0] * 4
+    assert fetch.calls == [['AAPL']]
+
+
+def test_failed_fetch_leaves_tickers_unquoted():
+    def failing(tickers):
+        raise ConnectionError('offline')
+
+    service = QuoteService(bulk_fetch=failing, ttl=60)
+    assert service.quotes(['AAPL']) == {}
+
+
+def test_failures_are_retried_and_misses_expire_sooner():
+    calls = []
+
+    def flaky(tickers):
+        calls.append(list(tickers))
+        if len(calls) == 1:
+            raise ConnectionError('offline')
+        return {'AAPL': 190.0}
+
+    service = QuoteService(bulk_fetch=flaky, ttl=60, miss_ttl=5)
+    assert service.quotes(['AAPL', 'NOPE']) == {}
+    assert service.quotes(['AAPL', 'NOPE']) == {'AAPL': 190.0}
+    assert service.quotes(['AAPL', 'NOPE']) == {'AAPL': 190.0}
+    assert calls == [['AAPL', 'NOPE'], ['AAPL', 'NOPE']]
+
+    # Past miss_ttl but within ttl, only the ticker without a price is asked for again
+    with service._lock:
+        service._quotes = {ticker: (price, quoted - 10) for ticker, (price, quoted) in service._quotes.items()}
+    service.quotes(['AAPL', 'NOPE'])
+    assert calls[-1] == ['NOPE']
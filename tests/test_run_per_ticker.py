@@ -0,0 +1,57 @@
+import threading
+import time
+from price_engine import run_per_ticker
+
+
+def test_failed_call_is_retried():
+    calls = []
+
+    def flaky(ticker):
+        calls.append(ticker)
+        if len(calls) == 1:
+            raise ConnectionError('connection reset')
+        return ticker.lower()
+
+    assert run_per_ticker(flaky, {'AAPL': ()}, workers=1, timeout=5, retries=2) == {'AAPL': 'aapl'}
+    assert calls == ['AAPL', 'AAPL']
+
+
+def test_ticker_failing_every_attempt_is_left_out():
+    calls = []
+    lock = threading.Lock()
+
+    def fetch(ticker, suffix):
+        with lock:
+            calls.append(ticker)
+        if ticker == 'BAD':
+            raise ValueError('no data')
+        return ticker + suffix
+
+    jobs = {'AAPL': ('-1',), 'BAD': ('-2',), 'MSFT': ('-3',)}
+    result = run_per_ticker(fetch, jobs, workers=3, timeout=5, retries=1)
+
+    assert list(result.items()) == [('AAPL', 'AAPL-1'), ('MSFT', 'MSFT-3')]
+    assert calls.count('BAD') == 2
+
+
+def test_hung_call_times_out_without_a_second_copy():
+    calls = []
+    release = threading.Event()
+
+    def fetch(ticker):
+        calls.append(ticker)
+        if ticker == 'HUNG':
+            release.wait(5)
+        return ticker
+
+    try:
+        start = time.perf_counter()
+        result = run_per_ticker(fetch, {'HUNG': (), 'AAPL': ()}, workers=2, timeout=0.1, retries=2)
+        elapsed = time.perf_counter() - start
+    finally:
+        release.set()
+
+    assert result == {'AAPL': 'AAPL'}
+    # The timed-out call was still running after the backoff, so it was not retried
+    assert calls.count('HUNG') == 1
+    assert elapsed < 2
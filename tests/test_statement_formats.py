@@ -0,0 +1,78 @@
+import os
+import pytest
+from statement_formats import DEFAULT_FORMAT, available_formats, detect_format, get_format
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Transactions each fixture statement holds; payment and credit lines are left out
+EXPECTED_ROWS = {
+    'israeli': [
+        ('2024-01-03', 'NETFLIX.COM', 54.90, '₪'),
+        ('2024-01-05', 'קפה נמרוד', 1250.00, '₪'),
+        ('2024-01-12', 'סלקום', 89.50, '₪'),
+    ],
+    'us_card': [
+        ('2024-12-28', 'AMAZON MKTP US', 45.10, '$'),
+        ('2025-01-02', 'STARBUCKS 1234', 6.75, '$'),
+    ],
+    'amex': [
+        ('2024-12-20', 'UBER *TRIP', 23.40, '$'),
+        ('2025-01-02', 'APPLE.COM/BILL', 2999.00, '$'),
+    ],
+}
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, f'{name}.txt'), encoding='utf-8') as f:
+        return f.read()
+
+
+def rows(transactions):
+    return [(t['Date'], t['Merchant'], t['Amount'], t['Currency']) for t in transactions]
+
+
+def test_every_format_has_a_fixture():
+    assert set(available_formats()) == set(EXPECTED_ROWS)
+
+
+@pytest.mark.parametrize('name', sorted(EXPECTED_ROWS))
+def test_detect_format(name):
+    assert detect_format(read_fixture(name)).name == name
+
+
+@pytest.mark.parametrize('name', sorted(EXPECTED_ROWS))
+def test_parse_fixture(name):
+    text = read_fixture(name)
+    transactions, _ = detect_format(text).parse_text(text)
+    assert rows(transactions) == EXPECTED_ROWS[name]
+
+
+def test_forced_format_reads_context_from_sample():
+    parser = get_format('us_card', read_fixture('us_card'))
+    assert (parser.closing_date.year, parser.closing_date.month, parser.closing_date.day) == (2025, 1, 4)
+
+
+def test_unknown_format():
+    with pytest.raises(KeyError):
+        get_format('no_such_bank')
+
+
+def test_unrecognized_sample_uses_default_format():
+    assert detect_format('nothing that looks like a transaction').name == DEFAULT_FORMAT
+
+
+@pytest.mark.parametrize('name', ['us_card', 'amex'])
+def test_extract_pages_detects_format_from_pdf(name):
+    pymupdf = pytest.importorskip('pymupdf')
+    from pdf_extraction import extract_pages
+
+    document = pymupdf.open()
+    page = document.new_page()
+    for line_number, line in enumerate(read_fixture(name).splitlines()):
+        page.insert_text((40, 40 + 14 * line_number), line, fontsize=9)
+    pdf_bytes = document.tobytes()
+    document.close()
+
+    pages = extract_pages(pdf_bytes, workers=1, backend='pymupdf')
+    assert [page_result['format'] for page_result in pages] == [name]
+    assert rows(pages[0]['transactions']) == EXPECTED_ROWS[name]
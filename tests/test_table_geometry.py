@@ -0,0 +1,73 @@
+import pytest
+from statement_formats import get_format
+from table_geometry import ColumnLayout
+
+pymupdf = pytest.importorskip('pymupdf')
+
+HEADER = [
+    'Visa Signature   Opening/Closing Date 12/05/24 - 01/04/25   New Balance $1,234.56',
+    'Trans Date Post Date Description Amount',
+]
+
+
+def write_row(page, y, cells):
+    """Write (x, text) cells on one line"""
+    for x, text in cells:
+        page.insert_text((x, y), text, fontsize=9)
+
+
+def wrapped_statement():
+    """A us_card page whose descriptions wrap onto the lines around their amounts"""
+    document = pymupdf.open()
+    page = document.new_page()
+    for line_number, line in enumerate(HEADER):
+        write_row(page, 40 + 14 * line_number, [(40, line)])
+    write_row(page, 70, [(40, '12/28'), (80, '12/29'), (120, 'AMAZON MKTP US'), (300, '45.10')])
+    write_row(page, 84, [(40, '12/30'), (80, '12/31'), (120, 'NETFLIX.COM'), (300, '15.99')])
+    # Two-line cell with the other cells vertically centered on it
+    write_row(page, 98, [(120, 'WALGREENS')])
+    write_row(page, 104, [(40, '01/01'), (80, '01/02'), (300, '12.30')])
+    write_row(page, 110, [(120, 'STORE 5521')])
+    # Top-aligned cell whose description runs onto a second line
+    write_row(page, 124, [(40, '01/02'), (80, '01/03'), (120, 'STARBUCKS 1234'), (300, '$6.75')])
+    write_row(page, 138, [(120, 'SEATTLE WA')])
+    write_row(page, 180, [(120, 'Page 1 of 1')])
+    pdf_bytes = document.tobytes()
+    document.close()
+    return pdf_bytes
+
+
+def merchants(pdf_bytes, backend):
+    from pdf_extraction import extract_pages
+
+    pages = extract_pages(pdf_bytes, workers=1, backend=backend)
+    return [(t['Date'], t['Merchant'], t['Amount']) for t in pages[0]['transactions']]
+
+
+def test_geometry_joins_wrapped_descriptions_that_text_reflow_splits():
+    pdf_bytes = wrapped_statement()
+
+    # Line by line, the centered row's description is lost and its post date read as the merchant
+    assert ('2025-01-01', '01/02', 12.30) in merchants(pdf_bytes, 'pymupdf')
+    assert merchants(pdf_bytes, 'geometry') == [
+        ('2024-12-28', 'AMAZON MKTP US', 45.10),
+        ('2024-12-30', 'NETFLIX.COM', 15.99),
+        ('2025-01-01', 'WALGREENS STORE 5521', 12.30),
+        ('2025-01-02', 'STARBUCKS 1234 SEATTLE WA', 6.75),
+    ]
+
+
+def test_learned_layout_keeps_descriptions_optional():
+    row = lambda *cells: [(x, x + 5 * len(text), text, 0, 9) for x, text in cells]
+    sample = [
+        row((40, '12/28'), (80, '12/29'), (120, 'AMAZON'), (160, 'MKTP'), (300, '45.10')),
+        row((40, '12/30'), (80, '12/31'), (120, 'NETFLIX.COM'), (300, '15.99')),
+    ]
+
+    layout = ColumnLayout.learn(sample, get_format('us_card'))
+
+    assert [layout.columns[index][0] for index in layout.description] == [120]
+    assert len(layout.required) == 3
+    assert layout.is_candidate(row((40, '01/01'), (80, '01/02'), (300, '12.30')))
+    assert layout.is_description_piece(row((120, 'STORE'), (150, '5521')))
+    assert not layout.is_description_piece(row((40, 'Total'), (300, '73.04')))
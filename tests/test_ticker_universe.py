@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+from match_table import get_company_table
+from resolution_cache import clear_resolution_caches
+from ticker_universe import get_ticker_universe
+
+
+@pytest.fixture
+def universe():
+    return get_ticker_universe()
+
+
+def test_exact_and_prefix_names_resolve(universe):
+    assert universe.resolve('STARBUCKS 1234')['ticker'] == 'SBUX'
+    assert universe.resolve('HOME DEPOT 4411')['ticker'] == 'HD'
+    assert universe.resolve('KROGER')['ticker'] == 'KR'
+
+
+def test_fuzzy_batch_matches_near_misses(universe):
+    results = universe.resolve_fuzzy_batch(['WALGREENS #5521', 'WALGREENS #5521', 'KROGER'])
+
+    assert list(results) == ['WALGREENS #5521', 'KROGER']
+    assert results['WALGREENS #5521']['ticker'] == 'WAG'
+
+
+def test_generic_merchants_do_not_resolve(universe):
+    assert universe.resolve('COFFEE SHOP') is None
+    assert universe.resolve('') is None
+    assert universe.resolve_fuzzy_batch(['COFFEE SHOP', 'PARKING LOT 7']) == {
+        'COFFEE SHOP': None, 'PARKING LOT 7': None}
+
+
+def test_merchant_outside_company_data_is_matched_through_the_universe():
+    from app import get_companies_with_transactions
+
+    assert 'SBUX' not in set(get_company_table()['Ticker'])
+    clear_resolution_caches()
+    transactions = pd.DataFrame({
+        'Date': pd.to_datetime(['2024-01-02', '2024-01-03', '2024-01-04']),
+        'Merchant': ['NETFLIX.COM', 'STARBUCKS 1234', 'COFFEE SHOP'],
+        'Amount': [49.9, 18.0, 12.0],
+    })
+
+    matches = get_companies_with_transactions(transactions)
+
+    tickers = dict(zip(matches['Row'], matches['Ticker'].astype(str)))
+    assert tickers[1] == 'SBUX'
+    assert 0 in tickers and 2 not in tickers
+
+
+def test_failed_lookup_caches_only_what_was_found(monkeypatch, universe):
+    import app
+    from resolution_cache import MISSING, get_resolution_cache, normalize_merchant
+
+    class FuzzyDown:
+        def resolve(self, merchant_name):
+            return universe.resolve(merchant_name)
+
+        def resolve_fuzzy_batch(self, merchant_names):
+            raise ConnectionError('rapidfuzz worker died')
+
+    clear_resolution_caches()
+    monkeypatch.setattr(app, 'get_ticker_universe', FuzzyDown)
+    results = app.get_stock_tickers(['KROGER', 'WALGREENS #5521'])
+
+    cache = get_resolution_cache('universe', app.ALIAS_TABLES_VERSION)
+    assert results['KROGER']['ticker'] == 'KR' and results['WALGREENS #5521'] is None
+    assert cache.get(normalize_merchant('KROGER'), MISSING)['ticker'] == 'KR'
+    assert cache.get(normalize_merchant('WALGREENS #5521'), MISSING) is MISSING
+
+    monkeypatch.undo()
+    assert app.get_stock_tickers(['Walgreens  #5521'])['Walgreens  #5521']['ticker'] == 'WAG'
@@ -0,0 +1,247 @@
+import csv
+import os
+import re
+import numpy as np
+from rapidfuzz import fuzz, process
+from debug_utils import debug_print
+
+UNIVERSE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'global_stocks.csv')
+
+# Legal-form and filler words that do not identify a company on a statement
+GENERIC_NAME_WORDS = {
+    'inc', 'incorporated', 'corp', 'corporation', 'co', 'company', 'ltd', 'limited',
+    'plc', 'llc', 'lp', 'l', 'p', 'sa', 'nv', 'ag', 'se', 'the', 'and', 'of',
+    'com', 'www', 'new', 'adr', 'ads', 'class', 'a', 'b', 's', 'common', 'stock', 'shares',
+}
+
+# Words that describe rather than name a company. They are kept in names, so
+# "Coffee Holding" only matches a merchant that says both words, but they
+# never make a name distinctive or a merchant a fuzzy candidate on their own.
+DESCRIPTIVE_NAME_WORDS = {
+    'companies', 'group', 'holding', 'holdings', 'international', 'technologies', 'technology',
+    'enterprises', 'industries', 'systems',
+}
+
+# Suffixes merchant strings often glue onto a company name
+GLUED_SUFFIXES = ('com', 'net', 'inc', 'ltd', 'www')
+
+MIN_KEY_LENGTH = 4  # Shorter compact names are too ambiguous to match merchants
+MIN_PREFIX_LENGTH = 5  # Trie matches must cover at least this many characters
+MAX_SINGLE_TOKEN_COMPANIES = 3  # One-word names only match if the word is this rare in the universe
+BLOCK_KEY_LENGTH = 3  # Fuzzy candidates must share a token starting with the same characters
+FUZZY_THRESHOLD = 87  # token_sort_ratio a fuzzy universe match has to exceed
+
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def normalize_name(name):
+    """Lowercase a company or merchant name and split it into significant tokens"""
+    name = name.lower().replace('&', ' and ').replace("'", '')
+    return [token for token in _TOKEN_PATTERN.findall(name)
+            if token not in GENERIC_NAME_WORDS and not token.isdigit()]
+
+
+def block_keys(tokens):
+    """Blocking keys for fuzzy matching: the first characters of every non-descriptive token"""
+    return {token[:BLOCK_KEY_LENGTH] for token in tokens
+            if len(token) >= BLOCK_KEY_LENGTH and token not in DESCRIPTIVE_NAME_WORDS}
+
+
+class TickerUniverse:
+    """
+    In-memory index of every ticker in global_stocks.csv.
+
+    Names are normalized to significant tokens and indexed twice: a token
+    inverted index for multi-word names, and a character trie of the compact
+    name for merchant strings that glue words together (e.g. NETFLIXCOM).
+
+    Args:
+        path (str): CSV file with Ticker, Company_Name and Exchange columns
+    """
+
+    def __init__(self, path=UNIVERSE_PATH):
+        self.tickers = []
+        self.names = []
+        self.exchanges = []
+        self.name_tokens = []
+        self.token_index = {}
+        self.block_index = {}
+        self.trie = {}
+
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                tokens = tuple(normalize_name(row['Company_Name']))
+                key = ''.join(tokens)
+                if len(key) < MIN_KEY_LENGTH:
+                    continue
+
+                entry_id = len(self.tickers)
+                self.tickers.append(row['Ticker'].strip())
+                self.names.append(row['Company_Name'].strip())
+                self.exchanges.append(row['Exchange'].strip())
+                self.name_tokens.append(tokens)
+
+                for token in set(tokens):
+                    self.token_index.setdefault(token, []).append(entry_id)
+                for key in block_keys(tokens):
+                    self.block_index.setdefault(key, []).append(entry_id)
+
+                node = self.trie
+                for char in key:
+                    node = node.setdefault(char, {})
+                # Keep the first listing when two companies normalize to the same name
+                node.setdefault('$', entry_id)
+
+        debug_print(f"Loaded ticker universe with {len(self.tickers)} companies and {len(self.token_index)} tokens")
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def _entry(self, entry_id):
+        return {'ticker': self.tickers[entry_id], 'name': self.names[entry_id],
+                'exchange': self.exchanges[entry_id]}
+
+    def _is_distinctive(self, entry_id):
+        """
+        Whether a listing's name can identify it on a statement.
+
+        Names made only of descriptive words identify nothing, and a one-word
+        name shared by many companies (e.g. "american") identifies none of them.
+        """
+        name_tokens = self.name_tokens[entry_id]
+        naming = [token for token in name_tokens if token not in DESCRIPTIVE_NAME_WORDS]
+        if not naming:
+            return False
+        return len(name_tokens) > 1 or len(self.token_index[naming[0]]) <= MAX_SINGLE_TOKEN_COMPANIES
+
+    def _match_tokens(self, tokens):
+        """Find the most specific company whose every significant token is in the merchant"""
+        token_set = set(tokens)
+        best_id, best_key = None, None
+
+        for token in token_set:
+            for entry_id in self.token_index.get(token, ()):
+                name_tokens = self.name_tokens[entry_id]
+                if not self._is_distinctive(entry_id) or not token_set.issuperset(name_tokens):
+                    continue
+                # Prefer the longest match, then the shortest listed name (Coca-Cola Co. over Coca-Cola Enterprises)
+                key = (-sum(len(name_token) for name_token in name_tokens), len(self.names[entry_id]), entry_id)
+                if best_key is None or key < best_key:
+                    best_id, best_key = entry_id, key
+
+        return best_id
+
+    def _match_prefix(self, tokens):
+        """Find the longest compact company name that starts a run of merchant tokens"""
+        best_id, best_length = None, 0
+
+        for start in range(len(tokens)):
+            text = ''.join(tokens[start:])
+            boundaries = set()
+            length = 0
+            for token in tokens[start:]:
+                length += len(token)
+                boundaries.add(length)
+
+            node = self.trie
+            for position, char in enumerate(text):
+                node = node.get(char)
+                if node is None:
+                    break
+                end = position + 1
+                if '$' not in node or end < MIN_PREFIX_LENGTH or end <= best_length:
+                    continue
+                if not self._is_distinctive(node['$']):
+                    continue
+                # The name must end on a token boundary, or be glued to digits or a
+                # generic suffix (SPOTIFY1234, NETFLIXCOM) rather than to another word
+                rest = text[end:]
+                if (end in boundaries or rest[0].isdigit() or
+                        any(rest.startswith(word) for word in GLUED_SUFFIXES)):
+                    best_id, best_length = node['$'], end
+
+        return best_id
+
+    def resolve(self, merchant_name):
+        """
+        Resolve a merchant name against the full universe.
+
+        Returns:
+            dict: 'ticker', 'name' and 'exchange' of the matched company, or None
+        """
+        if not merchant_name:
+            return None
+
+        tokens = normalize_name(merchant_name)
+        if not tokens:
+            return None
+
+        entry_id = self._match_tokens(tokens)
+        if entry_id is None:
+            entry_id = self._match_prefix(tokens)
+        if entry_id is None:
+            return None
+
+        return self._entry(entry_id)
+
+    def resolve_fuzzy_batch(self, merchant_names, threshold=FUZZY_THRESHOLD):
+        """
+        Fuzzy-match many merchant names against the universe at once.
+
+        Merchants are only scored against companies sharing a blocking key
+        with them, one cdist call per block, so the work grows with the block
+        sizes instead of merchants x 5,800 companies. Names are compared whole
+        with token_sort_ratio, so a merchant that shares one word with a long
+        listing name (TARGET vs. a "Target Term Trust") scores low; store
+        numbers are dropped by normalize_name before scoring.
+
+        Args:
+            merchant_names (iterable): Merchant names, typically the unique Merchant column
+            threshold (float): token_sort_ratio score a match has to exceed
+
+        Returns:
+            dict: Merchant name -> matched entry dict (as from resolve), or None
+        """
+        merchant_names = list(dict.fromkeys(name for name in merchant_names if name))
+        results = dict.fromkeys(merchant_names)
+
+        # Group merchants by blocking key so each block is scored in one cdist call
+        queries = [' '.join(normalize_name(name)) for name in merchant_names]
+        blocks = {}
+        for query_id, query in enumerate(queries):
+            for key in block_keys(query.split()):
+                if key in self.block_index:
+                    blocks.setdefault(key, []).append(query_id)
+
+        best_ids = np.full(len(queries), -1)
+        best_scores = np.zeros(len(queries), dtype=np.float32)
+        for key, query_ids in blocks.items():
+            entry_ids = [entry_id for entry_id in self.block_index[key] if self._is_distinctive(entry_id)]
+            if not entry_ids:
+                continue
+            choices = [' '.join(self.name_tokens[entry_id]) for entry_id in entry_ids]
+            scores = process.cdist([queries[query_id] for query_id in query_ids], choices,
+                                   scorer=fuzz.token_sort_ratio, workers=-1, dtype=np.float32)
+            block_best = scores.argmax(axis=1)
+            for row, query_id in enumerate(query_ids):
+                score = scores[row, block_best[row]]
+                if score > best_scores[query_id]:
+                    best_ids[query_id], best_scores[query_id] = entry_ids[block_best[row]], score
+
+        for query_id, name in enumerate(merchant_names):
+            if best_scores[query_id] > threshold:
+                results[name] = self._entry(int(best_ids[query_id]))
+
+        debug_print(f"Fuzzy universe matching resolved {sum(1 for r in results.values() if r)} of {len(results)} merchants")
+        return results
+
+
+_ticker_universe = None
+
+
+def get_ticker_universe():
+    """Load the ticker universe once and reuse it"""
+    global _ticker_universe
+    if _ticker_universe is None:
+        _ticker_universe = TickerUniverse()
+    return _ticker_universe